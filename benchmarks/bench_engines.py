@@ -0,0 +1,74 @@
+"""Compare the subprocess and pooled OCR engines on the bundled samples.
+
+Both engines must produce the same layout tree. The subprocess engine pays
+process start-up and traineddata loading on every page; the pooled engine
+pays it once, on its first page. Needs Tesseract and tesserocr.
+
+Usage: python benchmarks/bench_engines.py [--repeat 3] [images ...]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from bench_layout import layout_signature
+from text_recog.engine import PooledEngine, SubprocessEngine
+from text_recog.layout import tsv_to_layout
+from text_recog.segment import LANG, TESSERACT_CONFIG, MagazineLayoutAnalyzer
+
+SAMPLES_DIR = Path(__file__).parent.parent / "samples"
+
+
+def time_engine(engine, analyzers, repeat: int) -> tuple[float, list[float], list]:
+    """Time the first call, then every call over ``repeat`` passes"""
+    start = time.perf_counter()
+    first_tsv = engine.image_to_tsv(analyzers[0].image, LANG, TESSERACT_CONFIG)
+    first = time.perf_counter() - start
+
+    timings = []
+    trees = []
+    for _ in range(repeat):
+        for analyzer in analyzers:
+            start = time.perf_counter()
+            tsv = engine.image_to_tsv(analyzer.image, LANG, TESSERACT_CONFIG)
+            timings.append(time.perf_counter() - start)
+            if len(trees) < len(analyzers):
+                trees.append(layout_signature(tsv_to_layout(tsv)))
+    assert trees[0] == layout_signature(tsv_to_layout(first_tsv))
+    return first, timings, trees
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="*", type=Path)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    images = args.images or sorted(SAMPLES_DIR.glob("*.jpg"))
+    analyzers = [MagazineLayoutAnalyzer(image) for image in images]
+
+    results = {}
+    for engine in (SubprocessEngine(), PooledEngine(size=1)):
+        results[engine.name] = time_engine(engine, analyzers, args.repeat)
+        engine.close()
+
+    _, _, subprocess_trees = results["subprocess"]
+    _, _, pooled_trees = results["pooled"]
+    assert subprocess_trees == pooled_trees, "engines produced different layouts"
+
+    print(f"pages: {len(images)} x {args.repeat}")
+    means = {}
+    for name, (first, timings, _) in results.items():
+        means[name] = sum(timings) / len(timings)
+        print(
+            f"{name:>10}: first page {first * 1000:8.0f} ms, "
+            f"steady state {means[name] * 1000:8.0f} ms/page"
+        )
+    print(
+        f"fixed cost saved per page: "
+        f"{(means['subprocess'] - means['pooled']) * 1000:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compare layout.df_to_layout against the row-by-row reference builder, and
+layout.tsv_to_layout against reading the TSV with pandas first.
+
+Usage: python benchmarks/bench_layout.py [--words 8000] [--repeat 5]
+"""
+
+import argparse
+import math
+import time
+from csv import QUOTE_NONE
+from io import BytesIO
+
+import pandas as pd
+
+from synthetic import synthetic_tsv
+from text_recog import layout
+
+
+def layout_signature(pages: dict[int, layout.Page]):
+    """Flatten a layout tree into comparable tuples, treating NaN text as None"""
+
+    def box(element):
+        return element.left, element.top, element.width, element.height
+
+    def word_text(word):
+        if isinstance(word.text, float) and math.isnan(word.text):
+            return None
+        return word.text
+
+    return [
+        (page_num, box(page), block_num, box(block), par_num, box(para))
+        + (line_num, box(line))
+        + (word_num, box(word), word.conf, word_text(word))
+        for page_num, page in pages.items()
+        for block_num, block in page.blocks.items()
+        for par_num, para in block.paragraphs.items()
+        for line_num, line in para.lines.items()
+        for word_num, word in line.words.items()
+    ]
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, default=8000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tsv = synthetic_tsv(n_words=args.words)
+
+    def read_tsv():
+        return pd.read_csv(BytesIO(tsv), quoting=QUOTE_NONE, sep="\t")
+
+    df = read_tsv()
+
+    reference = layout.df_to_layout_iterrows(df)
+    fast = layout.df_to_layout(df)
+    assert layout_signature(fast) == layout_signature(reference), "trees differ"
+    direct = layout.tsv_to_layout(tsv)
+    assert layout_signature(direct) == layout_signature(fast), "TSV tree differs"
+
+    t_reference = best_of(lambda: layout.df_to_layout_iterrows(df), args.repeat)
+    t_fast = best_of(lambda: layout.df_to_layout(df), args.repeat)
+    t_pandas = best_of(lambda: layout.df_to_layout(read_tsv()), args.repeat)
+    t_direct = best_of(lambda: layout.tsv_to_layout(tsv), args.repeat)
+
+    print(f"rows: {len(df)} ({args.words} words)")
+    print(f"df_to_layout_iterrows: {t_reference * 1000:8.1f} ms")
+    print(f"df_to_layout:          {t_fast * 1000:8.1f} ms")
+    print(f"speed-up:              {t_reference / t_fast:8.1f}x")
+    print()
+    print(f"read_csv+df_to_layout: {t_pandas * 1000:8.1f} ms")
+    print(f"tsv_to_layout:         {t_direct * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Memory held by resident layouts: dataclass tree vs compact columnar pages,
+each built straight from the TSV.
+
+Usage: python benchmarks/bench_memory.py [--pages 100] [--words 3000]
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+from synthetic import synthetic_tsv
+from text_recog import compact, layout
+
+
+def traced_size(build) -> tuple[object, int]:
+    """Build something and measure the memory it keeps alive"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--words", type=int, default=3000)
+    args = parser.parse_args()
+
+    tsvs = [synthetic_tsv(n_words=args.words, seed=seed) for seed in range(args.pages)]
+
+    trees, tree_bytes = traced_size(lambda: [layout.tsv_to_layout(tsv) for tsv in tsvs])
+    compacts, compact_bytes = traced_size(
+        lambda: [compact.tsv_to_compact(tsv) for tsv in tsvs]
+    )
+
+    for pages, compact_pages in zip(trees, compacts):
+        assert pages[1].get_text() == compact_pages[1].get_text(), "text differs"
+        block = next(iter(pages[1].blocks.values()))
+        view = next(iter(compact_pages[1].blocks.values()))
+        assert (block.left, block.top, block.width, block.height) == (
+            view.left,
+            view.top,
+            view.width,
+            view.height,
+        )
+
+    print(f"pages: {args.pages} x {args.words} words")
+    print(f"layout tree:   {tree_bytes / 2**20:8.1f} MiB")
+    print(f"compact pages: {compact_bytes / 2**20:8.1f} MiB")
+    print(f"reduction:     {tree_bytes / compact_bytes:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
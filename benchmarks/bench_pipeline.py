@@ -0,0 +1,398 @@
+"""Stage-by-stage benchmark of the OCR-to-transcript pipeline.
+
+Runs from recorded image_to_data TSV fixtures of the bundled samples, so no
+Tesseract is needed. Each sample is also scaled up, image and boxes alike, to
+stand in for high resolution archive masters, and a synthetic page stands in
+for a dense newspaper master. Stages:
+
+- decode: MagazineLayoutAnalyzer.__init__, i.e. reading the image
+- parse: TSV to layout tree; parse_pandas does the same through a
+  DataFrame, and df_to_layout times layout.df_to_layout on its own
+- get_text: whole page text on a fresh tree, then again once cached
+- overlay: add_block_overlay
+- render: what the GUI does to show a page, building the image pyramid and
+  rendering a viewport
+- transcript_<format>: generate_transcript for each format
+
+A memory tier then measures the peak RSS each page adds to a fresh
+interpreter, as a GUI prefetch worker (decode, OCR, overlay, one viewport)
+and as a batch worker (transcripts and an overlay file), with and without
+low-memory mode; OCR is replayed from the fixtures. --no-memory skips it,
+as does Windows, which lacks the resource module.
+
+When Tesseract is installed an end-to-end tier also times OCR itself,
+uncached; --no-e2e skips it. Results are printed and, with --output, saved
+as JSON to track regressions.
+
+Usage: python benchmarks/bench_pipeline.py [--repeat 5] [--scales 1 3]
+           [--synthetic-words 8000] [--output results.json]
+       python benchmarks/bench_pipeline.py --record [images ...]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from csv import QUOTE_NONE
+from io import BytesIO
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from synthetic import synthetic_tsv
+from text_recog import layout, preprocess
+from text_recog.engine import get_tesseract_path
+from text_recog.render import ImagePyramid
+from text_recog.layout import tsv_to_layout
+from text_recog.segment import MagazineLayoutAnalyzer
+
+BENCH_DIR = Path(__file__).parent
+SAMPLES_DIR = BENCH_DIR.parent / "samples"
+FIXTURES_DIR = BENCH_DIR / "fixtures"
+TRANSCRIPT_FORMATS = ("json", "csv", "excel", "text")
+# What the GUI shows of a page by default
+VIEWPORT = (1200, 900)
+ZOOM = 0.5
+MEMORY_FLOWS = ("gui", "batch")
+
+# Runs one page through a worker flow, OCR replayed from a TSV file, and
+# prints the peak RSS the page added and the bytes it leaves behind.
+# On Linux the high-water mark is read from /proc, and reset after the
+# imports; ru_maxrss would start at the parent's peak, inherited on fork.
+PEAK_RSS_SCRIPT = """
+import os, resource, sys
+from pathlib import Path
+
+from text_recog import batch, engine, prefetch, render, segment, spatial
+from text_recog.document import PageRef
+
+flow, image, tsv_path, out_dir = sys.argv[1:]
+
+
+class ReplayEngine(engine.OCREngine):
+    name = "replay"
+
+    def image_to_tsv(self, image, lang, config=""):
+        return Path(tsv_path).read_bytes()
+
+    def version(self):
+        return "replay"
+
+
+def proc_status(field):
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+
+
+def peak():
+    if os.path.exists("/proc/self/status"):
+        return proc_status("VmHWM")
+    # Kilobytes, except on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+engine.ENGINES[ReplayEngine.name] = ReplayEngine
+os.environ[engine.ENGINE_ENV_VAR] = ReplayEngine.name
+try:
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+    before = proc_status("VmRSS")
+except OSError:
+    before = peak()
+
+ref = PageRef(Path(image))
+if flow == "gui":
+    result = prefetch.analyze_page(ref, prefetch.PageJob(ref))
+    result.overlay.render({zoom}, 0, 0, *{viewport})
+    retained = result.nbytes
+else:
+    options = batch.BatchOptions(
+        Path(out_dir), overlays_dir=Path(out_dir), engine=ReplayEngine.name
+    )
+    result = batch.process_file(ref, options)
+    assert result.ok, result.error
+    retained = 0
+
+print(peak() - before, retained)
+""".format(zoom=ZOOM, viewport=VIEWPORT)
+
+
+def record_fixtures(images: list[Path]):
+    """Run Tesseract on each image and save its TSV next to the benchmarks"""
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    for image in images:
+        tsv = MagazineLayoutAnalyzer(image, preprocessing=()).run_tesseract()
+        fixture = FIXTURES_DIR / f"{image.stem}.tsv"
+        fixture.write_bytes(tsv)
+        print(f"recorded {fixture} ({len(tsv)} bytes)")
+
+
+def scaled_page(image: Path, tsv: bytes, scale: int, work_dir: Path):
+    """The page and its TSV enlarged ``scale`` times"""
+    if scale == 1:
+        return image, tsv
+    scaled = cv2.resize(
+        cv2.imread(image.as_posix()),
+        None,
+        fx=scale,
+        fy=scale,
+        interpolation=cv2.INTER_CUBIC,
+    )
+    scaled_image = work_dir / f"{image.stem}_x{scale}.jpg"
+    cv2.imwrite(scaled_image.as_posix(), scaled)
+    matrix = np.array([[scale, 0.0, 0.0], [0.0, scale, 0.0]])
+    return scaled_image, preprocess.remap_tsv(tsv, matrix)
+
+
+def synthetic_page(n_words: int, work_dir: Path):
+    """A dense master-sized page: blank paper with synthetic OCR output"""
+    page_size = (6000, 8000)
+    image = work_dir / f"synthetic_{n_words}.jpg"
+    paper = np.full((page_size[1], page_size[0], 3), 255, dtype=np.uint8)
+    cv2.imwrite(image.as_posix(), paper)
+    return image, synthetic_tsv(n_words=n_words, page_size=page_size)
+
+
+def measure(fn, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "best_s": min(timings),
+        "median_s": statistics.median(timings),
+        "repeat": repeat,
+    }
+
+
+def bench_page(image: Path, tsv: bytes, repeat: int, out_dir: Path) -> dict:
+    """Time every offline stage on one page"""
+    stages = {}
+    analyzer = MagazineLayoutAnalyzer(image, preprocessing=())
+    stages["decode"] = measure(
+        lambda: MagazineLayoutAnalyzer(image, preprocessing=()), repeat
+    )
+
+    stages["parse"] = measure(lambda: tsv_to_layout(tsv), repeat)
+    stages["parse_pandas"] = measure(
+        lambda: layout.df_to_layout(
+            pd.read_csv(BytesIO(tsv), quoting=QUOTE_NONE, sep="\t")
+        ),
+        repeat,
+    )
+    df = pd.read_csv(BytesIO(tsv), quoting=QUOTE_NONE, sep="\t")
+    stages["df_to_layout"] = measure(lambda: layout.df_to_layout(df), repeat)
+
+    # Text is cached on the tree, so cold runs need a fresh tree every time
+    trees = [tsv_to_layout(tsv)[1] for _ in range(repeat)]
+    stages["get_text"] = measure(lambda: trees.pop().get_text(), repeat)
+    page = tsv_to_layout(tsv)[1]
+    page.get_text()
+    stages["get_text_cached"] = measure(page.get_text, repeat)
+
+    blocks = page.blocks
+    stages["overlay"] = measure(lambda: analyzer.add_block_overlay(blocks), repeat)
+    overlay = analyzer.add_block_overlay(blocks)
+
+    def render():
+        pyramid = ImagePyramid(overlay)
+        pyramid.render(ZOOM, 0, 0, *VIEWPORT)
+
+    stages["render"] = measure(render, repeat)
+
+    for format in TRANSCRIPT_FORMATS:
+        stages[f"transcript_{format}"] = measure(
+            lambda: analyzer.generate_transcript(out_dir, blocks, formats=(format,)),
+            repeat,
+        )
+
+    return {
+        "image": image.name,
+        "size": [analyzer.width, analyzer.height],
+        "words": sum(
+            len(line.words)
+            for block in blocks.values()
+            for para in block.paragraphs.values()
+            for line in para.lines.values()
+        ),
+        "stages": stages,
+    }
+
+
+def peak_rss(
+    flow: str, image: Path, tsv: bytes, low_memory: bool, work_dir: Path
+) -> dict:
+    """Peak RSS added by one page in a fresh worker, and what it keeps"""
+    tsv_path = work_dir / f"{image.stem}.tsv"
+    tsv_path.write_bytes(tsv)
+    env = dict(os.environ, TEXT_RECOG_LOW_MEMORY="1" if low_memory else "0")
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            PEAK_RSS_SCRIPT,
+            flow,
+            image.as_posix(),
+            tsv_path.as_posix(),
+            (work_dir / "memory").as_posix(),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    ).stdout
+    peak, retained = map(int, output.split())
+    return {"peak_bytes": peak, "retained_bytes": retained}
+
+
+def tesseract_available() -> bool:
+    try:
+        subprocess.run(
+            [get_tesseract_path(), "--version"], capture_output=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    return True
+
+
+def git_revision() -> str | None:
+    git = shutil.which("git")
+    if git is None:
+        return None
+    result = subprocess.run(
+        [git, "rev-parse", "--short", "HEAD"],
+        capture_output=True,
+        text=True,
+        cwd=BENCH_DIR,
+    )
+    return result.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("images", nargs="*", type=Path)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[1, 3],
+        help="enlargements of each sample to run (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--synthetic-words",
+        type=int,
+        default=8000,
+        help="words on the synthetic page, 0 to skip it (default: %(default)s)",
+    )
+    parser.add_argument("--output", type=Path, help="write results as JSON here")
+    parser.add_argument(
+        "--record", action="store_true", help="(re)record the TSV fixtures"
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="skip the peak RSS tier"
+    )
+    parser.add_argument(
+        "--no-e2e", action="store_true", help="skip the Tesseract tier"
+    )
+    args = parser.parse_args()
+
+    images = args.images or sorted(SAMPLES_DIR.glob("*.jpg"))
+    if args.record:
+        record_fixtures(images)
+        return
+
+    missing = [i for i in images if not (FIXTURES_DIR / f"{i.stem}.tsv").exists()]
+    if missing:
+        sys.exit(f"No fixture for {', '.join(map(str, missing))}, run with --record")
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "repeat": args.repeat,
+        "pages": [],
+        "peak_rss": [],
+        "end_to_end": [],
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        work_dir = Path(work_dir)
+        pages = []
+        for image in images:
+            tsv = (FIXTURES_DIR / f"{image.stem}.tsv").read_bytes()
+            for scale in args.scales:
+                pages.append((scale, *scaled_page(image, tsv, scale, work_dir)))
+        if args.synthetic_words:
+            pages.append((1, *synthetic_page(args.synthetic_words, work_dir)))
+
+        for scale, page_image, page_tsv in pages:
+            result = bench_page(page_image, page_tsv, args.repeat, work_dir)
+            result["scale"] = scale
+            results["pages"].append(result)
+
+            print(f"\n{result['image']} {result['size']} {result['words']} words")
+            for stage, timing in result["stages"].items():
+                print(f"  {stage:<20} {timing['best_s'] * 1000:10.2f} ms")
+
+        if not args.no_memory and sys.platform == "win32":
+            print("\npeak RSS: skipped, needs the resource module")
+        elif not args.no_memory:
+            print("\npeak RSS per page, MiB: normal / low-memory")
+            for scale, page_image, page_tsv in pages:
+                line = f"  {page_image.name:<40}"
+                for flow in MEMORY_FLOWS:
+                    peaks = []
+                    for low_memory in (False, True):
+                        memory = peak_rss(
+                            flow, page_image, page_tsv, low_memory, work_dir
+                        )
+                        results["peak_rss"].append(
+                            {
+                                "image": page_image.name,
+                                "scale": scale,
+                                "flow": flow,
+                                "low_memory": low_memory,
+                                **memory,
+                            }
+                        )
+                        peaks.append(memory["peak_bytes"] / 2**20)
+                    line += f" {flow} {peaks[0]:6.1f} / {peaks[1]:6.1f}"
+                print(line)
+
+        if not args.no_e2e and tesseract_available():
+            print("\nend to end (uncached OCR included)")
+            for image in images:
+                analyzer = MagazineLayoutAnalyzer(image, preprocessing=())
+
+                def end_to_end():
+                    blocks = analyzer.analyze_page().blocks
+                    analyzer.generate_transcript(work_dir, blocks)
+
+                timing = measure(end_to_end, 1)
+                results["end_to_end"].append({"image": image.name, **timing})
+                print(f"  {image.name:<40} {timing['best_s'] * 1000:10.0f} ms")
+        elif not args.no_e2e:
+            print("\nend to end: skipped, Tesseract not found")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""OCR time and mean word confidence of preprocessing pipelines on the samples.
+
+Each pipeline runs uncached on every sample; the time includes the
+preprocessing itself. Pick the fastest pipeline whose confidence holds up.
+Needs Tesseract.
+
+Usage: python benchmarks/bench_preprocess.py [--pipeline STEPS ...] [images ...]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from text_recog.engine import get_engine
+from text_recog.layout import tsv_to_layout
+from text_recog.segment import MagazineLayoutAnalyzer
+
+SAMPLES_DIR = Path(__file__).parent.parent / "samples"
+PIPELINES = (
+    "",
+    "grayscale",
+    "grayscale,despeckle",
+    "binarize",
+    "deskew,binarize",
+    "autoscale",
+    "bordercrop,deskew,binarize,despeckle",
+)
+
+
+def word_confidences(tsv: bytes) -> list[float]:
+    """Confidence of every recognised, non-blank word"""
+    return [
+        word.conf
+        for page in tsv_to_layout(tsv).values()
+        for block in page.blocks.values()
+        for para in block.paragraphs.values()
+        for line in para.lines.values()
+        for word in line.words.values()
+        if word.get_text() and word.conf >= 0
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="*", type=Path)
+    parser.add_argument(
+        "--pipeline",
+        action="append",
+        dest="pipelines",
+        help="comma separated steps, may be repeated (default: a few candidates)",
+    )
+    parser.add_argument("--engine", help="OCR engine to use")
+    args = parser.parse_args()
+
+    images = args.images or sorted(SAMPLES_DIR.glob("*.jpg"))
+    engine = get_engine(args.engine)
+
+    print(f"pages: {len(images)}, engine: {engine.name}")
+    print(f"{'pipeline':<40} {'ms/page':>9} {'words':>7} {'mean conf':>10}")
+    for pipeline in args.pipelines or PIPELINES:
+        elapsed = 0.0
+        confidences = []
+        for image in images:
+            analyzer = MagazineLayoutAnalyzer(
+                image, engine=engine, preprocessing=pipeline
+            )
+            start = time.perf_counter()
+            tsv = analyzer.run_tesseract()
+            elapsed += time.perf_counter() - start
+            confidences.extend(word_confidences(tsv))
+
+        mean_conf = sum(confidences) / len(confidences) if confidences else 0.0
+        print(
+            f"{pipeline or '(none)':<40} {elapsed / len(images) * 1000:9.0f} "
+            f"{len(confidences):7d} {mean_conf:10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Full-text search index: indexing throughput and query latency by size.
+
+Pages get words drawn from a Zipf distributed vocabulary, so the index has
+a few very common terms and a long tail of rare ones, like real text. An
+index kept with --index is only built once, so the queries can be timed
+again without rebuilding it.
+
+Usage: python benchmarks/bench_search.py [--pages 20000] [--words 400]
+       [--index FILE]
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import synthetic_tsv
+from text_recog import layout
+from text_recog.search import SearchIndex
+
+VOCABULARY_SIZE = 100_000
+NAMES = ("Wałęsa", "Kraków", "Łódź", "Żuławski", "Gdańsk")
+QUERIES = (
+    ("rare term", "lodz"),
+    ("common term", "w0"),
+    ("diacritics folded", "ŻUŁAWSKI"),
+    ("prefix", "w12*"),
+    ("common AND rare", "w0 gdansk"),
+    ("two common terms", "w0 w1"),
+    ("absent term", "nieistniejacy"),
+)
+
+
+def vocabulary() -> tuple[list[str], list[float]]:
+    """Words and their cumulative Zipf weights"""
+    words = [f"w{rank}" for rank in range(VOCABULARY_SIZE)]
+    # The names are rare, each on about one page in a hundred
+    words[5000 : 5000 + len(NAMES)] = NAMES
+    weights, total = [], 0.0
+    for rank in range(1, VOCABULARY_SIZE + 1):
+        total += 1 / rank
+        weights.append(total)
+    return words, weights
+
+
+def build(index: SearchIndex, pages: int, words_per_page: int) -> float:
+    """Index synthetic pages, returning the seconds it took"""
+    template = layout.tsv_to_layout(synthetic_tsv(n_words=words_per_page))[1]
+    words = [
+        word
+        for block in template.blocks.values()
+        for paragraph in block.paragraphs.values()
+        for line in paragraph.lines.values()
+        for word in line.words.values()
+    ]
+    vocab, weights = vocabulary()
+    rnd = random.Random(0)
+    start = time.perf_counter()
+    for page in range(pages):
+        for word, text in zip(
+            words, rnd.choices(vocab, cum_weights=weights, k=len(words))
+        ):
+            word.text = text
+        index.add_page(Path(f"issue{page // 48:05d}.pdf"), page % 48, template.blocks)
+        if page and page % 10_000 == 0:
+            print(f"  {page} pages indexed", flush=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=20_000)
+    parser.add_argument("--words", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--index", type=Path, help="index file to build or reuse")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.index or Path(tmp) / "search_index.sqlite"
+        with SearchIndex(path) as index:
+            indexed = index.db.execute("SELECT count(*) FROM pages").fetchone()[0]
+            if indexed == 0:
+                elapsed = build(index, args.pages, args.words)
+                indexed = args.pages
+                print(
+                    f"indexed {indexed} pages x {args.words} words in {elapsed:.1f}s "
+                    f"({indexed / elapsed:.0f} pages/sec)"
+                )
+            postings = index.db.execute("SELECT count(*) FROM postings").fetchone()[0]
+            print(
+                f"index: {indexed} pages, {postings} postings, "
+                f"{path.stat().st_size / 2**20:.0f} MiB"
+            )
+
+            for label, query in QUERIES:
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    hits = index.search(query)
+                    timings.append(time.perf_counter() - start)
+                print(
+                    f"{label:<20} {query!r:<16} {len(hits):4} hits "
+                    f"median {statistics.median(timings) * 1000:7.2f} ms "
+                    f"max {max(timings) * 1000:7.2f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
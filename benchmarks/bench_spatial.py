@@ -0,0 +1,103 @@
+"""Time point and rectangle queries of spatial.PageIndex against a scan of
+every element, as hit-testing a click or a selection does.
+
+Usage: python benchmarks/bench_spatial.py [--words 8000] [--queries 2000]
+"""
+
+import argparse
+import random
+import time
+
+from synthetic import synthetic_tsv
+from text_recog import layout
+from text_recog.layout import TessLayout
+from text_recog.spatial import PageIndex
+
+
+def scan_words(page: layout.Page) -> list[tuple[tuple, tuple]]:
+    """(left, top, right, bottom) and key of every word with text"""
+    return [
+        (
+            (word.left, word.top, word.left + word.width, word.top + word.height),
+            (block_num, par_num, line_num, word_num),
+        )
+        for block_num, block in page.blocks.items()
+        for par_num, para in block.paragraphs.items()
+        for line_num, line in para.lines.items()
+        for word_num, word in line.words.items()
+        if word.get_text()
+    ]
+
+
+def scan_at(words, x: float, y: float) -> list:
+    return [key for (x0, y0, x1, y1), key in words if x0 <= x < x1 and y0 <= y < y1]
+
+
+def scan_within(words, left: float, top: float, right: float, bottom: float) -> list:
+    return [
+        key
+        for (x0, y0, x1, y1), key in words
+        if x0 < right and left < x1 and y0 < bottom and top < y1
+    ]
+
+
+def per_query(fn, queries: list, repeat: int) -> float:
+    """Best mean time per query, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for query in queries:
+            fn(*query)
+        timings.append(time.perf_counter() - start)
+    return min(timings) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, default=8000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    page = layout.tsv_to_layout(synthetic_tsv(n_words=args.words))[1]
+    start = time.perf_counter()
+    index = PageIndex(page)
+    t_build = time.perf_counter() - start
+    words = scan_words(page)
+
+    rnd = random.Random(0)
+    points = [
+        (rnd.uniform(0, page.width), rnd.uniform(0, page.height))
+        for _ in range(args.queries)
+    ]
+    # Selections of a few lines across a column or so
+    rects = [
+        (x, y, x + rnd.uniform(50, 1500), y + rnd.uniform(20, 600)) for x, y in points
+    ]
+
+    for point in points[:200]:
+        found = index.at(TessLayout.WORD, *point)
+        assert sorted(found) == sorted(scan_at(words, *point)), "point queries differ"
+    for rect in rects[:200]:
+        found = index.within(TessLayout.WORD, *rect)
+        assert found == scan_within(words, *rect), "rectangle queries differ"
+
+    t_at = per_query(lambda x, y: index.at(TessLayout.WORD, x, y), points, args.repeat)
+    t_scan_at = per_query(lambda x, y: scan_at(words, x, y), points, args.repeat)
+    t_within = per_query(
+        lambda *rect: index.within(TessLayout.WORD, *rect), rects, args.repeat
+    )
+    t_scan_within = per_query(
+        lambda *rect: scan_within(words, *rect), rects, args.repeat
+    )
+
+    print(f"words: {len(words)}, queries: {args.queries}")
+    print(f"build PageIndex:     {t_build * 1000:8.1f} ms")
+    print(f"at, grid:            {t_at * 1e6:8.1f} µs")
+    print(f"at, scan:            {t_scan_at * 1e6:8.1f} µs")
+    print(f"within, grid:        {t_within * 1e6:8.1f} µs")
+    print(f"within, scan:        {t_scan_within * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Cold start of the GUI and the CLI: import time and time to first frame.
+
+Every measurement runs in a fresh interpreter. Time to first frame counts
+from interpreter start until the main window is mapped, so it includes
+Python's own start-up; it needs a display and is skipped without one.
+
+Usage: python benchmarks/bench_startup.py [--repeat 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = (
+    "text_recog.interactive_transcriber",
+    "text_recog.batch",
+    "text_recog.segment",
+)
+HEAVY_MODULES = (
+    "cv2",
+    "numpy",
+    "pandas",
+    "PIL",
+    "pytesseract",
+    "openpyxl",
+    "matplotlib",
+)
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(elapsed, ",".join(heavy))
+"""
+
+FIRST_FRAME_SCRIPT = """
+import os, time, tkinter as tk
+from text_recog.interactive_transcriber import InteractiveTranscriber
+
+root = tk.Tk()
+
+def on_map(event):
+    if event.widget is root:
+        print("mapped", flush=True)
+        # Skip the orderly shutdown, analysis threads may be busy
+        os._exit(0)
+
+root.bind("<Map>", on_map)
+InteractiveTranscriber(root)
+root.mainloop()
+"""
+
+
+def run_python(script: str) -> tuple[float, str]:
+    """Run a script in a fresh interpreter, returning wall time and stdout"""
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    ).stdout
+    return time.perf_counter() - start, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    interpreter = min(run_python("pass")[0] for _ in range(args.repeat))
+    print(f"{'bare interpreter':<44} {interpreter * 1000:8.0f} ms")
+
+    for module in MODULES:
+        timings = []
+        for _ in range(args.repeat):
+            _, output = run_python(
+                IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+            )
+            elapsed, _, heavy = output.strip().partition(" ")
+            timings.append(float(elapsed))
+        loaded = heavy or "-"
+        print(
+            f"import {module:<37} {statistics.median(timings) * 1000:8.0f} ms"
+            f"   heavy modules loaded: {loaded}"
+        )
+
+    if sys.platform != "win32" and not os.environ.get("DISPLAY"):
+        print("time to first frame: skipped, no display")
+        return
+    timings = [run_python(FIRST_FRAME_SCRIPT)[0] for _ in range(args.repeat)]
+    print(f"{'time to first frame':<44} {statistics.median(timings) * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Synthetic Tesseract image_to_data output for benchmarks"""
+
+import random
+
+TSV_HEADER = (
+    "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num"
+    "\tleft\ttop\twidth\theight\tconf\ttext"
+)
+
+VOCABULARY = (
+    "Wałęsa",
+    "żółw",
+    "Kraków",
+    "Łódź",
+    "prasa",
+    "gazeta",
+    "źródło",
+    "się",
+    "jest",
+    "und",
+    "der",
+    "the",
+    "1996",
+    "w",
+    "i",
+    "z",
+)
+
+
+def synthetic_tsv(
+    n_words: int = 8000,
+    words_per_line: int = 8,
+    lines_per_para: int = 6,
+    paras_per_block: int = 3,
+    page_size: tuple[int, int] = (6000, 8000),
+    seed: int = 0,
+) -> bytes:
+    """Generate a plausible dense newspaper page as Tesseract TSV bytes.
+
+    Roughly one word in fifty is left blank, as Tesseract does for specks.
+    """
+    rnd = random.Random(seed)
+    page_width, page_height = page_size
+    rows = [TSV_HEADER, f"1\t1\t0\t0\t0\t0\t0\t0\t{page_width}\t{page_height}\t-1\t"]
+
+    words_per_block = words_per_line * lines_per_para * paras_per_block
+    n_blocks = max(1, -(-n_words // words_per_block))
+    columns = max(1, int(n_blocks**0.5))
+    block_width = page_width // columns
+    block_height = page_height // -(-n_blocks // columns)
+    line_height = max(1, block_height // (lines_per_para * paras_per_block + 1))
+    word_width = max(1, block_width // (words_per_line + 1))
+
+    emitted = 0
+    for block_num in range(1, n_blocks + 1):
+        block_left = ((block_num - 1) % columns) * block_width
+        block_top = ((block_num - 1) // columns) * block_height
+        rows.append(
+            f"2\t1\t{block_num}\t0\t0\t0\t{block_left}\t{block_top}"
+            f"\t{block_width}\t{block_height}\t-1\t"
+        )
+        for par_num in range(1, paras_per_block + 1):
+            par_top = block_top + (par_num - 1) * lines_per_para * line_height
+            rows.append(
+                f"3\t1\t{block_num}\t{par_num}\t0\t0\t{block_left}\t{par_top}"
+                f"\t{block_width}\t{lines_per_para * line_height}\t-1\t"
+            )
+            for line_num in range(1, lines_per_para + 1):
+                line_top = par_top + (line_num - 1) * line_height
+                rows.append(
+                    f"4\t1\t{block_num}\t{par_num}\t{line_num}\t0\t{block_left}"
+                    f"\t{line_top}\t{block_width}\t{line_height}\t-1\t"
+                )
+                for word_num in range(1, words_per_line + 1):
+                    if emitted >= n_words:
+                        break
+                    emitted += 1
+                    text = "" if rnd.random() < 0.02 else rnd.choice(VOCABULARY)
+                    rows.append(
+                        f"5\t1\t{block_num}\t{par_num}\t{line_num}\t{word_num}"
+                        f"\t{block_left + (word_num - 1) * word_width}\t{line_top}"
+                        f"\t{word_width - 4}\t{line_height - 4}"
+                        f"\t{rnd.uniform(20, 97):.6f}\t{text}"
+                    )
+    return ("\n".join(rows) + "\n").encode("utf-8")
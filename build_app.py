@@ -40,7 +40,6 @@ def build_executable():
         "--hidden-import=cv2",
         "--hidden-import=PIL",
         "--hidden-import=pytesseract",
-        "--hidden-import=pandas",
         "--hidden-import=matplotlib",
         "--hidden-import=openpyxl",
         "--hidden-import=tkinter",
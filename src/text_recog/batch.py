@@ -0,0 +1,588 @@
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+from text_recog import search
+from text_recog.cache import OCRCache, default_cache_dir
+from text_recog.corpus import (
+    CORPUS_FORMATS,
+    DEFAULT_CORPUS_FORMATS,
+    CorpusWriter,
+    transcript_records,
+)
+from text_recog.document import PageRef, expand_pages
+from text_recog.engine import ENGINE_ENV_VAR, ENGINES
+from text_recog.manifest import MANIFEST_NAME, Manifest, run_params
+from text_recog.metrics import (
+    TRACE_ENV_VAR,
+    Metrics,
+    Span,
+    TraceWriter,
+    default_trace_path,
+    format_timings,
+    stage_totals,
+)
+
+DEFAULT_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.tif", "*.tiff", "*.pdf")
+DEFAULT_FORMATS = ("json", "csv", "excel", "text")
+# "search" is opt-in, all pages go through one index and its write lock
+TRANSCRIPT_FORMATS = (*DEFAULT_FORMATS, "search")
+# Times a failing page is tried before it is given up on
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+@dataclass(frozen=True)
+class BatchOptions:
+    transcripts_dir: Path
+    overlays_dir: Path | None = None
+    formats: tuple[str, ...] = DEFAULT_FORMATS
+    ignore_blank_blocks: bool = True
+    cache_dir: Path | None = None
+    engine: str | None = None
+    preprocessing: tuple[str, ...] | None = None
+    low_memory: bool | None = None
+    # Send block records back to the parent, for the corpus files
+    collect_records: bool = False
+
+
+@dataclass
+class FileResult:
+    ref: PageRef
+    pages: int = 0
+    blocks: int = 0
+    outputs: dict[str, Path] = field(default_factory=dict)
+    records: list[dict] = field(default_factory=list)
+    spans: list[Span] = field(default_factory=list)
+    error: str | None = None
+    elapsed: float = 0.0
+    # Watch mode: seconds from the file changing to its result
+    latency: float | None = None
+    # Size and mtime_ns of the file when it was read, and its content hash
+    stat: tuple[int, int] | None = None
+    digest: str | None = None
+    # Times the page has been tried, as counted by the manifest
+    attempts: int = 1
+    # Search postings of the page, for the parent to index, with "search"
+    postings: list[tuple] | None = None
+
+    @property
+    def path(self) -> Path:
+        return self.ref.path
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@lru_cache(maxsize=None)
+def _worker_cache(cache_dir: Path) -> OCRCache:
+    """One cache handle per worker process, so its size estimate is reused"""
+    return OCRCache(cache_dir)
+
+
+def process_file(ref: PageRef, options: BatchOptions) -> FileResult:
+    """Analyze one page and write its outputs, never raising.
+
+    Runs inside a pool worker: any failure is captured in the result so that
+    one bad scan cannot take the rest of the batch down with it. Only this
+    page of a document is decoded, so its other pages can be handled by
+    other workers at the same time.
+    """
+    from text_recog.engine import get_engine
+    from text_recog.segment import MagazineLayoutAnalyzer
+
+    start = time.perf_counter()
+    result = FileResult(ref)
+    metrics = Metrics()
+    try:
+        stat = ref.path.stat()
+        result.stat = stat.st_size, stat.st_mtime_ns
+        cache = _worker_cache(options.cache_dir) if options.cache_dir else None
+        analyzer = MagazineLayoutAnalyzer(
+            ref.path,
+            cache=cache,
+            engine=get_engine(options.engine),
+            preprocessing=options.preprocessing,
+            metrics=metrics,
+            page=ref.page,
+            low_memory=options.low_memory,
+        )
+        blocks = analyzer.analyze_page().blocks
+        if options.overlays_dir is None:
+            # Nothing needs the pixels past OCR
+            analyzer.release()
+
+        result.pages = 1
+        result.blocks = len(blocks)
+        result.digest = analyzer.image_digest
+        # The parent indexes the page, workers would queue on the index
+        formats = [format for format in options.formats if format != "search"]
+        if formats:
+            result.outputs.update(
+                analyzer.generate_transcript(
+                    options.transcripts_dir,
+                    blocks,
+                    ignore_blank_blocks=options.ignore_blank_blocks,
+                    formats=formats,
+                )
+            )
+        if "search" in options.formats:
+            result.postings = search.page_postings(blocks)
+        if options.collect_records:
+            result.records = transcript_records(blocks, options.ignore_blank_blocks)
+
+        if options.overlays_dir is not None:
+            import cv2
+
+            options.overlays_dir.mkdir(parents=True, exist_ok=True)
+            overlay_path = options.overlays_dir / f"{analyzer.stem}_overlay.jpg"
+            overlay = analyzer.add_block_overlay(blocks)
+            with analyzer.stage("imwrite"):
+                cv2.imwrite(overlay_path.as_posix(), overlay)
+            result.outputs["overlay"] = overlay_path
+
+    except Exception:
+        result.error = traceback.format_exc()
+
+    result.spans = metrics.spans()
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def collect_images(
+    inputs: Iterable[Path], patterns: Sequence[str] = DEFAULT_PATTERNS
+) -> list[Path]:
+    """Expand directories into the image files they contain, in sorted order"""
+    files = []
+    for path in inputs:
+        if path.is_dir():
+            found = {file for pattern in patterns for file in path.glob(pattern)}
+            files.extend(sorted(found))
+        elif path.exists():
+            files.append(path)
+        else:
+            print(f"warning: {path} does not exist, skipping", file=sys.stderr)
+    return files
+
+
+def collect_pages(files: Iterable[Path]) -> tuple[list[PageRef], list[FileResult]]:
+    """Expand documents into their pages.
+
+    :return: the pages, and a failed result for each file that could not
+        be opened
+    """
+    pages, failed = [], []
+    for path in files:
+        try:
+            pages.extend(expand_pages(path))
+        except (OSError, ValueError, ImportError):
+            failed.append(FileResult(PageRef(path), error=traceback.format_exc()))
+    return pages, failed
+
+
+def run_batch(
+    pages: Sequence[PageRef],
+    options: BatchOptions,
+    workers: int | None = None,
+    ordered: bool = True,
+) -> Iterator[FileResult]:
+    """Fan pages out over a process pool and yield their results.
+
+    :param ordered: yield results in input order rather than as they finish
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures: dict[Future, PageRef] = {
+            executor.submit(process_file, ref, options): ref for ref in pages
+        }
+        pending = futures if ordered else as_completed(futures)
+        for future in pending:
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                # A worker died outright (e.g. killed for running out of
+                # memory); report the file instead of aborting the batch
+                yield FileResult(futures[future], error="worker process died")
+
+
+def run_with_retries(
+    pages: Sequence[PageRef],
+    options: BatchOptions,
+    manifest: Manifest,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    workers: int | None = None,
+    ordered: bool = True,
+) -> Iterator[FileResult]:
+    """``run_batch``, recording every result in the manifest as it comes in.
+
+    Pages that failed run again, in a fresh pool, until they succeed or have
+    been tried ``max_attempts`` times, earlier runs included. Failed results
+    are yielded whether or not they will be retried; ``attempts`` tells.
+    """
+    while pages:
+        retry = []
+        for result in run_batch(pages, options, workers, ordered):
+            result.attempts = manifest.record(result)
+            if not result.ok and result.attempts < max_attempts:
+                retry.append(result.ref)
+            yield result
+        pages = retry
+
+
+def _stop_on_signals(stop: threading.Event):
+    """Let Ctrl-C and SIGTERM finish the pages in progress, a second Ctrl-C
+    interrupts right away"""
+
+    def handler(signum, frame):
+        if stop.is_set():
+            raise KeyboardInterrupt
+        print("Stopping once the pages in progress are done", file=sys.stderr)
+        stop.set()
+
+    signal.signal(signal.SIGINT, handler)
+    signal.signal(signal.SIGTERM, handler)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Headless batch transcription of magazine scans"""
+    # Imports this module, so not at the top
+    from text_recog import watch
+
+    parser = argparse.ArgumentParser(
+        prog="polish-magazine-transcriber",
+        description="Transcribe directories of magazine scans without the GUI.",
+    )
+    parser.add_argument(
+        "inputs", nargs="+", type=Path, help="image files or directories of images"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=Path("outputs/transcripts"),
+        help="directory for transcripts (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="number of worker processes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="report results as they finish instead of in input order",
+    )
+    parser.add_argument(
+        "--overlays",
+        type=Path,
+        metavar="DIR",
+        help="also render block overlays into DIR",
+    )
+    parser.add_argument(
+        "--formats",
+        nargs="*",
+        choices=TRANSCRIPT_FORMATS,
+        help="per-page transcript formats to write, search adds the pages to "
+        f"{search.INDEX_NAME} in the output directory "
+        f"(default: {' '.join(DEFAULT_FORMATS)}, or none with --corpus)",
+    )
+    parser.add_argument(
+        "--corpus",
+        type=Path,
+        metavar="DIR",
+        help="also stream every block of every page into single corpus files in DIR",
+    )
+    parser.add_argument(
+        "--corpus-formats",
+        nargs="+",
+        choices=CORPUS_FORMATS,
+        default=list(DEFAULT_CORPUS_FORMATS),
+        help="corpus formats to write (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--pattern",
+        action="append",
+        dest="patterns",
+        help="glob used inside directories, may be repeated (default: images)",
+    )
+    parser.add_argument(
+        "--keep-blank-blocks",
+        action="store_true",
+        help="include blocks without any text in the transcripts",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="always re-run Tesseract"
+    )
+    parser.add_argument(
+        "--engine",
+        choices=sorted(ENGINES),
+        help=f"OCR backend (default: ${ENGINE_ENV_VAR} or subprocess)",
+    )
+    parser.add_argument(
+        "--preprocess",
+        metavar="STEPS",
+        help="comma separated steps applied before OCR, e.g. deskew,binarize "
+        "(default: $TEXT_RECOG_PREPROCESS or none)",
+    )
+    parser.add_argument(
+        "--low-memory",
+        action="store_true",
+        default=None,
+        help="decode pages only when their pixels are needed and draw overlays "
+        "without copying them, to fit more workers per node "
+        "(default: $TEXT_RECOG_LOW_MEMORY or off)",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        metavar="FILE",
+        help="SQLite record of the pages processed, to resume interrupted runs "
+        f"(default: {MANIFEST_NAME} in the output directory)",
+    )
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="process every page again, even those the manifest has done",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=DEFAULT_MAX_ATTEMPTS,
+        metavar="N",
+        help="times a failing page is tried, across runs, before it is skipped "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running, transcribing new and changed files in the input "
+        "directories as they appear, until interrupted",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=watch.SETTLE_SECONDS,
+        metavar="SECONDS",
+        help="with --watch, how long a file must stay unchanged before it is "
+        "read, so files still being copied are skipped (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--poll",
+        type=float,
+        default=watch.POLL_INTERVAL,
+        metavar="SECONDS",
+        help="with --watch, seconds between scans when file system events are "
+        "unavailable (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        metavar="FILE",
+        default=default_trace_path(),
+        help="write per-page stage timings to FILE, as a Chrome trace if it "
+        f"ends in .json, JSON Lines otherwise (default: ${TRACE_ENV_VAR} or none)",
+    )
+    args = parser.parse_args(argv)
+
+    preprocessing = None
+    if args.preprocess is not None:
+        # OpenCV is only loaded here when needed, the workers do the work
+        from text_recog.preprocess import parse_pipeline
+
+        try:
+            preprocessing = parse_pipeline(args.preprocess)
+        except ValueError as e:
+            parser.error(str(e))
+
+    patterns = args.patterns or DEFAULT_PATTERNS
+    if args.watch:
+        if not_dirs := [str(path) for path in args.inputs if not path.is_dir()]:
+            parser.error(f"--watch needs directories: {', '.join(not_dirs)}")
+        if args.overlays is not None and args.overlays.resolve() in {
+            path.resolve() for path in args.inputs
+        }:
+            parser.error("--overlays must not be a watched directory")
+        files, pages, unreadable = [], [], []
+    else:
+        files = collect_images(args.inputs, patterns)
+        if not files:
+            print("No images found", file=sys.stderr)
+            return 1
+        pages, unreadable = collect_pages(files)
+    for result in unreadable:
+        print(f"{result.path}: FAILED\n{result.error}", file=sys.stderr)
+
+    formats = args.formats
+    if formats is None:
+        # Per-page files are rarely wanted on top of a corpus
+        formats = [] if args.corpus else DEFAULT_FORMATS
+
+    options = BatchOptions(
+        transcripts_dir=args.output,
+        overlays_dir=args.overlays,
+        formats=tuple(formats),
+        ignore_blank_blocks=not args.keep_blank_blocks,
+        cache_dir=None if args.no_cache else default_cache_dir(),
+        engine=args.engine,
+        preprocessing=preprocessing,
+        low_memory=args.low_memory,
+        collect_records=args.corpus is not None,
+    )
+    manifest = Manifest(
+        args.manifest or args.output / MANIFEST_NAME,
+        run_params(options),
+        resume=not args.no_resume,
+    )
+    for result in unreadable:
+        manifest.record(result)
+    # The corpus is written afresh each run, so it needs every page
+    skip_done = args.corpus is None
+    done_before = gave_up = 0
+    if not args.no_resume:
+        todo = []
+        for ref in pages:
+            reason = manifest.skip_reason(ref, args.max_attempts)
+            if reason == "done" and skip_done:
+                done_before += 1
+            elif reason == "failed":
+                gave_up += 1
+            else:
+                todo.append(ref)
+        skipped = []
+        if done_before:
+            skipped.append(f"{done_before} pages done before")
+        if gave_up:
+            skipped.append(f"{gave_up} that failed {args.max_attempts} times")
+        if skipped:
+            print(f"Resuming from {manifest.path}, skipping {' and '.join(skipped)}")
+        pages = todo
+
+    corpus = (
+        CorpusWriter(args.corpus, args.corpus_formats) if args.corpus else None
+    )
+    trace = TraceWriter(args.trace) if args.trace else None
+    index = None
+    if "search" in options.formats:
+        index = search.SearchIndex(args.output / search.INDEX_NAME)
+
+    if args.watch:
+        stop = threading.Event()
+        _stop_on_signals(stop)
+        print(f"Watching {', '.join(map(str, args.inputs))}, Ctrl-C to stop")
+        results = watch.watch(
+            args.inputs,
+            options,
+            args.workers,
+            patterns,
+            settle=args.settle,
+            poll=args.poll,
+            stop=stop,
+            manifest=manifest,
+            max_attempts=args.max_attempts,
+            skip_done=skip_done and not args.no_resume,
+        )
+    else:
+        results = run_with_retries(
+            pages,
+            options,
+            manifest,
+            args.max_attempts,
+            args.workers,
+            ordered=not args.unordered,
+        )
+
+    start = time.perf_counter()
+    done = done_pages = 0
+    failures = len(unreadable) + gave_up
+    # Seconds spent in each stage, summed over all workers
+    stage_seconds: dict[str, float] = {}
+    latencies = []
+    try:
+        for result in results:
+            for name, seconds in stage_totals(result.spans).items():
+                stage_seconds[name] = stage_seconds.get(name, 0.0) + seconds
+            if trace is not None:
+                trace.write_page(result.ref.id, result.spans)
+            retrying = not args.watch and result.attempts < args.max_attempts
+            if not result.ok and retrying:
+                error = result.error.strip().splitlines()[-1]
+                print(
+                    f"{result.path}: attempt {result.attempts} of "
+                    f"{args.max_attempts} failed, will retry: {error}",
+                    file=sys.stderr,
+                )
+                continue
+            done += 1
+            if args.watch:
+                prefix = f"[{done}] {result.path}"
+                latencies.append(result.latency)
+            else:
+                prefix = f"[{done}/{len(pages)}] {result.path}"
+            if result.ref.page is not None:
+                prefix += f" page {result.ref.page + 1}/{result.ref.count}"
+            if result.ok:
+                done_pages += result.pages
+                if corpus is not None:
+                    page_number = 1 if result.ref.page is None else result.ref.page + 1
+                    corpus.write_page(str(result.path), page_number, result.records)
+                if index is not None and result.postings is not None:
+                    index.add_postings(result.path, result.ref.page, result.postings)
+                    result.outputs["search"] = index.path
+                message = f"{prefix}: {result.blocks} blocks in {result.elapsed:.1f}s"
+                if result.latency is not None:
+                    message += f", {result.latency:.1f}s after the file changed"
+                print(message, flush=True)
+            else:
+                failures += 1
+                print(f"{prefix}: FAILED\n{result.error}", file=sys.stderr)
+    finally:
+        # Whatever was written so far stays usable if the run is interrupted
+        manifest.close()
+        if corpus is not None:
+            corpus.close()
+        if trace is not None:
+            trace.close()
+        if index is not None:
+            index.close()
+
+    elapsed = time.perf_counter() - start
+    if corpus is not None:
+        for corpus_path in corpus.paths.values():
+            print(f"Corpus: {corpus_path}")
+    print("\n=== BATCH SUMMARY ===")
+    if args.watch:
+        print(f"Pages: {len(latencies)} ({failures} failed)")
+    else:
+        print(
+            f"Files: {len(files)}, pages: {len(pages) + done_before + gave_up} "
+            f"({failures} failed, {done_before} done before)"
+        )
+    print(
+        f"Done: {done_pages} pages in {elapsed:.1f}s "
+        f"({done_pages / max(elapsed, 1e-9):.2f} pages/sec)"
+    )
+    if stage_seconds:
+        print(f"Stages: {format_timings(stage_seconds)}")
+    if latencies:
+        print(
+            f"Latency from file change to transcript: "
+            f"mean {sum(latencies) / len(latencies):.1f}s, max {max(latencies):.1f}s"
+        )
+    if trace is not None:
+        print(f"Trace: {trace.path}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Sequence
+
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MiB
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60  # 30 days, in seconds
+CACHE_SUFFIX = ".tsv.gz"
+
+
+def default_cache_dir() -> Path:
+    """Location of the OCR cache, overridable with TEXT_RECOG_CACHE_DIR"""
+    if env_dir := os.environ.get("TEXT_RECOG_CACHE_DIR"):
+        return Path(env_dir)
+    base_dir = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base_dir) / "polish-magazine-text-recog" / "ocr"
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Hash the raw bytes of a file, without decoding it"""
+    digest = hashlib.blake2b(digest_size=20)
+    with path.open("rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OCRCache:
+    """Content-addressed on-disk store of Tesseract ``image_to_data`` output.
+
+    Entries hold the raw TSV emitted by Tesseract, gzip-compressed, so any
+    consumer (pandas or otherwise) can rebuild exactly what a fresh run would
+    have produced. The modification time of an entry doubles as its last-use
+    time: hits refresh it, and eviction drops expired entries first, then the
+    least recently used ones until the cache fits in ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path | None = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age: float = DEFAULT_MAX_AGE,
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # Running estimate of the cache size, computed on first write. The
+        # GUI's prefetch and thumbnail threads share one cache
+        self._size: int | None = None
+        self._size_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(image_digest: str, lang: str, version: str, config: str = "") -> str:
+        """Combine everything that influences the Tesseract output into a key"""
+        digest = hashlib.blake2b(digest_size=20)
+        for part in (image_digest, lang, version, config):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @staticmethod
+    def page_key(
+        image_digest: str,
+        lang: str,
+        version: str,
+        config: str = "",
+        page: str | None = None,
+        preprocessing: Sequence[str] = (),
+    ) -> str:
+        """Key of the OCR result of a page, or of a region of it described in
+        ``config``: ``page`` tells the pages of a document apart, as
+        ``document.page_cache_key`` does, and ``preprocessing`` lists the
+        steps run before OCR"""
+        if page is not None:
+            config += f" {page}"
+        if preprocessing:
+            config += f" preprocess={','.join(preprocessing)}"
+        return OCRCache.make_key(image_digest, lang, version, config)
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}{CACHE_SUFFIX}"
+
+    def _entries(self):
+        return self.cache_dir.glob(f"*/*{CACHE_SUFFIX}")
+
+    def __contains__(self, key: str) -> bool:
+        return self._entry_path(key).exists()
+
+    def get(self, key: str) -> bytes | None:
+        """Return the cached TSV for ``key``, or None on a miss"""
+        path = self._entry_path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+                return None
+            data = gzip.decompress(path.read_bytes())
+            os.utime(path)
+        except (OSError, EOFError, gzip.BadGzipFile):
+            # Missing, expired between the checks or truncated by a crash
+            return None
+        return data
+
+    def put(self, key: str, tsv: bytes):
+        """Store the TSV for ``key``, evicting old entries if over budget"""
+        path = self._entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = gzip.compress(tsv, compresslevel=6)
+
+        # Write atomically so concurrent readers never see a partial entry;
+        # the threads of a process share the cache, so each needs a file
+        tmp_path = path.with_name(
+            f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        tmp_path.write_bytes(payload)
+        os.replace(tmp_path, path)
+
+        with self._size_lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._stat_entries())
+            else:
+                self._size += len(payload)
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def _stat_entries(self) -> list[tuple[float, int, Path]]:
+        """Modification time, size and path of every entry, skipping those
+        removed meanwhile by another process"""
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        return entries
+
+    def evict(self) -> int:
+        """Drop expired entries, then the oldest ones until under max_bytes.
+
+        :return: the number of entries removed
+        """
+        # Held throughout, so sizes added meanwhile are not lost
+        with self._size_lock:
+            now = time.time()
+            entries = sorted(self._stat_entries())
+
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for mtime, size, entry in entries:
+                if total <= self.max_bytes and now - mtime <= self.max_age:
+                    continue
+                entry.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+
+            self._size = total
+        return removed
+
+    def clear(self):
+        """Remove every entry from the cache"""
+        with self._size_lock:
+            for entry in self._entries():
+                entry.unlink(missing_ok=True)
+            self._size = 0
@@ -0,0 +1,336 @@
+import numpy as np
+
+from text_recog import layout
+from text_recog.layout import LAYOUT_COLUMNS, TessLayout
+
+
+class PageRows:
+    """Rows of a CompactPage as they are collected, in document order.
+
+    A row stays open until one at its level or above comes along, which is
+    when its ``end`` is known.
+    """
+
+    def __init__(self):
+        self.levels: list[int] = []
+        self.ids: list[tuple[int, int, int, int]] = []
+        self.boxes: list[tuple[int, int, int, int]] = []
+        self.ends: list[int] = []
+        self.conf: list[float] = []
+        self.texts: list[str] = []
+        self._open: list[int] = []
+
+    def add(
+        self,
+        level: int,
+        ids: tuple[int, int, int, int],
+        box: tuple[int, int, int, int],
+        conf: float = -1,
+        text: str = "",
+    ):
+        row = len(self.levels)
+        while self._open and self.levels[self._open[-1]] >= level:
+            self.ends[self._open.pop()] = row
+        self._open.append(row)
+        self.levels.append(level)
+        self.ids.append(ids)
+        self.boxes.append(box)
+        self.ends.append(0)
+        self.conf.append(conf)
+        self.texts.append(text)
+
+    def close(self):
+        for row in self._open:
+            self.ends[row] = len(self.levels)
+        self._open.clear()
+
+
+class CompactPage:
+    """Columnar, read-only store of one page of the layout tree.
+
+    Every block, paragraph, line and word is one row, in document order, so
+    the descendants of a row are the contiguous rows up to ``ends[row]``.
+    Boxes and Tesseract ids are int32, confidences float32, and all word
+    text lives in a single string sliced by offsets. Views over the rows
+    expose the same attributes and ``get_text`` as the layout classes.
+
+    Blocks OCRed again are the exception: ``replace_block`` keeps them as
+    regular layout blocks, returned in place of their views.
+
+    The block views and their text are made once and kept, as the GUI reads
+    them several times for every page it shows.
+    """
+
+    __slots__ = (
+        "left",
+        "top",
+        "width",
+        "height",
+        "levels",
+        "ids",
+        "boxes",
+        "ends",
+        "conf",
+        "text",
+        "text_offsets",
+        "replaced",
+        "_blocks",
+        "_block_texts",
+    )
+
+    def __init__(self, left: int, top: int, width: int, height: int, rows: PageRows):
+        self.left, self.top = left, top
+        self.width, self.height = width, height
+        rows.close()
+        self.levels = np.array(rows.levels, dtype=np.int8)
+        self.ids = np.array(rows.ids, dtype=np.int32).reshape(-1, 4)
+        self.boxes = np.array(rows.boxes, dtype=np.int32).reshape(-1, 4)
+        self.ends = np.array(rows.ends, dtype=np.int32)
+        self.conf = np.array(rows.conf, dtype=np.float32)
+        self.text = "".join(rows.texts)
+        self.text_offsets = np.cumsum(
+            [0] + [len(text) for text in rows.texts], dtype=np.int32
+        )
+        self.replaced: dict[int, layout.Block] = {}
+        self._blocks: dict[int, BlockView | layout.Block] | None = None
+        # Text of the block views, by row
+        self._block_texts: dict[int, str] = {}
+
+    @classmethod
+    def from_page(cls, page: layout.Page) -> "CompactPage":
+        """Compact copy of a page of the layout tree"""
+        rows = PageRows()
+
+        def add(element: layout.Element, ids, conf=-1, text=""):
+            box = (element.left, element.top, element.width, element.height)
+            rows.add(element.level.value, ids, box, conf, text)
+
+        for block_num, block in sorted(page.blocks.items()):
+            add(block, (block_num, 0, 0, 0))
+            for par_num, para in sorted(block.paragraphs.items()):
+                add(para, (block_num, par_num, 0, 0))
+                for line_num, line in sorted(para.lines.items()):
+                    add(line, (block_num, par_num, line_num, 0))
+                    for word_num, word in sorted(line.words.items()):
+                        add(
+                            word,
+                            (block_num, par_num, line_num, word_num),
+                            word.conf,
+                            word.get_text(),
+                        )
+        return cls(page.left, page.top, page.width, page.height, rows)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the arrays and the text"""
+        arrays = (
+            self.levels,
+            self.ids,
+            self.boxes,
+            self.ends,
+            self.conf,
+            self.text_offsets,
+        )
+        return sum(array.nbytes for array in arrays) + len(self.text.encode())
+
+    def _children(self, start: int, stop: int) -> list[int]:
+        rows = []
+        row = start
+        while row < stop:
+            rows.append(row)
+            row = int(self.ends[row])
+        return rows
+
+    @property
+    def blocks(self) -> dict[int, "BlockView | layout.Block"]:
+        if self._blocks is None:
+            blocks = {}
+            for row in self._children(0, len(self.levels)):
+                block_num = int(self.ids[row, 0])
+                blocks[block_num] = self.replaced.get(block_num) or BlockView(
+                    self, row
+                )
+            self._blocks = blocks
+        # A copy, callers are free to change theirs
+        return dict(self._blocks)
+
+    def replace_block(
+        self, block_num: int, paragraphs: dict[int, layout.Paragraph]
+    ) -> layout.Block:
+        """Swap the content of a block for new paragraphs, e.g. from a fresh
+        OCR of its region, returning the block now in its place"""
+        old = self.blocks[block_num]
+        block = layout.Block(old.left, old.top, old.width, old.height)
+        block.replace_children(paragraphs)
+        self.replaced[block_num] = block
+        if self._blocks is not None:
+            self._blocks[block_num] = block
+        if isinstance(old, BlockView):
+            self._block_texts.pop(old.row, None)
+        return block
+
+    def get_text(self) -> str:
+        block_texts = []
+        for _, block in sorted(self.blocks.items()):
+            block_text = block.get_text()
+            if block_text:
+                block_texts.append(block_text)
+        return "\n\n".join(block_texts)
+
+
+class RowView:
+    """A single row of a CompactPage, seen as a layout element"""
+
+    __slots__ = ("page", "row")
+    level: TessLayout
+
+    def __init__(self, page: CompactPage, row: int):
+        self.page = page
+        self.row = row
+
+    @property
+    def left(self) -> int:
+        return int(self.page.boxes[self.row, 0])
+
+    @property
+    def top(self) -> int:
+        return int(self.page.boxes[self.row, 1])
+
+    @property
+    def width(self) -> int:
+        return int(self.page.boxes[self.row, 2])
+
+    @property
+    def height(self) -> int:
+        return int(self.page.boxes[self.row, 3])
+
+    def _children(self, id_column: int) -> dict[int, "RowView"]:
+        child_class = VIEW_CLASSES[self.level.value + 1]
+        return {
+            int(self.page.ids[row, id_column]): child_class(self.page, row)
+            for row in self.page._children(self.row + 1, int(self.page.ends[self.row]))
+        }
+
+    def _join_children(self, children: dict[int, "RowView"], separator: str) -> str:
+        texts = []
+        for _, child in sorted(children.items()):
+            text = child.get_text()
+            if text:
+                texts.append(text)
+        return separator.join(texts)
+
+    def __repr__(self):
+        return (
+            f"{type(self).__name__}(left={self.left}, top={self.top}, "
+            f"width={self.width}, height={self.height})"
+        )
+
+
+class WordView(RowView):
+    __slots__ = ()
+    level = TessLayout.WORD
+
+    @property
+    def conf(self) -> float:
+        return float(self.page.conf[self.row])
+
+    @property
+    def text(self) -> str:
+        offsets = self.page.text_offsets
+        return self.page.text[offsets[self.row] : offsets[self.row + 1]]
+
+    def get_text(self) -> str:
+        return self.text
+
+
+class LineView(RowView):
+    __slots__ = ()
+    level = TessLayout.LINE
+
+    @property
+    def words(self) -> dict[int, WordView]:
+        return self._children(3)
+
+    def get_text(self) -> str:
+        return self._join_children(self.words, " ")
+
+
+class ParagraphView(RowView):
+    __slots__ = ()
+    level = TessLayout.PARA
+
+    @property
+    def lines(self) -> dict[int, LineView]:
+        return self._children(2)
+
+    def get_text(self) -> str:
+        return self._join_children(self.lines, "\n")
+
+
+class BlockView(RowView):
+    __slots__ = ()
+    level = TessLayout.BLOCK
+
+    @property
+    def paragraphs(self) -> dict[int, ParagraphView]:
+        return self._children(1)
+
+    def get_text(self) -> str:
+        """Text of the block, joined once and kept on the page"""
+        texts = self.page._block_texts
+        text = texts.get(self.row)
+        if text is None:
+            text = texts[self.row] = self._join_children(self.paragraphs, "\n\n")
+        return text
+
+
+VIEW_CLASSES = {
+    TessLayout.BLOCK.value: BlockView,
+    TessLayout.PARA.value: ParagraphView,
+    TessLayout.LINE.value: LineView,
+    TessLayout.WORD.value: WordView,
+}
+
+
+def compact_layout(pages: dict[int, layout.Page]) -> dict[int, CompactPage]:
+    """Convert a layout tree, as built by df_to_layout, to compact pages"""
+    return {page_num: CompactPage.from_page(page) for page_num, page in pages.items()}
+
+
+def tsv_to_compact(tsv: bytes) -> dict[int, CompactPage]:
+    """Compact pages straight from raw image_to_data TSV, without building
+    the layout tree first.
+
+    The same single pass over the rows as ``layout.tsv_to_layout``. Word
+    text is stored as ``Word.get_text`` returns it, stripped.
+    """
+    text = tsv.decode("utf-8", errors="replace").replace("\r\n", "\n")
+    lines = text.split("\n")
+    header = lines[0].split("\t")
+    if header != list(LAYOUT_COLUMNS):
+        raise ValueError(f"Not image_to_data TSV, unexpected header: {header}")
+    n_fields = len(LAYOUT_COLUMNS)
+    page_level = TessLayout.PAGE.value
+    word_level = TessLayout.WORD.value
+
+    boxes: dict[int, tuple[int, int, int, int]] = {}
+    rows: dict[int, PageRows] = {}
+    for row in lines[1:]:
+        fields = row.split("\t", n_fields - 1)
+        if len(fields) != n_fields:
+            continue  # Blank trailing line
+        level, page_num, *numbers = map(int, fields[:10])
+        box = tuple(numbers[4:])
+        if level == page_level:
+            boxes[page_num] = box
+            rows[page_num] = PageRows()
+        elif level == word_level:
+            rows[page_num].add(
+                level, tuple(numbers[:4]), box, float(fields[10]), fields[11].strip()
+            )
+        else:
+            rows[page_num].add(level, tuple(numbers[:4]), box)
+    return {
+        page_num: CompactPage(*boxes[page_num], page_rows)
+        for page_num, page_rows in rows.items()
+    }
@@ -0,0 +1,123 @@
+import csv
+import json
+from pathlib import Path
+from typing import Any, Literal, Sequence
+
+TRANSCRIPT_FIELDS = ("block_id", "full_text", "left", "top", "width", "height")
+CORPUS_FIELDS = ("image", "page") + TRANSCRIPT_FIELDS
+CORPUS_FORMATS = ("jsonl", "csv", "excel")
+DEFAULT_CORPUS_FORMATS = ("jsonl", "csv")
+# Pages written between two flushes of the output files
+DEFAULT_FLUSH_EVERY = 100
+# Excel cells cannot hold more characters than this
+EXCEL_MAX_CELL = 32767
+
+
+def transcript_records(blocks: dict, ignore_blank_blocks: bool = False) -> list[dict]:
+    """One record per block, with its text and bounding box"""
+    records = []
+    for block_id, block in blocks.items():
+        block_content = block.get_text()
+        if ignore_blank_blocks and not block_content:
+            continue
+        records.append(
+            {
+                "block_id": block_id,
+                "full_text": block_content,
+                "left": block.left,
+                "top": block.top,
+                "width": block.width,
+                "height": block.height,
+            }
+        )
+    return records
+
+
+def new_workbook(fields: Sequence[str], title: str = "transcript"):
+    """Write-only workbook with a header row, streamed to disk on save"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(list(fields))
+    return workbook, sheet
+
+
+def excel_row(record: dict, fields: Sequence[str]) -> list[Any]:
+    return [
+        value[:EXCEL_MAX_CELL] if isinstance(value, str) else value
+        for value in (record.get(field) for field in fields)
+    ]
+
+
+class CorpusWriter:
+    """Streams transcript records of many pages into corpus-wide files.
+
+    JSON Lines and CSV are appended to as pages arrive, through handles kept
+    open for the whole run and flushed every ``flush_every`` pages; the CSV
+    header is written once. The optional workbook is filled in write-only
+    mode, so rows are not kept in memory either, and saved on ``close``.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        formats: Sequence[Literal["jsonl", "csv", "excel"]] = DEFAULT_CORPUS_FORMATS,
+        name: str = "corpus",
+        flush_every: int = DEFAULT_FLUSH_EVERY,
+    ):
+        output_dir.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+        self.paths: dict[str, Path] = {}
+        self.pages = 0
+        self.records = 0
+
+        self._jsonl = self._csv_file = self._csv = None
+        self._workbook = self._sheet = None
+        if "jsonl" in formats:
+            self.paths["jsonl"] = output_dir / f"{name}.jsonl"
+            self._jsonl = self.paths["jsonl"].open("w", encoding="utf-8")
+        if "csv" in formats:
+            self.paths["csv"] = output_dir / f"{name}.csv"
+            self._csv_file = self.paths["csv"].open("w", encoding="utf-8", newline="")
+            self._csv = csv.DictWriter(self._csv_file, fieldnames=CORPUS_FIELDS)
+            self._csv.writeheader()
+        if "excel" in formats:
+            self.paths["excel"] = output_dir / f"{name}.xlsx"
+            self._workbook, self._sheet = new_workbook(CORPUS_FIELDS)
+
+    def write_page(self, image: str, page: int, records: Sequence[dict]):
+        """Append the block records of one page"""
+        for record in records:
+            record = {"image": image, "page": page, **record}
+            if self._jsonl is not None:
+                self._jsonl.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if self._csv is not None:
+                self._csv.writerow(record)
+            if self._sheet is not None:
+                self._sheet.append(excel_row(record, CORPUS_FIELDS))
+
+        self.records += len(records)
+        self.pages += 1
+        if self.pages % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        for handle in (self._jsonl, self._csv_file):
+            if handle is not None:
+                handle.flush()
+
+    def close(self):
+        for handle in (self._jsonl, self._csv_file):
+            if handle is not None:
+                handle.close()
+        self._jsonl = self._csv_file = self._csv = None
+        if self._workbook is not None:
+            self._workbook.save(self.paths["excel"])
+            self._workbook = self._sheet = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
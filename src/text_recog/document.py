@@ -0,0 +1,177 @@
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+# Files opened as pages to transcribe, and those that may hold several
+INPUT_SUFFIXES = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".pdf")
+DOCUMENT_SUFFIXES = (".pdf", ".tif", ".tiff")
+# Resolution PDF pages are rendered at for OCR
+PDF_DPI = 300
+
+# PDFium is not thread-safe, renders are serialized
+_pdf_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class PageRef:
+    """One page to transcribe: a whole image file, or a page of a document"""
+
+    path: Path
+    # 0-based page within a multi-page document, None for a plain image
+    page: int | None = None
+    # Pages in the document
+    count: int = 1
+
+    @property
+    def id(self) -> str:
+        """Identifies the page in timings and traces"""
+        return page_id(self.path, self.page)
+
+    @property
+    def name(self) -> str:
+        """For display, e.g. ``issue.pdf [3/12]``"""
+        if self.page is None:
+            return self.path.name
+        return f"{self.path.name} [{self.page + 1}/{self.count}]"
+
+
+def page_id(path: Path, page: int | None) -> str:
+    if page is None:
+        return path.as_posix()
+    return f"{path.as_posix()}#{page + 1}"
+
+
+def is_pdf(path: Path) -> bool:
+    return path.suffix.lower() == ".pdf"
+
+
+def _open_pdf(path: Path):
+    try:
+        import pypdfium2
+    except ImportError as e:
+        raise ImportError(
+            "Reading PDFs needs pypdfium2: pip install pypdfium2"
+        ) from e
+    return pypdfium2.PdfDocument(path)
+
+
+def page_count(path: Path) -> int:
+    """Number of pages in a file, without decoding any of them"""
+    suffix = path.suffix.lower()
+    if suffix == ".pdf":
+        with _pdf_lock:
+            pdf = _open_pdf(path)
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+    if suffix in DOCUMENT_SUFFIXES:
+        import cv2
+
+        return cv2.imcount(path.as_posix())
+    return 1
+
+
+def expand_pages(path: Path) -> list[PageRef]:
+    """Every page of a file, in order.
+
+    Single images, single-page TIFFs included, stay one plain image so they
+    are read, cached and named as before.
+    """
+    if path.suffix.lower() not in DOCUMENT_SUFFIXES:
+        return [PageRef(path)]
+    count = page_count(path)
+    if count == 1 and not is_pdf(path):
+        return [PageRef(path)]
+    return [PageRef(path, page, count) for page in range(count)]
+
+
+def image_size(path: Path) -> tuple[int, int] | None:
+    """Width and height of an image as OpenCV decodes it, EXIF rotation
+    included, from the file header alone; None if unknown"""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            # Orientations that turn the image by 90 degrees
+            if image.getexif().get(0x0112) in (5, 6, 7, 8):
+                width, height = height, width
+    except (OSError, Image.DecompressionBombError):
+        # Pillow refuses to open images over twice its MAX_IMAGE_PIXELS,
+        # about 179M pixels, which large archival scans can be. OpenCV,
+        # with a far higher limit, still reads them without a size
+        return None
+    return width, height
+
+
+def read_image(path: Path, reduction: int = 1):
+    """Decode an image file as BGR, optionally downscaled ``reduction`` times
+    (2, 4 or 8); None if it cannot be read.
+
+    At full size the pixels are decoded straight into an array sized from the
+    file header, sparing the copy OpenCV's Python binding makes otherwise,
+    which would double the peak memory of the decode.
+    """
+    import cv2
+    import numpy as np
+
+    if reduction != 1:
+        # JPEGs are decoded straight to the smaller size
+        flags = {
+            2: cv2.IMREAD_REDUCED_COLOR_2,
+            4: cv2.IMREAD_REDUCED_COLOR_4,
+            8: cv2.IMREAD_REDUCED_COLOR_8,
+        }
+        return cv2.imread(path.as_posix(), flags[reduction])
+    size = image_size(path)
+    if size is not None:
+        width, height = size
+        image = np.empty((height, width, 3), dtype=np.uint8)
+        try:
+            return cv2.imread(path.as_posix(), image, cv2.IMREAD_COLOR)
+        except (TypeError, cv2.error):
+            # OpenCV before 4.10 cannot decode into a given array
+            pass
+    return cv2.imread(path.as_posix())
+
+
+def read_page(path: Path, page: int, reduction: int = 1):
+    """Decode a single page of a document as a BGR image, leaving the others
+    on disk, optionally downscaled ``reduction`` times"""
+    import cv2
+    import numpy as np
+
+    if is_pdf(path):
+        with _pdf_lock:
+            pdf = _open_pdf(path)
+            try:
+                bitmap = pdf[page].render(scale=PDF_DPI / 72 / reduction)
+                # PDFium renders BGR already; copy out of its buffer
+                image = np.array(bitmap.to_numpy())
+            finally:
+                pdf.close()
+        return image
+
+    ok, images = cv2.imreadmulti(
+        path.as_posix(), start=page, count=1, flags=cv2.IMREAD_COLOR
+    )
+    if not ok or not images:
+        raise ValueError(f"Cannot read page {page + 1} of {path}")
+    if reduction == 1:
+        return images[0]
+    return cv2.resize(
+        images[0],
+        None,
+        fx=1 / reduction,
+        fy=1 / reduction,
+        interpolation=cv2.INTER_AREA,
+    )
+
+
+def page_cache_key(path: Path, page: int) -> str:
+    """What tells the pages of one file apart in OCR cache keys"""
+    key = f"page={page}"
+    if is_pdf(path):
+        key += f" dpi={PDF_DPI}"
+    return key
@@ -0,0 +1,241 @@
+import functools
+import os
+import platform
+import shlex
+import sys
+import threading
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import cv2
+
+# Header written by Tesseract's own TSV renderer
+TSV_HEADER = (
+    "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num"
+    "\tleft\ttop\twidth\theight\tconf\ttext\n"
+)
+ENGINE_ENV_VAR = "TEXT_RECOG_OCR_ENGINE"
+# Languages pages are read in, and the config a whole page is read with
+LANG = "pol+eng+deu"
+TESSERACT_CONFIG = ""
+
+
+def get_tesseract_path():
+    if getattr(sys, "frozen", False):
+        # Running as PyInstaller bundle
+        base_path = sys._MEIPASS
+        return os.path.join(base_path, "tesseract", "tesseract")
+    elif platform.system() == "Windows":
+        # Running as normal script on Windows
+        return "C:\\Program Files\\Tesseract-OCR\\tesseract.exe"
+    else:
+        # Running as normal script on other OS
+        return "tesseract"  # Assumes tesseract is in the PATH
+
+
+def get_tessdata_path() -> str | None:
+    """Bundled traineddata location, or None to let Tesseract find its own"""
+    if getattr(sys, "frozen", False):
+        return os.path.join(sys._MEIPASS, "tesseract", "tessdata")
+    return os.environ.get("TESSDATA_PREFIX")
+
+
+def _pytesseract():
+    """pytesseract, imported on first use and pointed at our tesseract"""
+    import pytesseract
+
+    pytesseract.pytesseract.tesseract_cmd = get_tesseract_path()
+    return pytesseract
+
+
+@functools.cache
+def _tesseract_version(tesseract_path: str) -> str:
+    """Version of the tesseract binary, asked once per run; every cache key
+    needs it and asking spawns a process"""
+    return str(_pytesseract().get_tesseract_version())
+
+
+class OCREngine(ABC):
+    """Something that turns an image into Tesseract image_to_data TSV"""
+
+    name: str
+
+    @abstractmethod
+    def image_to_tsv(
+        self, image: "cv2.typing.MatLike", lang: str, config: str = ""
+    ) -> bytes:
+        """Run OCR and return the TSV, header included, as Tesseract writes it"""
+        pass
+
+    @abstractmethod
+    def version(self) -> str:
+        """Tesseract version, used to key cached results"""
+        pass
+
+    def close(self):
+        """Release any resources held by the engine"""
+        pass
+
+
+class SubprocessEngine(OCREngine):
+    """Spawns a fresh ``tesseract`` process through pytesseract for every call.
+
+    Simple and robust, but every call pays for loading the traineddata.
+    """
+
+    name = "subprocess"
+
+    def image_to_tsv(
+        self, image: "cv2.typing.MatLike", lang: str, config: str = ""
+    ) -> bytes:
+        pytesseract = _pytesseract()
+        return pytesseract.image_to_data(
+            image, lang=lang, config=config, output_type=pytesseract.Output.BYTES
+        )
+
+    def version(self) -> str:
+        return _tesseract_version(get_tesseract_path())
+
+
+def parse_config(config: str) -> tuple[int | None, int | None, dict[str, str]]:
+    """Split a tesseract command line config into psm, oem and -c variables"""
+    psm = oem = None
+    variables = {}
+    tokens = iter(shlex.split(config))
+    for token in tokens:
+        if token == "--psm":
+            psm = int(next(tokens))
+        elif token == "--oem":
+            oem = int(next(tokens))
+        elif token == "--dpi":
+            variables["user_defined_dpi"] = next(tokens)
+        elif token == "-c":
+            key, _, value = next(tokens).partition("=")
+            variables[key] = value
+        else:
+            raise ValueError(f"Unsupported tesseract option: {token}")
+    return psm, oem, variables
+
+
+class PooledEngine(OCREngine):
+    """Keeps Tesseract instances alive in-process, models loaded, via tesserocr.
+
+    Instances are pooled per (lang, config), so variables set for one
+    configuration never leak into another. Up to ``size`` instances exist per
+    configuration; callers beyond that wait for one to be returned. tesserocr
+    releases the GIL while recognising, so a pool shared by threads runs in
+    parallel.
+    """
+
+    name = "pooled"
+
+    def __init__(self, size: int | None = None, tessdata_path: str | None = None):
+        try:
+            import tesserocr
+        except ImportError as e:
+            raise ImportError(
+                "The pooled OCR engine needs tesserocr: pip install tesserocr"
+            ) from e
+
+        self._tesserocr = tesserocr
+        self.size = size or os.cpu_count() or 1
+        self.tessdata_path = tessdata_path or get_tessdata_path()
+        # Idle instances, the most recently used last
+        self._pools: dict[tuple[str, str], list] = {}
+        self._created: dict[tuple[str, str], int] = {}
+        # Notified whenever an instance is returned or a slot freed
+        self._lock = threading.Condition()
+
+    def _create_api(self, lang: str, config: str):
+        psm, oem, variables = parse_config(config)
+        tesserocr = self._tesserocr
+        kwargs = {"lang": lang}
+        if self.tessdata_path:
+            kwargs["path"] = self.tessdata_path
+        if oem is not None:
+            kwargs["oem"] = tesserocr.OEM(oem)
+        if psm is not None:
+            kwargs["psm"] = tesserocr.PSM(psm)
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        try:
+            for key, value in variables.items():
+                api.SetVariable(key, value)
+        except BaseException:
+            api.End()
+            raise
+        return api
+
+    def _acquire(self, lang: str, config: str):
+        key = (lang, config)
+        with self._lock:
+            pool = self._pools.setdefault(key, [])
+            while not pool and self._created.get(key, 0) >= self.size:
+                self._lock.wait()
+            if pool:
+                return pool.pop()
+            self._created[key] = self._created.get(key, 0) + 1
+        # Loading models is slow, do it outside the lock
+        try:
+            return self._create_api(lang, config)
+        except BaseException:
+            # E.g. missing traineddata; free the slot for another attempt
+            with self._lock:
+                self._created[key] -= 1
+                self._lock.notify()
+            raise
+
+    def _release(self, lang: str, config: str, api):
+        with self._lock:
+            self._pools[(lang, config)].append(api)
+            self._lock.notify()
+
+    def image_to_tsv(
+        self, image: "cv2.typing.MatLike", lang: str, config: str = ""
+    ) -> bytes:
+        from PIL import Image
+
+        api = self._acquire(lang, config)
+        try:
+            # Same conversion pytesseract applies to arrays, so both engines
+            # see identical pixels. tesserocr hands images over as 96 dpi
+            # BMPs, whereas the PNG written by pytesseract has no resolution
+            # at all; reset it so Tesseract estimates it the same way.
+            api.SetImage(Image.fromarray(image))
+            api.SetSourceResolution(0)
+            tsv = api.GetTSVText(0)
+        finally:
+            api.Clear()
+            self._release(lang, config, api)
+        return (TSV_HEADER + tsv).encode("utf-8")
+
+    def version(self) -> str:
+        version = self._tesserocr.tesseract_version().split()[1]
+        return version.partition("-")[0]
+
+    def close(self):
+        with self._lock:
+            for pool in self._pools.values():
+                while pool:
+                    pool.pop().End()
+            self._pools.clear()
+            self._created.clear()
+
+
+ENGINES: dict[str, type[OCREngine]] = {
+    SubprocessEngine.name: SubprocessEngine,
+    PooledEngine.name: PooledEngine,
+}
+_default_engines: dict[str, OCREngine] = {}
+_default_engines_lock = threading.Lock()
+
+
+def get_engine(name: str | None = None) -> OCREngine:
+    """Shared engine instance by name, defaulting to $TEXT_RECOG_OCR_ENGINE"""
+    name = name or os.environ.get(ENGINE_ENV_VAR) or SubprocessEngine.name
+    if name not in ENGINES:
+        raise ValueError(f"Unknown OCR engine {name!r}, expected one of {ENGINES}")
+    with _default_engines_lock:
+        if name not in _default_engines:
+            _default_engines[name] = ENGINES[name]()
+    return _default_engines[name]
@@ -1,12 +1,34 @@
+from __future__ import annotations
+
+import argparse
+import queue
+import sqlite3
+import threading
+import time
 import tkinter as tk
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
 from pathlib import Path
 from tkinter import filedialog, messagebox, ttk
-
-import cv2
-from PIL import Image, ImageTk
 import sys
-
-from text_recog.segment import MagazineLayoutAnalyzer
+from typing import TYPE_CHECKING, Sequence
+
+from text_recog import document, prefetch, search, thumbnails
+from text_recog.cache import OCRCache
+from text_recog.layout import TessLayout
+from text_recog.metrics import (
+    METRICS,
+    TraceWriter,
+    default_trace_path,
+    format_timings,
+    stage_totals,
+)
+
+# OpenCV and Pillow are imported where first used, so the window shows up
+# before they are loaded. numpy is not: prefetch stores pages with it
+if TYPE_CHECKING:
+    from text_recog.render import ImagePyramid
 
 if getattr(sys, "frozen", False):
     # Running as PyInstaller bundle
@@ -16,10 +38,53 @@ else:
     # Running as normal Python script
     SAMPLES_DIR = Path("samples")
 DEFAULT_ZOOM_LEVEL = 0.5
+LOAD_POLL_INTERVAL_MS = 50
+# Extra pixels rendered around the viewport, so small scrolls are free
+VIEWPORT_MARGIN = 256
+HIGHLIGHT_COLOUR = (203, 250, 50)
+# Pointer movement, in screen pixels, below which a press is a click
+DRAG_THRESHOLD = 4
+# Shift bit of a Tk event's modifier state
+SHIFT_MASK = 0x0001
+# Cells of the thumbnail strip: a thumbnail, with its label below
+THUMBNAIL_CELL_WIDTH = thumbnails.THUMBNAIL_SIZE[0] + 12
+THUMBNAIL_CELL_HEIGHT = thumbnails.THUMBNAIL_SIZE[1] + 24
+# Cells drawn past each end of the visible part of the strip
+THUMBNAIL_MARGIN = 8
+THUMBNAIL_POLL_INTERVAL_MS = 250
+CURRENT_PAGE_COLOUR = "#1e64c8"
+OCR_CACHED_COLOUR = "#2ca02c"
+SEARCH_HIT_COLOUR = "#ff7f0e"
+# Searched when no output directory is selected, where the batch CLI writes
+# transcripts by default
+DEFAULT_TRANSCRIPTS_DIR = Path("outputs/transcripts")
+# The GUI searches what it transcribes, so its pages are indexed too
+TRANSCRIPT_FORMATS = ("json", "csv", "excel", "text", "search")
+
+
+def to_photo(image) -> tk.PhotoImage:
+    """Tk image of a BGR array"""
+    import cv2
+    from PIL import Image, ImageTk
+
+    return ImageTk.PhotoImage(Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+
+
+def thumbnail_photo(data: bytes) -> tk.PhotoImage:
+    """Tk image of an encoded thumbnail"""
+    from PIL import Image, ImageTk
+
+    return ImageTk.PhotoImage(Image.open(BytesIO(data)))
 
 
 class InteractiveTranscriber:
-    def __init__(self, root):
+    def __init__(
+        self,
+        root,
+        prefetch_ahead: int = prefetch.DEFAULT_AHEAD,
+        prefetch_behind: int = prefetch.DEFAULT_BEHIND,
+        prefetch_max_bytes: int = prefetch.DEFAULT_MAX_BYTES,
+    ):
         # UI elements
         self.photo = None
         self.status_var = None
@@ -27,20 +92,67 @@ class InteractiveTranscriber:
         self.blocks_listbox = None
         self.canvas = None
         self.file_label = None
+        self.search_entry = None
+        self.thumbnail_frame = None
+        self.thumbnail_strip = None
 
         self.root = root
         self.root.title("Interactive Magazine Transcriber")
         self.root.geometry("1200x1000")
+        self.root.bind("<Escape>", self.cancel_loading)
+        # The window's close button quits like the Quit button, stopping the
+        # background threads that would otherwise keep the process alive
+        self.root.protocol("WM_DELETE_WINDOW", self.quit_prog)
 
         # Initialize variables
         self.current_image_path = None
         self.image_dir_path = None
+        # Resolved folder the pages are from
+        self.folder = None
         self.current_image_index = -1
-        self.image_files = []
+        # Every page of every file in the folder, documents expanded
+        self.page_refs = []
+        self.page_positions = {}
+
+        # Thumbnails and metadata of the folder, brought up to date in the
+        # background; each update is the list of pages of one file it
+        # changed
+        self.thumbnail_index = None
+        self.thumbnail_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="thumbnails"
+        )
+        self.thumbnail_stop = threading.Event()
+        self.thumbnail_updates = queue.SimpleQueue()
+        self.thumbnail_files = 0
+        self.thumbnail_files_done = 0
+        # Strip cells drawn, by page position, and their images
+        self.thumbnail_cells = set()
+        self.thumbnail_photos = {}
+        self.strip_render_pending = None
+        # Position of the page marked as current in the strip
+        self.shown_thumbnail = -1
 
         # OCR data
+        self.ocr_cache = OCRCache()
         self.current_analyzer = None
+        self.loading_job = None
+        self.prefetcher = prefetch.PagePrefetcher(
+            partial(prefetch.analyze_page, cache=self.ocr_cache),
+            ahead=prefetch_ahead,
+            behind=prefetch_behind,
+            max_bytes=prefetch_max_bytes,
+        )
+        self.current_result = None
         self.blocks_data = {}
+        self.page_index = None
+        # Block shown in the preview, the one "Re-OCR Block" applies to
+        self.preview_block = None
+        self.reocr_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="reocr"
+        )
+        # Block id of each listbox row, and the row of each listed block
+        self.listed_blocks = []
+        self.block_rows = {}
         self.selected_blocks = set()
 
         # Track OCR data
@@ -48,7 +160,18 @@ class InteractiveTranscriber:
 
         # Zoom variables
         self.zoom_level = DEFAULT_ZOOM_LEVEL
-        self.original_image = None
+        self.pyramid = None
+
+        # Part of the page currently rendered on the canvas, in zoomed space
+        self.rendered_region = None
+        self.render_pending = None
+
+        # Canvas position where the current mouse press started
+        self.drag_start = None
+
+        # Highlight canvas items of selected blocks, and their images
+        self.highlight_items = {}
+        self.highlight_photos = {}
 
         # Highlight variables
         self.alpha = 0.5
@@ -56,6 +179,19 @@ class InteractiveTranscriber:
         # Output directory
         self.output_directory = None
 
+        # Full-text search of the transcripts in the output directory: the
+        # last query, its hits, the one shown, and whether to scroll to it
+        self.search_index = None
+        self.search_query = None
+        self.search_hits = []
+        self.search_position = -1
+        self.search_hit = None
+        self.search_hit_pending = False
+
+        # Stage timings of every page shown, if $TEXT_RECOG_TRACE is set
+        trace_path = default_trace_path()
+        self.trace_writer = TraceWriter(trace_path) if trace_path else None
+
         self.setup_ui()
 
     def setup_ui(self, load_sample: bool = True):
@@ -100,6 +236,38 @@ class InteractiveTranscriber:
         self.prev_button.pack(side=tk.LEFT, padx=2)
         self.next_button.pack(side=tk.LEFT, padx=2)
 
+        # Search of the transcripts; Return goes to the next hit, Shift-Return
+        # to the previous one
+        search_frame = ttk.Frame(control_frame)
+        search_frame.pack(side=tk.RIGHT, padx=(0, 20))
+        self.search_entry = ttk.Entry(search_frame, width=24)
+        self.search_entry.pack(side=tk.LEFT, padx=2)
+        self.search_entry.bind("<Return>", self.search_transcripts)
+        self.search_entry.bind(
+            "<Shift-Return>", partial(self.search_transcripts, step=-1)
+        )
+        ttk.Button(search_frame, text="Find", command=self.search_transcripts).pack(
+            side=tk.LEFT, padx=2
+        )
+
+        # Thumbnail strip of every page in the folder, to jump around
+        self.thumbnail_frame = ttk.LabelFrame(main_frame, text="Pages")
+        self.thumbnail_frame.pack(fill=tk.X, pady=(0, 10))
+        self.thumbnail_strip = tk.Canvas(
+            self.thumbnail_frame, height=THUMBNAIL_CELL_HEIGHT, bg="gray"
+        )
+        strip_scrollbar = ttk.Scrollbar(
+            self.thumbnail_frame, orient=tk.HORIZONTAL, command=self.on_strip_xview
+        )
+        self.thumbnail_strip.configure(xscrollcommand=strip_scrollbar.set)
+        self.thumbnail_strip.pack(fill=tk.X, padx=5, pady=(5, 0))
+        strip_scrollbar.pack(fill=tk.X, padx=5, pady=(0, 5))
+        self.thumbnail_strip.bind("<Configure>", self.schedule_strip_render)
+        self.thumbnail_strip.bind("<ButtonRelease-1>", self.on_strip_click)
+        self.thumbnail_strip.bind("<MouseWheel>", self.on_strip_wheel)
+        self.thumbnail_strip.bind("<Button-4>", self.on_strip_wheel)
+        self.thumbnail_strip.bind("<Button-5>", self.on_strip_wheel)
+
         # Content area
         content_frame = ttk.Frame(main_frame)
         content_frame.pack(fill=tk.BOTH, expand=True)
@@ -114,10 +282,10 @@ class InteractiveTranscriber:
 
         self.canvas = tk.Canvas(canvas_frame, bg="gray")
         h_scrollbar = ttk.Scrollbar(
-            canvas_frame, orient=tk.HORIZONTAL, command=self.canvas.xview
+            canvas_frame, orient=tk.HORIZONTAL, command=self.on_canvas_xview
         )
         v_scrollbar = ttk.Scrollbar(
-            canvas_frame, orient=tk.VERTICAL, command=self.canvas.yview
+            canvas_frame, orient=tk.VERTICAL, command=self.on_canvas_yview
         )
         self.canvas.configure(
             xscrollcommand=h_scrollbar.set, yscrollcommand=v_scrollbar.set
@@ -126,6 +294,10 @@ class InteractiveTranscriber:
         v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, padx=5, pady=5)
         h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X, padx=5, pady=5)
         self.canvas.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.canvas.bind("<Configure>", self.schedule_viewport_render)
+        self.canvas.bind("<ButtonPress-1>", self.on_canvas_press)
+        self.canvas.bind("<B1-Motion>", self.on_canvas_drag)
+        self.canvas.bind("<ButtonRelease-1>", self.on_canvas_release)
 
         # Right panel - Block selection
         selection_frame = ttk.LabelFrame(content_frame, text="Text Blocks Selection")
@@ -142,6 +314,9 @@ class InteractiveTranscriber:
         ttk.Button(
             button_frame, text="Select None", command=self.deselect_all_blocks
         ).pack(side=tk.LEFT, padx=2)
+        ttk.Button(
+            button_frame, text="Re-OCR Block", command=self.reocr_preview_block
+        ).pack(side=tk.LEFT, padx=2)
 
         # Scrollable list of blocks
         list_frame = ttk.Frame(selection_frame)
@@ -207,8 +382,9 @@ class InteractiveTranscriber:
 
         if load_sample:
             self.image_dir_path = SAMPLES_DIR
-            # Initialize with sample images if available
-            self.load_images_from_dir()
+            # Initialize with sample images if available, once the window
+            # has been drawn
+            self.root.after_idle(self.load_images_from_dir)
         else:
             # Initialize with home directory
             self.image_dir_path = Path.home()
@@ -222,21 +398,392 @@ class InteractiveTranscriber:
         )
         self.next_button["state"] = (
             tk.NORMAL
-            if self.current_image_index < len(self.image_files) - 1
+            if self.current_image_index < len(self.page_refs) - 1
             else tk.DISABLED
         )
 
     def load_images_from_dir(self, dir_path: Path = SAMPLES_DIR):
         """Load list of sample images"""
+        # Results and pending work for the previous folder are now useless
+        self.loading_job = None
+        self.prefetcher.reset()
+        self.close_thumbnail_index()
         if dir_path.exists():
-            self.image_files = list(dir_path.glob("*.jpg"))
+            self.folder = dir_path.resolve()
+            files = [
+                path
+                for path in sorted(dir_path.iterdir())
+                if path.suffix.lower() in document.INPUT_SUFFIXES
+            ]
+            try:
+                # Page counts of unchanged documents come from the index
+                self.thumbnail_index = thumbnails.ThumbnailIndex(dir_path)
+                self.page_refs, unreadable = self.thumbnail_index.pages(files)
+            except sqlite3.Error:
+                self.close_thumbnail_index()
+                self.page_refs, unreadable = [], []
+                for path in files:
+                    try:
+                        self.page_refs.extend(document.expand_pages(path))
+                    except (OSError, ValueError, ImportError) as e:
+                        unreadable.append(f"{path.name}: {e}")
+            if unreadable:
+                messagebox.showwarning(
+                    "Warning", "Skipped unreadable files:\n" + "\n".join(unreadable)
+                )
             self.current_image_index = 0
-            if self.image_files:
-                self.load_image(self.image_files[0])
+            self.reset_thumbnail_strip()
+            if self.thumbnail_index is not None:
+                self.start_thumbnail_indexing(files)
+            if self.page_refs:
+                self.load_image(self.page_refs[0])
                 self.update_nav_button()
         else:
-            self.image_files = []
+            self.page_refs = []
             self.current_image_index = -1
+            self.reset_thumbnail_strip()
+
+    def start_thumbnail_indexing(self, files: list[Path]):
+        """Bring the thumbnail index of the folder up to date in the
+        background"""
+        # Each folder gets its own channel, so a late update of the previous
+        # folder cannot land in this one
+        self.thumbnail_stop = threading.Event()
+        self.thumbnail_updates = queue.SimpleQueue()
+        self.thumbnail_files = len({ref.path for ref in self.page_refs})
+        self.thumbnail_files_done = 0
+        future = self.thumbnail_executor.submit(
+            self.build_thumbnail_index,
+            self.thumbnail_index,
+            list(self.page_refs),
+            self.thumbnail_stop,
+            self.thumbnail_updates,
+        )
+        self.poll_thumbnail_updates(future, self.thumbnail_updates)
+
+    def build_thumbnail_index(
+        self,
+        index: thumbnails.ThumbnailIndex,
+        refs: list[document.PageRef],
+        stop: threading.Event,
+        updates: queue.SimpleQueue,
+    ):
+        """Runs in the background, off the Tk thread"""
+        for changed in index.update(refs, self.ocr_cache, stop):
+            updates.put(changed)
+
+    def poll_thumbnail_updates(self, future: Future, updates: queue.SimpleQueue):
+        """Redraw the strip cells of pages the background indexing updated"""
+        if updates is not self.thumbnail_updates:
+            return  # Another folder was opened since
+        while True:
+            try:
+                changed = updates.get_nowait()
+            except queue.Empty:
+                break
+            self.thumbnail_files_done += 1
+            for ref in changed:
+                position = self.page_positions.get(ref)
+                if position in self.thumbnail_cells:
+                    self.draw_thumbnail_cell(position)
+
+        if not future.done():
+            self.set_thumbnail_title(
+                f"indexing {self.thumbnail_files_done}/{self.thumbnail_files} files"
+            )
+            self.root.after(
+                THUMBNAIL_POLL_INTERVAL_MS, self.poll_thumbnail_updates, future, updates
+            )
+        elif not future.cancelled() and future.exception() is not None:
+            self.set_thumbnail_title(f"indexing failed: {future.exception()}")
+        else:
+            self.set_thumbnail_title()
+
+    def set_thumbnail_title(self, progress: str | None = None):
+        if self.thumbnail_frame is None:
+            return
+        title = f"Pages ({len(self.page_refs)})"
+        if progress:
+            title += f" - {progress}"
+        self.thumbnail_frame.configure(text=title)
+
+    def close_thumbnail_index(self):
+        """Stop indexing the current folder and let go of its index"""
+        self.thumbnail_stop.set()
+        if self.thumbnail_index is not None:
+            self.thumbnail_index.close()
+            self.thumbnail_index = None
+
+    def reset_thumbnail_strip(self):
+        """Lay the strip out for the pages of a newly opened folder"""
+        self.page_positions = {ref: pos for pos, ref in enumerate(self.page_refs)}
+        self.set_thumbnail_title()
+        if self.thumbnail_strip is None:
+            return
+        self.thumbnail_strip.delete("all")
+        self.thumbnail_cells.clear()
+        self.thumbnail_photos.clear()
+        self.thumbnail_strip.configure(
+            scrollregion=(
+                0,
+                0,
+                len(self.page_refs) * THUMBNAIL_CELL_WIDTH,
+                THUMBNAIL_CELL_HEIGHT,
+            )
+        )
+        self.thumbnail_strip.xview_moveto(0)
+        self.schedule_strip_render()
+
+    def schedule_strip_render(self, event=None):
+        """Redraw the strip once the current burst of scrolling is over"""
+        if self.strip_render_pending is None:
+            self.strip_render_pending = self.root.after_idle(
+                self.render_thumbnail_strip
+            )
+
+    def render_thumbnail_strip(self):
+        """Draw the strip cells in view, plus a margin, dropping the others.
+
+        Only a screenful of thumbnails is ever loaded, however many pages
+        the folder holds.
+        """
+        self.strip_render_pending = None
+        strip = self.thumbnail_strip
+        if strip is None:
+            return
+        left = int(strip.canvasx(0))
+        right = int(strip.canvasx(strip.winfo_width()))
+        wanted = range(
+            max(0, left // THUMBNAIL_CELL_WIDTH - THUMBNAIL_MARGIN),
+            min(
+                len(self.page_refs),
+                right // THUMBNAIL_CELL_WIDTH + 1 + THUMBNAIL_MARGIN,
+            ),
+        )
+        for position in self.thumbnail_cells - set(wanted):
+            strip.delete(f"cell{position}")
+            self.thumbnail_cells.discard(position)
+            self.thumbnail_photos.pop(position, None)
+        for position in wanted:
+            if position not in self.thumbnail_cells:
+                self.draw_thumbnail_cell(position)
+
+    def draw_thumbnail_cell(self, position: int):
+        """Draw or redraw the strip cell of one page"""
+        strip = self.thumbnail_strip
+        ref = self.page_refs[position]
+        tag = f"cell{position}"
+        strip.delete(tag)
+        entry = None
+        if self.thumbnail_index is not None:
+            try:
+                entry = self.thumbnail_index.entry(ref)
+            except sqlite3.Error:
+                pass
+
+        left = position * THUMBNAIL_CELL_WIDTH
+        centre = left + THUMBNAIL_CELL_WIDTH // 2
+        current = position == self.current_image_index
+        strip.create_rectangle(
+            left + 2,
+            2,
+            left + THUMBNAIL_CELL_WIDTH - 2,
+            THUMBNAIL_CELL_HEIGHT - 2,
+            fill=CURRENT_PAGE_COLOUR if current else "gray25",
+            outline="",
+            tags=tag,
+        )
+        if entry is not None and entry.thumbnail:
+            photo = thumbnail_photo(entry.thumbnail)
+            self.thumbnail_photos[position] = photo
+            strip.create_image(centre, 6, anchor=tk.N, image=photo, tags=tag)
+        label = ref.path.stem[:10]
+        if ref.page is not None:
+            label += f" p{ref.page + 1}"
+        strip.create_text(
+            centre,
+            THUMBNAIL_CELL_HEIGHT - 5,
+            anchor=tk.S,
+            text=label,
+            fill="white",
+            tags=tag,
+        )
+        if entry is not None and entry.ocr_cached:
+            # Opens without running Tesseract
+            right = left + THUMBNAIL_CELL_WIDTH - 8
+            strip.create_oval(
+                right - 8, 8, right, 16, fill=OCR_CACHED_COLOUR, outline="", tags=tag
+            )
+        self.thumbnail_cells.add(position)
+
+    def show_current_thumbnail(self, previous: int):
+        """Move the current page mark, scrolling it into view"""
+        strip = self.thumbnail_strip
+        if strip is None or not self.page_refs:
+            return
+        for position in (previous, self.current_image_index):
+            if position in self.thumbnail_cells:
+                self.draw_thumbnail_cell(position)
+        left = self.current_image_index * THUMBNAIL_CELL_WIDTH
+        if not (
+            strip.canvasx(0)
+            <= left
+            <= strip.canvasx(strip.winfo_width()) - THUMBNAIL_CELL_WIDTH
+        ):
+            width = len(self.page_refs) * THUMBNAIL_CELL_WIDTH
+            centred = left - (strip.winfo_width() - THUMBNAIL_CELL_WIDTH) / 2
+            strip.xview_moveto(max(0, centred) / width)
+            self.schedule_strip_render()
+
+    def on_strip_xview(self, *args):
+        if self.thumbnail_strip is not None:
+            self.thumbnail_strip.xview(*args)
+            self.schedule_strip_render()
+
+    def on_strip_wheel(self, event):
+        """Scroll the strip sideways with the mouse wheel"""
+        if event.num == 4 or event.delta > 0:
+            self.on_strip_xview("scroll", -3, "units")
+        else:
+            self.on_strip_xview("scroll", 3, "units")
+
+    def on_strip_click(self, event):
+        """Open the page whose thumbnail was clicked"""
+        position = int(self.thumbnail_strip.canvasx(event.x)) // THUMBNAIL_CELL_WIDTH
+        if 0 <= position < len(self.page_refs):
+            self.go_to_page(position)
+
+    def go_to_page(self, index: int):
+        """Jump straight to a page of the folder"""
+        if index != self.current_image_index:
+            self.current_image_index = index
+            self.load_image(self.page_refs[index])
+        self.update_nav_button()
+
+    def open_search_index(self) -> search.SearchIndex | None:
+        """The search index of the output directory, None until transcripts
+        have been written there"""
+        path = (self.output_directory or DEFAULT_TRANSCRIPTS_DIR) / search.INDEX_NAME
+        if self.search_index is not None and self.search_index.path != path:
+            self.close_search_index()
+        if self.search_index is None and path.exists():
+            self.search_index = search.SearchIndex(path)
+        return self.search_index
+
+    def close_search_index(self):
+        if self.search_index is not None:
+            self.search_index.close()
+            self.search_index = None
+
+    def search_transcripts(self, event=None, step: int = 1):
+        """Search the transcripts for the query in the search box, or if it
+        has not changed, go ``step`` hits on"""
+        query = self.search_entry.get().strip()
+        if not query or self.status_var is None:
+            return "break"
+        if query == self.search_query and self.search_hits:
+            self.show_search_hit(self.search_position + step)
+            return "break"
+
+        try:
+            index = self.open_search_index()
+            hits = [] if index is None else index.search(query)
+        except sqlite3.Error as e:
+            self.close_search_index()
+            self.status_var.set(f"Search failed: {e}")
+            return "break"
+        self.search_query = query
+        self.search_hits = hits
+        self.search_hit = None
+        if self.canvas is not None:
+            self.canvas.delete("search_hit")
+        if index is None:
+            folder = (self.output_directory or DEFAULT_TRANSCRIPTS_DIR).absolute()
+            self.status_var.set(f"No search index in {folder.as_posix()} yet")
+        elif not hits:
+            self.status_var.set(f"No matches for {query!r}")
+        else:
+            self.show_search_hit(0)
+        return "break"
+
+    def show_search_hit(self, position: int):
+        """Go to the page of a hit, and mark its word once the page shows"""
+        position %= len(self.search_hits)
+        self.search_position = position
+        hit = self.search_hits[position]
+        if hit.path.parent != self.folder:
+            if not hit.path.exists():
+                self.status_var.set(f"{hit.path.as_posix()} no longer exists")
+                return
+            self.load_images_from_dir(hit.path.parent)
+        index = next(
+            (
+                index
+                for index, ref in enumerate(self.page_refs)
+                if ref.path.name == hit.path.name and ref.page == hit.page
+            ),
+            None,
+        )
+        if index is None:
+            self.status_var.set(f"{hit.name} is not in {hit.path.parent.as_posix()}")
+            return
+
+        self.search_hit = hit
+        self.search_hit_pending = True
+        self.go_to_page(index)
+        # Already shown, otherwise drawn once it is
+        if self.loading_job is None:
+            self.draw_search_hit()
+            self.schedule_viewport_render()
+            self.status_var.set(self.search_hit_status())
+
+    def search_hit_status(self) -> str:
+        hit = self.search_hits[self.search_position]
+        more = "+" if len(self.search_hits) == search.DEFAULT_LIMIT else ""
+        return (
+            f"Hit {self.search_position + 1} of {len(self.search_hits)}{more}:"
+            f" {hit.text!r} in {hit.name}, block {hit.block}"
+        )
+
+    def on_search_hit_page(self) -> bool:
+        """Whether the hit being shown is on the current page"""
+        hit = self.search_hit
+        if hit is None or self.current_result is None:
+            return False
+        ref = self.current_result.ref
+        return ref.page == hit.page and ref.path.resolve() == hit.path
+
+    def draw_search_hit(self):
+        """Outline the word of the hit being shown, if it is on this page,
+        scrolling it into view when it was just jumped to"""
+        if self.canvas is None:
+            return
+        self.canvas.delete("search_hit")
+        if self.pyramid is None or not self.on_search_hit_page():
+            return
+
+        hit = self.search_hit
+        zoom = self.zoom_level
+        left, top = hit.left * zoom, hit.top * zoom
+        right = (hit.left + hit.width) * zoom
+        bottom = (hit.top + hit.height) * zoom
+        self.canvas.create_rectangle(
+            left - 3,
+            top - 3,
+            right + 3,
+            bottom + 3,
+            outline=SEARCH_HIT_COLOUR,
+            width=3,
+            tags="search_hit",
+        )
+        if self.search_hit_pending:
+            self.search_hit_pending = False
+            # Centre the word in the viewport
+            width, height = self.pyramid.zoomed_size(zoom)
+            x = (left + right - self.canvas.winfo_width()) / 2
+            y = (top + bottom - self.canvas.winfo_height()) / 2
+            self.canvas.xview_moveto(max(0.0, x / width))
+            self.canvas.yview_moveto(max(0.0, y / height))
 
     def update_output_dir_label(self):
         """Update the output directory label with the given path"""
@@ -271,37 +818,81 @@ class InteractiveTranscriber:
 
     def previous_image(self):
         """Load previous image in the list"""
-        if self.image_files and self.current_image_index > 0:
+        if self.page_refs and self.current_image_index > 0:
             self.current_image_index -= 1
-            self.load_image(self.image_files[self.current_image_index])
+            self.load_image(self.page_refs[self.current_image_index])
         self.update_nav_button()
 
     def next_image(self):
         """Load next image in the list"""
-        if self.image_files and self.current_image_index < len(self.image_files) - 1:
+        if self.page_refs and self.current_image_index < len(self.page_refs) - 1:
             self.current_image_index += 1
-            self.load_image(self.image_files[self.current_image_index])
+            self.load_image(self.page_refs[self.current_image_index])
         self.update_nav_button()
 
-    def load_image(self, image_path):
-        """Load and analyze an image"""
+    def load_image(self, ref: document.PageRef):
+        """Start loading and analyzing a page without blocking the UI"""
         if self.status_var is None:
             return
 
-        self.status_var.set("Loading and analyzing image...")
-        self.root.update()
+        # Supersede the page being loaded, if any. It keeps running as a
+        # prefetch if it is a neighbour, otherwise the prefetcher cancels it
+        self.loading_job = self.prefetcher.get(ref)
+        self.prefetcher.prefetch_around(self.page_refs, self.current_image_index)
+        self.show_current_thumbnail(self.shown_thumbnail)
+        self.shown_thumbnail = self.current_image_index
+        self.poll_loading_job(self.loading_job)
+
+    def poll_loading_job(self, job: prefetch.PageJob):
+        """Follow a load job from the Tk main loop until it finishes"""
+        if job is not self.loading_job or self.status_var is None:
+            return  # Superseded by another navigation, or cancelled
+
+        if not job.done():
+            self.status_var.set(
+                f"Analyzing {job.ref.name}: {job.stage}... (Esc to cancel)"
+            )
+            self.root.after(LOAD_POLL_INTERVAL_MS, self.poll_loading_job, job)
+            return
+
+        self.loading_job = None
+        try:
+            result = job.result()
+        except (CancelledError, prefetch.JobCancelled):
+            self.status_var.set(f"Cancelled loading {job.ref.name}")
+            return
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load image: {str(e)}")
+            self.status_var.set("Error loading image")
+            return
+
+        self.show_page_result(result)
 
+    def cancel_loading(self, event=None):
+        """Stop waiting for the page being loaded"""
+        if self.loading_job is None or self.status_var is None:
+            return
+        self.loading_job.cancel()
+        self.status_var.set(f"Cancelled loading {self.loading_job.ref.name}")
+        self.loading_job = None
+
+    def show_page_result(self, result: prefetch.PageResult):
+        """Display an analyzed page"""
+        page_id = result.analyzer.page_id
         try:
-            self.current_image_path = image_path
+            self.current_image_path = result.ref.path
             if self.file_label is not None:
-                self.file_label.config(text=image_path.name)
+                self.file_label.config(text=result.ref.name)
 
-            # Create analyzer and perform OCR
-            self.current_analyzer = MagazineLayoutAnalyzer(image_path)
-            self.blocks_data = self.current_analyzer.analyze_with_tesseract()[1].blocks
+            self.current_result = result
+            self.current_analyzer = result.analyzer
+            self.blocks_data = result.page.blocks
+            self.page_index = result.index
 
             # Display image with overlays
-            self.display_image_with_overlays()
+            shown_at = time.perf_counter()
+            self.display_image_with_overlays(result.overlay)
+            spans = result.spans + METRICS.spans(page_id, since=shown_at)
 
             # Populate blocks list
             self.populate_blocks_list()
@@ -310,95 +901,188 @@ class InteractiveTranscriber:
             self.select_all_blocks()
 
             if self.status_var is not None:
-                self.status_var.set(f"Loaded: {image_path.name}")
+                timings = format_timings(stage_totals(spans))
+                self.status_var.set(
+                    f"Loaded: {result.ref.name}" + (f" ({timings})" if timings else "")
+                )
+                if self.on_search_hit_page():
+                    self.status_var.set(self.search_hit_status())
+            if self.trace_writer is not None and not result.traced:
+                result.traced = True
+                self.trace_writer.write_page(page_id, spans)
+            self.mark_ocr_cached(result.ref)
 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load image: {str(e)}")
             if self.status_var is not None:
                 self.status_var.set("Error loading image")
 
-    def generate_highlights(self) -> cv2.typing.MatLike | None:
-        """Update highlights on the canvas for selected blocks"""
+    def show_highlight(self, block_id: int):
+        """Show the highlight of one selected block.
+
+        Highlights are separate canvas items, each holding the blended part
+        of a block that falls in the rendered region, so a selection change
+        only ever creates, hides or shows a single item.
+        """
+        import cv2
+
+        if block_id in self.highlight_items:
+            self.canvas.itemconfigure(self.highlight_items[block_id], state=tk.NORMAL)
+            return
         if (
-            not self.blocks_data
-            or self.original_image is None
-            or self.blocks_listbox is None
+            self.pyramid is None
+            or self.rendered_region is None
+            or block_id not in self.blocks_data
         ):
             return
 
-        annotated = self.original_image.copy()
-        # Get selected block indices
-        selected_indices = self.blocks_listbox.curselection()
-
-        for index in selected_indices:
-            block_text = self.blocks_listbox.get(index)
-            block_id = int(block_text.split(":")[0].replace("Block ", ""))
-
-            if block_id in self.blocks_data:
-                block = self.blocks_data[block_id]
+        # Block in zoomed coordinates, clipped to the rendered region
+        block = self.blocks_data[block_id]
+        r_left, r_top, r_right, r_bottom = self.rendered_region
+        left = max(r_left, round(block.left * self.zoom_level))
+        top = max(r_top, round(block.top * self.zoom_level))
+        right = min(r_right, round((block.left + block.width) * self.zoom_level))
+        bottom = min(r_bottom, round((block.top + block.height) * self.zoom_level))
+        if right <= left or bottom <= top:
+            return
 
-                # Calculate coordinates with zoom
-                x1 = block.left
-                y1 = block.top
-                x2 = block.left + block.width
-                y2 = block.top + block.height
+        view, left, top = self.pyramid.render(
+            self.zoom_level, left, top, right - left, bottom - top
+        )
+        # Semi-transparent fill over the block
+        fill = view.copy()
+        fill[:] = HIGHLIGHT_COLOUR
+        image_new = cv2.addWeighted(fill, self.alpha, view, 1 - self.alpha, 0)
+
+        photo = to_photo(image_new)
+        self.highlight_photos[block_id] = photo
+        self.highlight_items[block_id] = self.canvas.create_image(
+            left, top, anchor=tk.NW, image=photo, tags="highlight"
+        )
 
-                # Create highlight rectangle with semi-transparent fill
-                cv2.rectangle(annotated, (x1, y1), (x2, y2), (203, 250, 50), cv2.FILLED)
-        return annotated
+    def hide_highlight(self, block_id: int):
+        """Hide the highlight of a deselected block, keeping it for reuse"""
+        if block_id in self.highlight_items:
+            self.canvas.itemconfigure(self.highlight_items[block_id], state=tk.HIDDEN)
+
+    def update_highlights(self, selected: set[int]):
+        """Toggle highlights for the blocks whose selection changed"""
+        if self.canvas is not None:
+            for block_id in self.selected_blocks - selected:
+                self.hide_highlight(block_id)
+            for block_id in selected - self.selected_blocks:
+                self.show_highlight(block_id)
+        self.selected_blocks = selected
+
+    def clear_highlights(self):
+        """Drop every highlight item, e.g. once the rendered region changed"""
+        if self.canvas is not None:
+            self.canvas.delete("highlight")
+        self.highlight_items.clear()
+        self.highlight_photos.clear()
 
     def update_image_display(self):
         """Update the image display with current zoom level"""
-        if self.original_image is None or self.canvas is None:
+        if self.pyramid is None or self.canvas is None:
             return
 
-        # Redraw highlights for selected blocks
-        annotated = self.generate_highlights()
+        # Keep the same part of the page in view across zoom changes
+        x_fraction = self.canvas.xview()[0]
+        y_fraction = self.canvas.yview()[0]
+        width, height = self.pyramid.zoomed_size(self.zoom_level)
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+        self.canvas.xview_moveto(x_fraction)
+        self.canvas.yview_moveto(y_fraction)
+        self.draw_search_hit()
+
+        self.rendered_region = None
+        self.render_viewport()
+
+    def schedule_viewport_render(self, event=None):
+        """Re-render the viewport once the current burst of scrolling is over"""
+        if self.render_pending is None:
+            self.render_pending = self.root.after_idle(self.render_viewport)
+
+    def render_viewport(self):
+        """Render the visible part of the page, plus a margin, at the current
+        zoom level, unless it is already on the canvas"""
+        from text_recog.render import region_contains
+
+        self.render_pending = None
+        if self.pyramid is None or self.canvas is None:
+            return
 
-        if annotated is None:
+        width, height = self.pyramid.zoomed_size(self.zoom_level)
+        left = max(0, int(self.canvas.canvasx(0)))
+        top = max(0, int(self.canvas.canvasy(0)))
+        right = min(width, left + self.canvas.winfo_width())
+        bottom = min(height, top + self.canvas.winfo_height())
+        if right <= left or bottom <= top:
             return
 
-        image_new = cv2.addWeighted(
-            annotated, self.alpha, self.original_image, 1 - self.alpha, 0
-        )
-        img_rgb = Image.fromarray(cv2.cvtColor(image_new, cv2.COLOR_BGR2RGB))
+        if self.rendered_region is not None and region_contains(
+            self.rendered_region, (left, top, right, bottom)
+        ):
+            return
 
-        # Calculate new size based on zoom level
-        original_width, original_height = img_rgb.size
-        new_width = int(original_width * self.zoom_level)
-        new_height = int(original_height * self.zoom_level)
+        left = max(0, left - VIEWPORT_MARGIN)
+        top = max(0, top - VIEWPORT_MARGIN)
+        right = min(width, right + VIEWPORT_MARGIN)
+        bottom = min(height, bottom + VIEWPORT_MARGIN)
 
-        # Resize image
-        resized_image = img_rgb.resize(
-            (new_width, new_height), Image.Resampling.LANCZOS
-        )
+        page_id = self.current_analyzer.page_id if self.current_analyzer else None
+        with METRICS.stage("render", page_id):
+            view, left, top = self.pyramid.render(
+                self.zoom_level, left, top, right - left, bottom - top
+            )
 
-        # Convert to PhotoImage and display
-        self.photo = ImageTk.PhotoImage(resized_image)
-        self.canvas.delete("all")
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+            # Convert to PhotoImage and display
+            self.photo = to_photo(view)
+        self.canvas.delete("page")
+        self.canvas.create_image(left, top, anchor=tk.NW, image=self.photo, tags="page")
+        self.canvas.tag_lower("page")
+        self.rendered_region = (left, top, left + view.shape[1], top + view.shape[0])
+
+        # Redraw highlights for selected blocks within the new region
+        self.clear_highlights()
+        for block_id in self.selected_blocks:
+            self.show_highlight(block_id)
+
+    def on_canvas_xview(self, *args):
+        """Scroll horizontally, rendering newly exposed parts of the page"""
+        if self.canvas is not None:
+            self.canvas.xview(*args)
+            self.schedule_viewport_render()
+
+    def on_canvas_yview(self, *args):
+        """Scroll vertically, rendering newly exposed parts of the page"""
+        if self.canvas is not None:
+            self.canvas.yview(*args)
+            self.schedule_viewport_render()
 
     def zoom_in(self):
         """Increase zoom level"""
-        if self.original_image is not None:
+        if self.pyramid is not None:
             self.zoom_level = min(self.zoom_level * 1.15, 5.0)  # Max zoom 5x
             self.update_image_display()
 
     def zoom_out(self):
         """Decrease zoom level"""
-        if self.original_image is not None:
+        if self.pyramid is not None:
             self.zoom_level = max(self.zoom_level / 1.15, 0.1)  # Min zoom 0.1x
             self.update_image_display()
 
-    def display_image_with_overlays(self):
+    def display_image_with_overlays(self, overlay: ImagePyramid | None = None):
         """Display image with block overlays"""
         if self.current_analyzer is None:
             return
 
-        # Create image with overlays
-        # Store as original
-        self.original_image = self.current_analyzer.add_block_overlay(self.blocks_data)
+        # Create image with overlays, unless already drawn by the loader
+        if overlay is None:
+            overlay = prefetch.draw_overlay(self.current_analyzer, self.blocks_data)
+        self.pyramid = overlay
+        # Selections belong to the previous page
+        self.selected_blocks = set()
 
         # Update display
         self.update_image_display()
@@ -409,16 +1093,23 @@ class InteractiveTranscriber:
             return
 
         self.blocks_listbox.delete(0, tk.END)
+        self.listed_blocks = []
+        self.block_rows = {}
 
         for block_id, block in self.blocks_data.items():
             block_text = block.get_text()
             if not block_text:
                 continue
 
-            # Get text from this block
-            preview = block_text[:50] + "..." if len(block_text) > 50 else block_text
+            self.block_rows[block_id] = len(self.listed_blocks)
+            self.listed_blocks.append(block_id)
+            self.blocks_listbox.insert(tk.END, self.block_label(block_id))
 
-            self.blocks_listbox.insert(tk.END, f"Block {block_id}: {preview}")
+    def block_label(self, block_id: int) -> str:
+        """Listbox entry of a block, with the start of its text"""
+        block_text = self.blocks_data[block_id].get_text()
+        preview = block_text[:50] + "..." if len(block_text) > 50 else block_text
+        return f"Block {block_id}: {preview}"
 
     def select_all_blocks(self):
         """Select all blocks in the listbox"""
@@ -439,22 +1130,151 @@ class InteractiveTranscriber:
         if self.blocks_listbox is None or self.preview_text is None:
             return
 
-        selected_indices = self.blocks_listbox.curselection()
+        selected = [
+            self.listed_blocks[index] for index in self.blocks_listbox.curselection()
+        ]
 
-        if selected_indices:
+        if selected:
             # Show preview of the last selected block
-            last_selected = selected_indices[-1]
-            block_text = self.blocks_listbox.get(last_selected)
-            block_id = int(block_text.split(":")[0].replace("Block ", ""))
-
-            preview_text = self.blocks_data[block_id].get_text()
+            self.preview_block = selected[-1]
+            preview_text = self.blocks_data[self.preview_block].get_text()
             self.preview_text.delete(1.0, tk.END)
             self.preview_text.insert(1.0, preview_text)
         else:
+            self.preview_block = None
             self.preview_text.delete(1.0, tk.END)
 
         # Update highlights on the image
-        self.update_image_display()
+        self.update_highlights(set(selected))
+
+    def reocr_preview_block(self):
+        """OCR the previewed block again on its own, in the background"""
+        if self.current_analyzer is None or self.preview_block is None:
+            messagebox.showwarning("Warning", "Select a block to re-OCR")
+            return
+
+        block = self.blocks_data[self.preview_block]
+        started = time.perf_counter()
+        future = self.reocr_executor.submit(self.current_analyzer.ocr_block, block)
+        if self.status_var is not None:
+            self.status_var.set(f"Re-running OCR on block {self.preview_block}...")
+        self.poll_reocr(future, self.current_result, self.preview_block, started)
+
+    def poll_reocr(
+        self,
+        future: Future,
+        result: prefetch.PageResult,
+        block_id: int,
+        started: float,
+    ):
+        """Splice a finished block re-OCR into the layout, on the Tk thread"""
+        if not future.done():
+            self.root.after(
+                LOAD_POLL_INTERVAL_MS,
+                self.poll_reocr,
+                future,
+                result,
+                block_id,
+                started,
+            )
+            return
+        try:
+            paragraphs = future.result()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to re-OCR block: {str(e)}")
+            return
+
+        # The page may no longer be shown, but it is still the prefetched one
+        block = result.replace_block(block_id, paragraphs)
+        if result is not self.current_result:
+            return
+
+        self.blocks_data[block_id] = block
+        self.page_index = result.index
+        row = self.block_rows.get(block_id)
+        if row is not None and self.blocks_listbox is not None:
+            selected = self.blocks_listbox.selection_includes(row)
+            self.blocks_listbox.delete(row)
+            self.blocks_listbox.insert(row, self.block_label(block_id))
+            if selected:
+                self.blocks_listbox.selection_set(row)
+        if block_id == self.preview_block and self.preview_text is not None:
+            self.preview_text.delete(1.0, tk.END)
+            self.preview_text.insert(1.0, block.get_text())
+        if self.status_var is not None:
+            timings = format_timings(
+                stage_totals(
+                    METRICS.spans(result.analyzer.page_id, since=started)
+                )
+            )
+            self.status_var.set(
+                f"Block {block_id} re-OCRed" + (f" ({timings})" if timings else "")
+            )
+
+    def canvas_to_page(self, x: float, y: float) -> tuple[float, float]:
+        """Page coordinates of a point given in canvas window coordinates"""
+        return (
+            self.canvas.canvasx(x) / self.zoom_level,
+            self.canvas.canvasy(y) / self.zoom_level,
+        )
+
+    def on_canvas_press(self, event):
+        """Start a click or a rubber-band selection on the page"""
+        if self.page_index is None:
+            return
+        self.drag_start = (event.x, event.y)
+
+    def on_canvas_drag(self, event):
+        """Draw the rubber band while the pointer is dragged"""
+        if self.drag_start is None:
+            return
+        x0, y0 = self.drag_start
+        coords = (
+            self.canvas.canvasx(x0),
+            self.canvas.canvasy(y0),
+            self.canvas.canvasx(event.x),
+            self.canvas.canvasy(event.y),
+        )
+        if self.canvas.find_withtag("rubberband"):
+            self.canvas.coords("rubberband", *coords)
+        else:
+            self.canvas.create_rectangle(
+                *coords, outline="blue", dash=(4, 2), tags="rubberband"
+            )
+
+    def on_canvas_release(self, event):
+        """Toggle the block under a click, or select the blocks in the band.
+
+        A rubber band replaces the selection, or adds to it with Shift held.
+        """
+        if self.drag_start is None:
+            return
+        x0, y0 = self.drag_start
+        self.drag_start = None
+        self.canvas.delete("rubberband")
+        if self.page_index is None or self.blocks_listbox is None:
+            return
+
+        left, top = self.canvas_to_page(x0, y0)
+        if max(abs(event.x - x0), abs(event.y - y0)) < DRAG_THRESHOLD:
+            for block_id in self.page_index.at(TessLayout.BLOCK, left, top):
+                row = self.block_rows.get(block_id)
+                if row is None:
+                    continue  # Blank blocks are not listed
+                if self.blocks_listbox.selection_includes(row):
+                    self.blocks_listbox.selection_clear(row)
+                else:
+                    self.blocks_listbox.selection_set(row)
+                    self.blocks_listbox.see(row)
+                break
+        else:
+            right, bottom = self.canvas_to_page(event.x, event.y)
+            if not event.state & SHIFT_MASK:
+                self.blocks_listbox.selection_clear(0, tk.END)
+            for block_id in self.page_index.blocks_within(left, top, right, bottom):
+                if block_id in self.block_rows:
+                    self.blocks_listbox.selection_set(self.block_rows[block_id])
+        self.on_block_selection_change()
 
     def generate_transcript(self):
         """Generate transcript from selected blocks"""
@@ -487,8 +1307,7 @@ class InteractiveTranscriber:
         try:
             blocks = {}
             for index in selected_indices:
-                block_text = self.blocks_listbox.get(index)
-                block_id = int(block_text.split(":")[0].replace("Block ", ""))
+                block_id = self.listed_blocks[index]
                 blocks[block_id] = self.blocks_data[block_id]
 
             if self.current_analyzer is None:
@@ -496,7 +1315,7 @@ class InteractiveTranscriber:
                 return
 
             paths = self.current_analyzer.generate_transcript(
-                self.output_directory, blocks
+                self.output_directory, blocks, formats=TRANSCRIPT_FORMATS
             )
 
             messagebox.showinfo(
@@ -508,21 +1327,85 @@ class InteractiveTranscriber:
 
             if self.status_var is not None:
                 self.status_var.set(
-                    f"Transcript saved for {self.current_image_path.name}"
+                    f"Transcript saved for {self.current_result.ref.name}"
                 )
+            # The page may have been indexed again, search afresh
+            self.search_query = None
 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to generate transcript: {str(e)}")
 
+    def mark_ocr_cached(self, ref: document.PageRef):
+        """Record in the index that a page now opens without OCR"""
+        if self.thumbnail_index is None:
+            return
+        try:
+            self.thumbnail_index.mark_ocr_cached(ref)
+        except sqlite3.Error:
+            return
+        position = self.page_positions.get(ref)
+        if position in self.thumbnail_cells:
+            self.draw_thumbnail_cell(position)
+
     def quit_prog(self):
-        """Cancel current operation and reset selections"""
+        """Stop the background work, close the indexes and the window.
+
+        Work in progress stops at its next check, so the worker threads end
+        soon after the window does.
+        """
+        self.prefetcher.shutdown()
+        self.reocr_executor.shutdown(wait=False, cancel_futures=True)
+        self.thumbnail_stop.set()
+        self.thumbnail_executor.shutdown(wait=False, cancel_futures=True)
+        self.close_thumbnail_index()
+        self.close_search_index()
+        if self.trace_writer is not None:
+            self.trace_writer.close()
         self.root.destroy()
 
 
-def main():
+def main(argv: Sequence[str] | None = None):
     """Main function to run the interactive transcriber"""
+    parser = argparse.ArgumentParser(
+        prog="polish-magazine-transcriber-gui",
+        description="Review and transcribe magazine scans.",
+    )
+    parser.add_argument(
+        "--prefetch-ahead",
+        type=int,
+        default=prefetch.DEFAULT_AHEAD,
+        metavar="N",
+        help="pages after the current one analyzed in the background "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--prefetch-behind",
+        type=int,
+        default=prefetch.DEFAULT_BEHIND,
+        metavar="N",
+        help="pages before the current one analyzed in the background "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--prefetch-memory",
+        type=int,
+        default=prefetch.DEFAULT_MAX_BYTES // 2**20,
+        metavar="MIB",
+        help="memory analyzed pages may hold before the farthest are dropped "
+        "(default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+    for name in ("prefetch_ahead", "prefetch_behind", "prefetch_memory"):
+        if getattr(args, name) < 0:
+            parser.error(f"--{name.replace('_', '-')} must not be negative")
+
     root = tk.Tk()
-    InteractiveTranscriber(root)
+    InteractiveTranscriber(
+        root,
+        prefetch_ahead=args.prefetch_ahead,
+        prefetch_behind=args.prefetch_behind,
+        prefetch_max_bytes=args.prefetch_memory * 2**20,
+    )
     root.mainloop()
 
 
@@ -1,7 +1,10 @@
-import pandas as pd
 from enum import Enum
 from dataclasses import dataclass, field
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class TessLayout(Enum):
@@ -12,6 +15,89 @@ class TessLayout(Enum):
     WORD = 5
 
 
+class ChildDict(dict):
+    """Children of a layout element, keyed by their Tesseract number.
+
+    Any change clears the cached text of the owner and its ancestors and
+    adopts the new child. Tesseract numbers children in document order, so
+    the insertion order is normally already sorted; that is recorded as the
+    children are added and ``ordered_values`` only sorts when it is not.
+    """
+
+    # Class-level defaults, as unpickling fills the dict before its __dict__
+    owner = None
+    in_order = True
+
+    def __init__(self, owner: "Group", children=()):
+        super().__init__()
+        self.owner = owner
+        self.update(children)
+
+    def __setitem__(self, key, child):
+        # Appending past the last key, the common case, is checked first
+        if self.in_order and self and key < next(reversed(self)) and key not in self:
+            self.in_order = False
+        super().__setitem__(key, child)
+        owner = self.owner
+        if owner is not None:
+            child._parent = owner
+            owner.invalidate_text()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def _changed(self):
+        if self.owner is not None:
+            self.owner.invalidate_text()
+
+    def update(self, *args, **kwargs):
+        children = dict(*args, **kwargs)
+        if self:
+            for key, child in children.items():
+                self[key] = child
+            return
+
+        # Filling an empty dict, as while building a tree: adopt in bulk
+        super().update(children)
+        keys = list(children)
+        self.in_order = all(a < b for a, b in zip(keys, keys[1:]))
+        if self.owner is not None:
+            for child in children.values():
+                child._parent = self.owner
+        self._changed()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, *args):
+        child = super().pop(*args)
+        self._changed()
+        return child
+
+    def popitem(self):
+        item = super().popitem()
+        self._changed()
+        return item
+
+    def clear(self):
+        super().clear()
+        self.in_order = True
+        self._changed()
+
+    def ordered_values(self) -> list:
+        """Children sorted by their number"""
+        if self.in_order:
+            return list(self.values())
+        return [child for _, child in sorted(self.items())]
+
+
 @dataclass
 class Element(ABC):
     level: TessLayout
@@ -19,18 +105,42 @@ class Element(ABC):
     top: int
     width: int
     height: int
+    _parent: "Group | None" = field(
+        init=False, default=None, repr=False, compare=False
+    )
 
     @abstractmethod
     def get_text(self) -> str:
         """To be implemented by subclasses"""
         pass
 
+    def invalidate_text(self):
+        """Forget cached text here and above"""
+        if self._parent is not None:
+            self._parent.invalidate_text()
+
+
+class WordText:
+    """Descriptor for ``Word.text``: setting it clears the text cached by the
+    word's ancestors, so words can be edited in place"""
+
+    def __get__(self, word, owner=None):
+        if word is None:
+            # Tells dataclass the field has no default
+            raise AttributeError("text")
+        return word._word_text
+
+    def __set__(self, word, text):
+        word._word_text = text
+        if word._parent is not None:
+            word._parent.invalidate_text()
+
 
 @dataclass
 class Word(Element):
     level: TessLayout = field(init=False, default=TessLayout.WORD)
     conf: float
-    text: str | None
+    text: str | None = WordText()
 
     def get_text(self) -> str:
         """Get clean text from this word"""
@@ -38,66 +148,282 @@ class Word(Element):
 
 
 @dataclass
-class Line(Element):
+class Group(Element):
+    """An element made of child elements, whose joined text is cached"""
+
+    _text: str | None = field(init=False, default=None, repr=False, compare=False)
+
+    # Name of the ChildDict field and the separator between child texts
+    children_field = ""
+    separator = ""
+
+    def __post_init__(self):
+        children = ChildDict(self, getattr(self, self.children_field))
+        setattr(self, self.children_field, children)
+
+    @property
+    def children(self) -> ChildDict:
+        return getattr(self, self.children_field)
+
+    def replace_children(self, children: dict[int, Element]):
+        """Swap every child for new ones, e.g. from a fresh OCR of the region"""
+        self.children.clear()
+        self.children.update(children)
+
+    def get_text(self) -> str:
+        """Text of the non-empty children, in order, computed once"""
+        if self._text is None:
+            texts = []
+            for child in self.children.ordered_values():
+                text = child.get_text()
+                if text:
+                    texts.append(text)
+            self._text = self.separator.join(texts)
+        return self._text
+
+    def invalidate_text(self):
+        # Stop early: a cleared ancestor chain stays cleared until recomputed
+        if self._text is not None:
+            self._text = None
+            super().invalidate_text()
+
+
+@dataclass
+class Line(Group):
     level: TessLayout = field(init=False, default=TessLayout.LINE)
     words: dict[int, Word] = field(default_factory=dict)
 
-    def get_text(self):
-        """Get text from all words in this line"""
-        word_texts = []
-        for _, word in sorted(self.words.items()):
-            word_text = word.get_text()
-            if word_text:
-                word_texts.append(word_text)
-        return " ".join(word_texts)
+    children_field = "words"
+    separator = " "
 
 
 @dataclass
-class Paragraph(Element):
+class Paragraph(Group):
     level: TessLayout = field(init=False, default=TessLayout.PARA)
     lines: dict[int, Line] = field(default_factory=dict)
 
-    def get_text(self):
-        """Get text from all lines in this paragraph"""
-        line_texts = []
-        for _, line in sorted(self.lines.items()):
-            line_text = line.get_text()
-            if line_text:
-                line_texts.append(line_text)
-        return "\n".join(line_texts)
+    children_field = "lines"
+    separator = "\n"
 
 
 @dataclass
-class Block(Element):
+class Block(Group):
     level: TessLayout = field(init=False, default=TessLayout.BLOCK)
     paragraphs: dict[int, Paragraph] = field(default_factory=dict)
 
-    def get_text(self):
-        """Get text from all paragraphs in this block"""
-        para_texts = []
-        for _, para in sorted(self.paragraphs.items()):
-            para_text = para.get_text()
-            if para_text:
-                para_texts.append(para_text)
-        return "\n\n".join(para_texts)
+    children_field = "paragraphs"
+    separator = "\n\n"
 
 
 @dataclass
-class Page(Element):
+class Page(Group):
     level: TessLayout = field(init=False, default=TessLayout.PAGE)
     blocks: dict[int, Block] = field(default_factory=dict)
 
-    def get_text(self):
-        """Get text from all paragraphs in this block"""
-        block_texts = []
-        for _, block in sorted(self.blocks.items()):
-            block_text = block.get_text()
-            if block_text:
-                block_texts.append(block_text)
-        return "\n\n".join(block_texts)
+    children_field = "blocks"
+    separator = "\n\n"
+
+
+def transform_box(
+    matrix, left: int, top: int, width: int, height: int
+) -> tuple[int, int, int, int]:
+    """Map a box through a 2x3 affine matrix, rotated results are replaced by
+    their axis-aligned bounds"""
+    (a, b, c), (d, e, f) = matrix
+    xs, ys = [], []
+    for x in (left, left + width):
+        for y in (top, top + height):
+            xs.append(a * x + b * y + c)
+            ys.append(d * x + e * y + f)
+    new_left, new_top = round(min(xs)), round(min(ys))
+    return new_left, new_top, round(max(xs)) - new_left, round(max(ys)) - new_top
+
+
+def transform_boxes(element: Element, matrix) -> None:
+    """Map the boxes of an element and its descendants through a 2x3 affine
+    matrix, in place"""
+    stack = [element]
+    while stack:
+        node = stack.pop()
+        node.left, node.top, node.width, node.height = transform_box(
+            matrix, node.left, node.top, node.width, node.height
+        )
+        if isinstance(node, Group):
+            stack.extend(node.children.values())
+
+
+LAYOUT_COLUMNS = (
+    "level",
+    "page_num",
+    "block_num",
+    "par_num",
+    "line_num",
+    "word_num",
+    "left",
+    "top",
+    "width",
+    "height",
+    "conf",
+    "text",
+)
+
+
+def df_to_layout(df: "pd.DataFrame") -> dict[int, Page]:
+    """Build the Page/Block/Paragraph/Line/Word tree from image_to_data output.
+
+    Tesseract emits rows in document order, each parent before its children,
+    so a single pass over plain column lists can keep a cursor on the current
+    page, block, paragraph and line instead of re-resolving the dict chain for
+    every row. Missing word text is stored as None rather than NaN.
+    """
+    columns = [df[name].tolist() for name in LAYOUT_COLUMNS[:-1]]
+    text = df["text"].astype(object)
+    columns.append(text.where(text.notna(), None).tolist())
+
+    page_level = TessLayout.PAGE.value
+    block_level = TessLayout.BLOCK.value
+    para_level = TessLayout.PARA.value
+    line_level = TessLayout.LINE.value
+    word_level = TessLayout.WORD.value
+
+    pages: dict[int, Page] = {}
+    block_key = para_key = line_key = None
+    block = para = line = None
+    for (
+        level,
+        page_num,
+        block_num,
+        par_num,
+        line_num,
+        word_num,
+        left,
+        top,
+        width,
+        height,
+        conf,
+        text,
+    ) in zip(*columns):
+        if level == word_level:
+            if line_key != (page_num, block_num, par_num, line_num):
+                line_key = (page_num, block_num, par_num, line_num)
+                line = (
+                    pages[page_num]
+                    .blocks[block_num]
+                    .paragraphs[par_num]
+                    .lines[line_num]
+                )
+            line.words[word_num] = Word(left, top, width, height, conf, text)
+
+        elif level == line_level:
+            if para_key != (page_num, block_num, par_num):
+                para_key = (page_num, block_num, par_num)
+                para = pages[page_num].blocks[block_num].paragraphs[par_num]
+            line = Line(left, top, width, height)
+            para.lines[line_num] = line
+            line_key = (page_num, block_num, par_num, line_num)
+
+        elif level == para_level:
+            if block_key != (page_num, block_num):
+                block_key = (page_num, block_num)
+                block = pages[page_num].blocks[block_num]
+            para = Paragraph(left, top, width, height)
+            block.paragraphs[par_num] = para
+            para_key = (page_num, block_num, par_num)
+
+        elif level == block_level:
+            block = Block(left, top, width, height)
+            pages[page_num].blocks[block_num] = block
+            block_key = (page_num, block_num)
+
+        elif level == page_level:
+            pages[page_num] = Page(left, top, width, height)
+
+    return pages
+
+
+def tsv_to_layout(tsv: bytes) -> dict[int, Page]:
+    """Build the layout tree straight from raw image_to_data TSV.
+
+    The same single pass as ``df_to_layout`` without going through pandas.
+    Word rows, the bulk of the output, only compare the page, block,
+    paragraph and line numbers as text against the current line, so just
+    the fields that end up in the tree are converted, and the words of a
+    line are added to it all at once. Text is kept verbatim,
+    where pandas would turn words such as "NA" or "null" into NaN; empty
+    text is stored as None.
+    """
+    text = tsv.decode("utf-8", errors="replace").replace("\r\n", "\n")
+    lines = text.split("\n")
+    header = lines[0].split("\t")
+    if header != list(LAYOUT_COLUMNS):
+        raise ValueError(f"Not image_to_data TSV, unexpected header: {header}")
+    n_fields = len(LAYOUT_COLUMNS)
+
+    pages: dict[int, Page] = {}
+    para_key = line_key = None
+    para = line = None
+    words: dict[int, Word] = {}
+    for row in lines[1:]:
+        fields = row.split("\t", n_fields - 1)
+        if len(fields) != n_fields:
+            continue  # Blank trailing line
+        level = fields[0]
+
+        if level == "5":
+            if fields[1:5] != line_key:
+                if words:
+                    line.words.update(words)
+                    words = {}
+                line_key = fields[1:5]
+                page_num, block_num, par_num, line_num = map(int, line_key)
+                line = (
+                    pages[page_num]
+                    .blocks[block_num]
+                    .paragraphs[par_num]
+                    .lines[line_num]
+                )
+            words[int(fields[5])] = Word(
+                int(fields[6]),
+                int(fields[7]),
+                int(fields[8]),
+                int(fields[9]),
+                float(fields[10]),
+                fields[11] or None,
+            )
+            continue
+
+        if words:
+            line.words.update(words)
+            words = {}
+        if level == "4":
+            page_num, block_num, par_num, line_num = map(int, fields[1:5])
+            if para_key != fields[1:4]:
+                para = pages[page_num].blocks[block_num].paragraphs[par_num]
+                para_key = fields[1:4]
+            line = Line(*map(int, fields[6:10]))
+            para.lines[line_num] = line
+            line_key = fields[1:5]
+
+        elif level == "3":
+            page_num, block_num, par_num = map(int, fields[1:4])
+            para = Paragraph(*map(int, fields[6:10]))
+            pages[page_num].blocks[block_num].paragraphs[par_num] = para
+            para_key = fields[1:4]
+
+        elif level == "2":
+            page_num, block_num = map(int, fields[1:3])
+            pages[page_num].blocks[block_num] = Block(*map(int, fields[6:10]))
+
+        elif level == "1":
+            pages[int(fields[1])] = Page(*map(int, fields[6:10]))
+
+    if words:
+        line.words.update(words)
+    return pages
 
 
-def df_to_layout(df: pd.DataFrame):
+def df_to_layout_iterrows(df: "pd.DataFrame") -> dict[int, Page]:
+    """Reference row-by-row builder, kept for equivalence checks and benchmarks"""
     pages = {}
     for _, row in df.iterrows():
         match TessLayout(row.level):
@@ -0,0 +1,191 @@
+import json
+import sqlite3
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from text_recog.document import PageRef
+from text_recog.metrics import stage_totals
+
+if TYPE_CHECKING:
+    from text_recog.batch import BatchOptions, FileResult
+
+# Kept next to the transcripts it describes
+MANIFEST_NAME = ".text_recog_manifest.sqlite"
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    -- PageRef.id, e.g. scans/issue.pdf#3
+    id TEXT PRIMARY KEY,
+    -- The file when it was read
+    size INTEGER,
+    mtime_ns INTEGER,
+    digest TEXT,
+    -- JSON of the options the outputs depend on
+    params TEXT NOT NULL,
+    -- 'done' or 'failed'
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    error TEXT,
+    blocks INTEGER,
+    elapsed REAL,
+    -- JSON objects: seconds per stage, and output path per format
+    timings TEXT,
+    outputs TEXT,
+    -- time.time() when the result came in
+    finished REAL NOT NULL
+);
+"""
+
+
+def run_params(options: "BatchOptions") -> str:
+    """The options a page's outputs depend on, as stored in the manifest"""
+    params = {
+        "transcripts_dir": options.transcripts_dir.as_posix(),
+        "overlays_dir": options.overlays_dir and options.overlays_dir.as_posix(),
+        "formats": sorted(options.formats),
+        "ignore_blank_blocks": options.ignore_blank_blocks,
+        "engine": options.engine,
+        "preprocessing": options.preprocessing and list(options.preprocessing),
+    }
+    return json.dumps(params, sort_keys=True)
+
+
+@dataclass
+class Entry:
+    size: int | None
+    mtime_ns: int | None
+    digest: str | None
+    params: str
+    status: str
+    attempts: int
+    error: str | None
+    blocks: int | None
+    elapsed: float | None
+    timings: str | None
+    outputs: str | None
+    finished: float
+
+
+class Manifest:
+    """Durable record of the pages a batch has processed, so an interrupted
+    run resumes where it stopped.
+
+    One SQLite row per page holds the file's size, mtime and content hash,
+    the options it was processed with, whether it succeeded and after how
+    many attempts, its stage timings and its output paths. A page is done
+    for as long as its file, the options and its outputs stay the same.
+
+    Only the process collecting results writes to it, a commit per result.
+    In WAL mode without syncing every commit that takes some 30 µs, far
+    below the time of a page, and lookups are served from a copy of the
+    rows in memory.
+    """
+
+    def __init__(self, path: Path, params: str, resume: bool = True):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.params = params
+        self._db = sqlite3.connect(path, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._db.executescript(
+                "DROP TABLE IF EXISTS pages;"
+                + SCHEMA
+                + f"PRAGMA user_version={SCHEMA_VERSION};"
+            )
+        self._entries: dict[str, Entry] = {}
+        if resume:
+            columns = ", ".join(Entry.__dataclass_fields__)
+            for row in self._db.execute(f"SELECT id, {columns} FROM pages"):
+                self._entries[row[0]] = Entry(*row[1:])
+
+    def _current(self, ref: PageRef) -> Entry | None:
+        """The entry of a page, if it still applies to its file and options"""
+        entry = self._entries.get(ref.id)
+        if entry is None or entry.params != self.params:
+            return None
+        try:
+            stat = ref.path.stat()
+        except OSError:
+            return None
+        if (entry.size, entry.mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            return None
+        return entry
+
+    def skip_reason(self, ref: PageRef, max_attempts: int) -> str | None:
+        """Why a page need not be processed again, if it need not: 'done',
+        or 'failed' once it ran out of attempts"""
+        entry = self._current(ref)
+        if entry is None:
+            return None
+        if entry.status == "done":
+            outputs = json.loads(entry.outputs or "{}").values()
+            if all(Path(output).exists() for output in outputs):
+                return "done"
+            return None
+        if entry.attempts >= max_attempts:
+            return "failed"
+        return None
+
+    def record(self, result: "FileResult") -> int:
+        """Store the result of a page, returning how many times in a row it
+        has been tried with this file and these options"""
+        stat = result.stat
+        if stat is None:
+            # Its worker died, or the file could not be opened
+            try:
+                file_stat = result.path.stat()
+                stat = file_stat.st_size, file_stat.st_mtime_ns
+            except OSError:
+                stat = None, None
+        previous = self._entries.get(result.ref.id)
+        attempts = 1
+        if (
+            previous is not None
+            and previous.status == "failed"
+            and previous.params == self.params
+            and (previous.size, previous.mtime_ns) == stat
+        ):
+            attempts = previous.attempts + 1
+        size, mtime_ns = stat
+        entry = Entry(
+            size=size,
+            mtime_ns=mtime_ns,
+            digest=result.digest,
+            params=self.params,
+            status="done" if result.ok else "failed",
+            attempts=attempts,
+            error=result.error,
+            blocks=result.blocks if result.ok else None,
+            elapsed=result.elapsed,
+            timings=json.dumps(stage_totals(result.spans)),
+            outputs=json.dumps(
+                {name: path.as_posix() for name, path in result.outputs.items()}
+            ),
+            finished=time.time(),
+        )
+        self._entries[result.ref.id] = entry
+        columns = ", ".join(["id", *Entry.__dataclass_fields__])
+        placeholders = ", ".join("?" * (len(Entry.__dataclass_fields__) + 1))
+        with self._db:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO pages ({columns}) VALUES ({placeholders})",
+                (result.ref.id, *asdict(entry).values()),
+            )
+        return attempts
+
+    def close(self):
+        if self._db is None:
+            return
+        self._db.close()
+        self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,179 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+METRICS_ENV_VAR = "TEXT_RECOG_METRICS"
+TRACE_ENV_VAR = "TEXT_RECOG_TRACE"
+# Spans kept in memory; beyond that the oldest are dropped
+DEFAULT_MAX_SPANS = 100_000
+
+
+def default_trace_path() -> Path | None:
+    """Where to write the trace, from TEXT_RECOG_TRACE; None to not write one"""
+    if trace_path := os.environ.get(TRACE_ENV_VAR):
+        return Path(trace_path)
+    return None
+
+
+@dataclass(frozen=True)
+class Span:
+    """One timed run of a stage"""
+
+    name: str
+    page: str | None
+    # time.perf_counter() at the start, in seconds
+    start: float
+    duration: float
+    pid: int
+    thread: int
+
+
+class Metrics:
+    """Wall time spent in each stage of the pipeline, per page.
+
+    Stages are timed with ``stage``, which costs two clock reads and an
+    append, so it stays on by default; set TEXT_RECOG_METRICS=0 to turn it
+    off. Safe to use from several threads.
+    """
+
+    def __init__(
+        self, enabled: bool | None = None, max_spans: int = DEFAULT_MAX_SPANS
+    ):
+        if enabled is None:
+            enabled = os.environ.get(METRICS_ENV_VAR, "1") != "0"
+        self.enabled = enabled
+        self._spans: deque[Span] = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, page: str | None = None) -> Iterator[None]:
+        """Time the body of the ``with`` statement as stage ``name``"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(
+                Span(
+                    name,
+                    page,
+                    start,
+                    time.perf_counter() - start,
+                    os.getpid(),
+                    threading.get_native_id(),
+                )
+            )
+
+    def add(self, *spans: Span):
+        with self._lock:
+            self._spans.extend(spans)
+
+    def spans(self, page: str | None = None, since: float | None = None) -> list[Span]:
+        """Recorded spans, oldest first, of one page or of all of them, and
+        only those started at ``since`` or later if given"""
+        with self._lock:
+            spans = list(self._spans)
+        return [
+            span
+            for span in spans
+            if (page is None or span.page == page)
+            and (since is None or span.start >= since)
+        ]
+
+    def page_timings(self, page: str) -> dict[str, float]:
+        """Total seconds per stage of one page, in the order stages first ran"""
+        return stage_totals(self.spans(page))
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+def stage_totals(spans: Iterable[Span]) -> dict[str, float]:
+    totals: dict[str, float] = {}
+    for span in spans:
+        totals[span.name] = totals.get(span.name, 0.0) + span.duration
+    return totals
+
+
+def format_timings(timings: dict[str, float]) -> str:
+    """Short human readable summary, e.g. for a status bar"""
+    return ", ".join(
+        f"{name} {seconds:.1f} s" if seconds >= 1 else f"{name} {seconds * 1000:.0f} ms"
+        for name, seconds in timings.items()
+    )
+
+
+class TraceWriter:
+    """Streams the stage timings of each page to a trace file.
+
+    A ``.json`` path gets the Chrome trace event format, one complete event
+    per span, to open in chrome://tracing or Perfetto. Any other path gets
+    JSON Lines with one record per page: its stages and their total seconds.
+    Records are flushed as pages are written, so an interrupted run keeps
+    its trace.
+    """
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.chrome = path.suffix == ".json"
+        self.pages = 0
+        self._file = path.open("w", encoding="utf-8")
+        self._events = 0
+        if self.chrome:
+            self._file.write("[")
+
+    def write_page(self, page: str, spans: Iterable[Span]):
+        spans = list(spans)
+        if self.chrome:
+            for span in spans:
+                event = {
+                    "name": span.name,
+                    "cat": "stage",
+                    "ph": "X",
+                    "ts": round(span.start * 1e6),
+                    "dur": round(span.duration * 1e6),
+                    "pid": span.pid,
+                    "tid": span.thread,
+                    "args": {"page": span.page},
+                }
+                separator = ",\n" if self._events else "\n"
+                self._file.write(separator + json.dumps(event))
+                self._events += 1
+        else:
+            totals = stage_totals(spans)
+            record = {
+                "page": page,
+                "total_s": sum(totals.values()),
+                "stages": totals,
+            }
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.pages += 1
+
+    def close(self):
+        if self._file is None:
+            return
+        if self.chrome:
+            self._file.write("\n]\n")
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Shared by everything that is not given its own Metrics
+METRICS = Metrics()
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Sequence
+
+from text_recog import compact, layout
+from text_recog.cache import OCRCache
+from text_recog.document import PageRef
+from text_recog.metrics import Span
+
+if TYPE_CHECKING:
+    # Pulls in OpenCV and numpy, only needed once a page is analyzed
+    from text_recog.render import ImagePyramid
+    from text_recog.segment import MagazineLayoutAnalyzer
+    from text_recog.spatial import PageIndex
+
+DEFAULT_AHEAD = 2
+DEFAULT_BEHIND = 1
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB of decoded pages
+DEFAULT_WORKERS = 2
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker once its job has been cancelled"""
+
+
+@dataclass
+class PageResult:
+    ref: PageRef
+    analyzer: MagazineLayoutAnalyzer
+    # Columnar rather than a tree of objects, many pages stay resident
+    page: compact.CompactPage
+    overlay: ImagePyramid
+    index: PageIndex
+    # Stage timings of the analysis
+    spans: list[Span] = field(default_factory=list)
+    # Whether the timings went to the trace already
+    traced: bool = False
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by this result, dominated by pixel data"""
+        return (
+            self.analyzer.nbytes
+            + sum(level.nbytes for level in self.overlay.levels)
+            + self.page.nbytes
+        )
+
+    def replace_block(
+        self, block_num: int, paragraphs: dict[int, layout.Paragraph]
+    ) -> layout.Block:
+        """Put a re-OCRed block in the page and index the page again"""
+        from text_recog.spatial import PageIndex
+
+        block = self.page.replace_block(block_num, paragraphs)
+        self.index = PageIndex(self.page)
+        return block
+
+
+class PageJob:
+    """Handle on the analysis of one page.
+
+    The worker reports the stage it is in through ``enter``, which is also
+    where a cancelled job stops: Tesseract itself cannot be interrupted, but
+    nothing after the current stage is run.
+    """
+
+    def __init__(self, ref: PageRef):
+        self.ref = ref
+        self.stage = "queued"
+        self.future: Future[PageResult] | None = None
+        self._cancel_event = threading.Event()
+
+    def enter(self, stage: str):
+        if self._cancel_event.is_set():
+            raise JobCancelled(self.ref.name)
+        self.stage = stage
+
+    def cancel(self):
+        self._cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def succeeded(self) -> bool:
+        return (
+            self.done()
+            and not self.future.cancelled()
+            and self.future.exception() is None
+        )
+
+    def result(self) -> PageResult:
+        return self.future.result()
+
+
+def draw_overlay(
+    analyzer: MagazineLayoutAnalyzer, blocks: dict[int, layout.Block]
+) -> ImagePyramid:
+    """The page with its blocks drawn on, ready to render.
+
+    In low-memory mode the full resolution page is let go of and blocks are
+    drawn on a copy decoded at a fraction of the size instead.
+    """
+    from text_recog.render import ImagePyramid
+    from text_recog.segment import DISPLAY_REDUCTION
+
+    if not analyzer.low_memory:
+        drawn = analyzer.add_block_overlay(blocks)
+        with analyzer.stage("pyramid"):
+            return ImagePyramid(drawn)
+
+    analyzer.release()
+    reduction = DISPLAY_REDUCTION
+    drawn = analyzer.add_block_overlay(
+        blocks, analyzer.display_image(reduction), scale=1 / reduction
+    )
+    with analyzer.stage("pyramid"):
+        return ImagePyramid(drawn, scale=reduction)
+
+
+def analyze_page(
+    ref: PageRef, job: PageJob, cache: OCRCache | None = None
+) -> PageResult:
+    """Decode, OCR and draw the overlay of one page; safe off the Tk thread"""
+    from text_recog.segment import MagazineLayoutAnalyzer
+    from text_recog.spatial import PageIndex
+
+    start = time.perf_counter()
+    job.enter("decoding")
+    analyzer = MagazineLayoutAnalyzer(ref.path, cache=cache, page=ref.page)
+
+    job.enter("running OCR")
+    tsv = analyzer.run_tesseract()
+
+    job.enter("building layout")
+    with analyzer.stage("layout"):
+        (page,) = compact.tsv_to_compact(tsv).values()
+    with analyzer.stage("index"):
+        index = PageIndex(page)
+
+    job.enter("drawing overlay")
+    overlay = draw_overlay(analyzer, page.blocks)
+    with analyzer.stage("pyramid"):
+        overlay.level(overlay.max_level)
+
+    job.enter("done")
+    spans = analyzer.metrics.spans(analyzer.page_id, since=start)
+    return PageResult(ref, analyzer, page, overlay, index, spans)
+
+
+class PagePrefetcher:
+    """Speculatively analyzes the pages around the one being reviewed.
+
+    Every page gets at most one job, so a page the user navigates to is
+    either already analyzed, still in flight, or submitted on demand. Jobs
+    that fall outside the prefetch window are cancelled, and finished
+    results are dropped farthest-first once their pixel data goes over
+    ``max_bytes``, checked on navigation and as each analysis finishes.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[PageRef, PageJob], PageResult],
+        ahead: int = DEFAULT_AHEAD,
+        behind: int = DEFAULT_BEHIND,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_workers: int = DEFAULT_WORKERS,
+    ):
+        self.load = load
+        self.ahead = ahead
+        self.behind = behind
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="prefetch"
+        )
+        self._jobs: dict[PageRef, PageJob] = {}
+        # Workers finishing a job enforce the memory cap too; reentrant, as a
+        # job may finish before its callback is added
+        self._lock = threading.RLock()
+        # Pages last prefetched around, the position of each, and the index
+        # of the one being reviewed
+        self._refs: Sequence[PageRef] = ()
+        self._positions: dict[PageRef, int] = {}
+        self._index = 0
+
+    def get(self, ref: PageRef) -> PageJob:
+        """Job analyzing the page ``ref``, submitting it if needed"""
+        with self._lock:
+            job = self._jobs.get(ref)
+            # Cancelled and failed analyses are retried rather than remembered
+            if job is None or job.cancelled or (job.done() and not job.succeeded()):
+                job = PageJob(ref)
+                job.future = self._executor.submit(self.load, ref, job)
+                self._jobs[ref] = job
+                job.future.add_done_callback(self._job_done)
+            return job
+
+    def _job_done(self, future: Future[PageResult]):
+        if not future.cancelled() and future.exception() is None:
+            with self._lock:
+                self._enforce_memory_cap()
+
+    def prefetch_around(self, refs: Sequence[PageRef], index: int):
+        """Queue the neighbours of ``refs[index]``, nearest first.
+
+        The following pages of a multi-page document are neighbours like any
+        other, so they are analyzed in parallel while one is being read.
+        """
+        with self._lock:
+            if refs is not self._refs or len(refs) != len(self._positions):
+                self._refs = refs
+                self._positions = {ref: pos for pos, ref in enumerate(refs)}
+            self._index = index
+
+            window = {refs[index]}
+            for distance in range(1, max(self.ahead, self.behind) + 1):
+                if distance <= self.ahead and index + distance < len(refs):
+                    window.add(refs[index + distance])
+                    self.get(refs[index + distance])
+                if distance <= self.behind and index - distance >= 0:
+                    window.add(refs[index - distance])
+                    self.get(refs[index - distance])
+
+            # Work that is no longer wanted should not hold up the window
+            for ref, job in list(self._jobs.items()):
+                if ref not in window and not job.done():
+                    job.cancel()
+                    del self._jobs[ref]
+
+            self._enforce_memory_cap()
+
+    def _enforce_memory_cap(self):
+        """Drop finished results, farthest from the page being reviewed
+        first, until the rest fit in ``max_bytes``. Called with the lock"""
+        positions, index = self._positions, self._index
+
+        def distance(ref: PageRef) -> int:
+            return abs(positions.get(ref, len(positions)) - index)
+
+        done = [
+            (distance(ref), ref, job)
+            for ref, job in self._jobs.items()
+            if job.succeeded()
+        ]
+        total = sum(job.result().nbytes for _, _, job in done)
+        for dist, ref, job in sorted(done, key=lambda item: -item[0]):
+            if total <= self.max_bytes or dist == 0:
+                break
+            total -= job.result().nbytes
+            del self._jobs[ref]
+
+    def reset(self):
+        """Forget every result and cancel pending work, e.g. on folder change"""
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel()
+            self._jobs.clear()
+            self._refs, self._positions, self._index = (), {}, 0
+
+    def shutdown(self):
+        self.reset()
+        self._executor.shutdown(wait=False, cancel_futures=True)
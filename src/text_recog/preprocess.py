@@ -0,0 +1,271 @@
+import os
+from typing import TYPE_CHECKING, Callable, Sequence
+
+import numpy as np
+
+from text_recog.layout import transform_box
+
+if TYPE_CHECKING:
+    import cv2
+
+PREPROCESS_ENV_VAR = "TEXT_RECOG_PREPROCESS"
+
+# Adaptive binarization: neighbourhood size in pixels and offset below its mean
+BINARIZE_BLOCK_SIZE = 31
+BINARIZE_OFFSET = 15
+# Deskew: angles searched, in degrees, and the width the search runs at
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.1
+DESKEW_SEARCH_WIDTH = 1000
+DESKEW_MIN_ANGLE = 0.05
+DESPECKLE_KERNEL = 3
+# Border crop: paper must be this share of the scan for a crop to happen
+BORDER_MIN_PAPER = 0.5
+BORDER_MARGIN = 4
+# Autoscale: median glyph height Tesseract reads best at, the range of scale
+# factors allowed, and the scales close enough to 1 not to bother resampling
+TARGET_TEXT_HEIGHT = 20
+AUTOSCALE_RANGE = (0.2, 4.0)
+AUTOSCALE_TOLERANCE = (0.8, 1.25)
+# Width the glyph size estimate is run at, and the plausible glyphs it keeps
+TEXT_HEIGHT_SEARCH_WIDTH = 2500
+GLYPH_ASPECT_RANGE = (0.15, 2.5)
+MIN_GLYPH_HEIGHT = 4
+
+# A step returns the new image and the 2x3 affine matrix taking a point of
+# the new image back to the image it was given
+Step = Callable[["cv2.typing.MatLike"], tuple["cv2.typing.MatLike", np.ndarray]]
+IDENTITY = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+
+
+def to_gray(image: "cv2.typing.MatLike") -> "cv2.typing.MatLike":
+    import cv2
+
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def grayscale(image: "cv2.typing.MatLike"):
+    """Drop colour, a third of the pixels for Tesseract to convert"""
+    return to_gray(image), IDENTITY
+
+
+def binarize(image: "cv2.typing.MatLike"):
+    """Local mean thresholding, robust to uneven lighting and yellowed paper"""
+    import cv2
+
+    binary = cv2.adaptiveThreshold(
+        to_gray(image),
+        255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY,
+        BINARIZE_BLOCK_SIZE,
+        BINARIZE_OFFSET,
+    )
+    return binary, IDENTITY
+
+
+def estimate_skew(image: "cv2.typing.MatLike") -> float:
+    """Angle, in degrees, that text lines are rotated by.
+
+    Rotating the ink of a downscaled copy by each candidate angle, the one
+    that lines text up with the rows gives the sharpest row profile.
+    """
+    import cv2
+
+    gray = to_gray(image)
+    scale = min(1.0, DESKEW_SEARCH_WIDTH / gray.shape[1])
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+
+    height, width = ink.shape
+    centre = (width / 2, height / 2)
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + 1e-9, DESKEW_STEP):
+        matrix = cv2.getRotationMatrix2D(centre, angle, 1.0)
+        rotated = cv2.warpAffine(ink, matrix, (width, height), flags=cv2.INTER_NEAREST)
+        score = float(np.var(rotated.sum(axis=1, dtype=np.float64)))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return -best_angle
+
+
+def deskew(image: "cv2.typing.MatLike"):
+    """Rotate the page so text lines are horizontal"""
+    import cv2
+
+    angle = estimate_skew(image)
+    if abs(angle) < DESKEW_MIN_ANGLE:
+        return image, IDENTITY
+
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), -angle, 1.0)
+    rotated = cv2.warpAffine(
+        image,
+        matrix,
+        (width, height),
+        flags=cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_REPLICATE,
+    )
+    return rotated, cv2.invertAffineTransform(matrix)
+
+
+def despeckle(image: "cv2.typing.MatLike"):
+    """Median filter away isolated dots left by halftones, dust and noise"""
+    import cv2
+
+    return cv2.medianBlur(image, DESPECKLE_KERNEL), IDENTITY
+
+
+def bordercrop(image: "cv2.typing.MatLike"):
+    """Cut away the dark scanner bed around the page"""
+    import cv2
+
+    gray = to_gray(image)
+    _, paper = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(paper, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return image, IDENTITY
+
+    x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+    height, width = gray.shape
+    if w * h < BORDER_MIN_PAPER * width * height:
+        return image, IDENTITY  # No clear page, better not guess
+
+    left = max(0, x + BORDER_MARGIN)
+    top = max(0, y + BORDER_MARGIN)
+    right = min(width, x + w - BORDER_MARGIN)
+    bottom = min(height, y + h - BORDER_MARGIN)
+    if (left, top, right, bottom) == (0, 0, width, height) or right <= left:
+        return image, IDENTITY
+    return (
+        image[top:bottom, left:right],
+        np.array([[1.0, 0.0, left], [0.0, 1.0, top]]),
+    )
+
+
+def estimate_text_height(image: "cv2.typing.MatLike") -> float | None:
+    """Median height of glyph-like connected components, in pixels.
+
+    Runs on a copy reduced to a bounded width, so a 600 dpi master costs no
+    more than a screen-resolution scan. None if the page shows no text.
+    """
+    import cv2
+
+    gray = to_gray(image)
+    scale = min(1.0, TEXT_HEIGHT_SEARCH_WIDTH / gray.shape[1])
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+
+    # Skip the background component, then noise, rules and pictures
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    aspect = widths / np.maximum(heights, 1)
+    glyphs = heights[
+        (heights >= MIN_GLYPH_HEIGHT)
+        & (heights < gray.shape[0] / 20)
+        & (aspect >= GLYPH_ASPECT_RANGE[0])
+        & (aspect <= GLYPH_ASPECT_RANGE[1])
+    ]
+    if len(glyphs) == 0:
+        return None
+    return float(np.median(glyphs)) / scale
+
+
+def autoscale(image: "cv2.typing.MatLike"):
+    """Resize so text is about TARGET_TEXT_HEIGHT pixels tall.
+
+    Shrinks high resolution masters, where Tesseract time grows with pixel
+    count but not accuracy, and enlarges small print.
+    """
+    import cv2
+
+    text_height = estimate_text_height(image)
+    if text_height is None:
+        return image, IDENTITY
+    low, high = AUTOSCALE_RANGE
+    factor = min(max(TARGET_TEXT_HEIGHT / text_height, low), high)
+    if AUTOSCALE_TOLERANCE[0] <= factor <= AUTOSCALE_TOLERANCE[1]:
+        return image, IDENTITY
+
+    interpolation = cv2.INTER_AREA if factor < 1 else cv2.INTER_CUBIC
+    resized = cv2.resize(
+        image, None, fx=factor, fy=factor, interpolation=interpolation
+    )
+    # Rounding makes the actual factor differ slightly on each axis
+    scale_x = image.shape[1] / resized.shape[1]
+    scale_y = image.shape[0] / resized.shape[0]
+    return resized, np.array([[scale_x, 0.0, 0.0], [0.0, scale_y, 0.0]])
+
+
+STEPS: dict[str, Step] = {
+    "grayscale": grayscale,
+    "binarize": binarize,
+    "deskew": deskew,
+    "despeckle": despeckle,
+    "bordercrop": bordercrop,
+    "autoscale": autoscale,
+}
+
+
+def parse_pipeline(spec: str | Sequence[str]) -> tuple[str, ...]:
+    """Validate step names, given as a sequence or a comma separated string"""
+    if isinstance(spec, str):
+        spec = [name.strip() for name in spec.split(",") if name.strip()]
+    for name in spec:
+        if name not in STEPS:
+            raise ValueError(
+                f"Unknown preprocessing step {name!r}, expected one of {list(STEPS)}"
+            )
+    return tuple(spec)
+
+
+def default_pipeline() -> tuple[str, ...]:
+    """Steps named in $TEXT_RECOG_PREPROCESS, none by default"""
+    return parse_pipeline(os.environ.get(PREPROCESS_ENV_VAR, ""))
+
+
+def compose(outer: np.ndarray, inner: np.ndarray) -> np.ndarray:
+    """2x3 matrix applying ``inner`` first, then ``outer``"""
+    return (np.vstack([outer, [0, 0, 1]]) @ np.vstack([inner, [0, 0, 1]]))[:2]
+
+
+def run_pipeline(
+    image: "cv2.typing.MatLike", steps: Sequence[str]
+) -> tuple["cv2.typing.MatLike", np.ndarray]:
+    """Apply steps in order.
+
+    :return: the processed image, and the matrix taking its coordinates back
+        to those of ``image``
+    """
+    to_source = IDENTITY
+    for name in steps:
+        image, to_previous = STEPS[name](image)
+        to_source = compose(to_source, to_previous)
+    return image, to_source
+
+
+def remap_tsv(tsv: bytes, matrix: np.ndarray) -> bytes:
+    """Map the boxes of image_to_data TSV through a 2x3 affine matrix.
+
+    Rotated boxes are replaced by their axis-aligned bounds. Everything else,
+    text included, is passed through untouched.
+    """
+    if np.allclose(matrix, IDENTITY):
+        return tsv
+    matrix = matrix.tolist()
+
+    lines = tsv.split(b"\n")
+    out = [lines[0]]
+    for line in lines[1:]:
+        fields = line.split(b"\t", 11)
+        if len(fields) < 10:
+            out.append(line)
+            continue
+        box = transform_box(matrix, *(int(value) for value in fields[6:10]))
+        fields[6:10] = [str(value).encode() for value in box]
+        out.append(b"\t".join(fields))
+    return b"\n".join(out)
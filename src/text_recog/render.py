@@ -0,0 +1,96 @@
+import math
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import cv2
+
+MIN_LEVEL_SIZE = 256
+
+
+def region_contains(
+    outer: tuple[int, int, int, int], inner: tuple[int, int, int, int]
+) -> bool:
+    """Whether the (left, top, right, bottom) region ``inner`` lies in ``outer``"""
+    return (
+        outer[0] <= inner[0]
+        and outer[1] <= inner[1]
+        and inner[2] <= outer[2]
+        and inner[3] <= outer[3]
+    )
+
+
+class ImagePyramid:
+    """Cached multi-resolution copies of a page for on-screen rendering.
+
+    Level ``i`` is the page downscaled by ``2 ** i``. Levels are built lazily,
+    each from the previous one, the first time a zoom level needs them. Only
+    the requested region is ever cropped and scaled, so the cost of a render
+    depends on the size of the viewport, not on the size of the scan.
+
+    ``image`` may itself be the page downscaled ``scale`` times, a power of
+    two; it then stands in for the finer levels, saving their memory.
+    """
+
+    def __init__(
+        self,
+        image: "cv2.typing.MatLike",
+        min_size: int = MIN_LEVEL_SIZE,
+        scale: int = 1,
+    ):
+        self.levels = [image]
+        self.height, self.width = (side * scale for side in image.shape[:2])
+        self.first_level = int(math.log2(scale))
+        self.max_level = max(
+            self.first_level,
+            int(math.log2(max(1, min(self.height, self.width) / min_size))),
+        )
+
+    def level(self, index: int) -> "cv2.typing.MatLike":
+        import cv2
+
+        index = max(0, index - self.first_level)
+        while len(self.levels) <= index:
+            self.levels.append(cv2.pyrDown(self.levels[-1]))
+        return self.levels[index]
+
+    def level_for(self, zoom: float) -> int:
+        """The smallest level that still has at least ``zoom`` resolution"""
+        if zoom >= 1:
+            return 0
+        return min(self.max_level, int(math.log2(1 / zoom)))
+
+    def zoomed_size(self, zoom: float) -> tuple[int, int]:
+        return int(self.width * zoom), int(self.height * zoom)
+
+    def render(
+        self, zoom: float, left: int, top: int, width: int, height: int
+    ) -> tuple["cv2.typing.MatLike", int, int]:
+        """Render a region given in zoomed coordinates at the given zoom.
+
+        The region is widened to whole source pixels, so the rendered image
+        may start slightly before ``(left, top)``.
+
+        :return: the rendered image and its zoomed-space origin
+        """
+        import cv2
+
+        source = self.level(self.level_for(zoom))
+        # Source pixels per zoomed pixel
+        scale_x = source.shape[1] / self.width / zoom
+        scale_y = source.shape[0] / self.height / zoom
+
+        x0 = max(0, int(left * scale_x))
+        y0 = max(0, int(top * scale_y))
+        x1 = min(source.shape[1], math.ceil((left + width) * scale_x))
+        y1 = min(source.shape[0], math.ceil((top + height) * scale_y))
+
+        origin_x, origin_y = round(x0 / scale_x), round(y0 / scale_y)
+        size = (
+            max(1, round(x1 / scale_x) - origin_x),
+            max(1, round(y1 / scale_y) - origin_y),
+        )
+        interpolation = cv2.INTER_AREA if scale_x > 1 else cv2.INTER_LINEAR
+        rendered = cv2.resize(
+            source[y0:y1, x0:x1], size, interpolation=interpolation
+        )
+        return rendered, origin_x, origin_y
@@ -0,0 +1,320 @@
+import json
+import re
+import sqlite3
+import unicodedata
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
+
+from text_recog import document
+
+if TYPE_CHECKING:
+    from text_recog import layout
+
+# Written next to the transcripts, as the "search" transcript format
+INDEX_NAME = "search_index.sqlite"
+SCHEMA_VERSION = 1
+DEFAULT_LIMIT = 100
+# Terms a prefix query expands to at most, the most frequent ones
+MAX_PREFIX_TERMS = 256
+# Above any page row id
+MAX_PAGE_ID = 2**63 - 1
+
+# Folded before anything else; NFKD takes care of the rest but is slower,
+# and ł has no decomposition at all
+POLISH_FOLD = str.maketrans("ąćęłńóśźż", "acelnoszz")
+TERM_RE = re.compile(r"\w+")
+QUERY_RE = re.compile(r"(\w+)(\*?)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    -- document.page_id of the page, from the absolute path
+    key TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    -- 0-based page within a document, NULL for a single image
+    page INTEGER,
+    -- JSON object of the postings of each term on the page, to drop them
+    -- when the page is indexed again
+    terms TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    term TEXT NOT NULL UNIQUE,
+    -- Postings of the term, so queries start from their rarest term
+    postings INTEGER NOT NULL DEFAULT 0
+);
+-- Clustered by term, so the postings of one are a single range
+CREATE TABLE IF NOT EXISTS postings (
+    term INTEGER NOT NULL,
+    page INTEGER NOT NULL,
+    -- Position of the word on the page, in reading order
+    word INTEGER NOT NULL,
+    block INTEGER NOT NULL,
+    -- The word as transcribed, and its box in page pixels
+    text TEXT NOT NULL,
+    left INTEGER NOT NULL,
+    top INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    PRIMARY KEY (term, page, word)
+) WITHOUT ROWID;
+"""
+
+
+def fold(text: str) -> str:
+    """Case and diacritics folded, so that e.g. 'Łódź' and 'LODZ' match"""
+    text = text.casefold().translate(POLISH_FOLD)
+    if text.isascii():
+        return text
+    return "".join(
+        char
+        for char in unicodedata.normalize("NFKD", text)
+        if not unicodedata.combining(char)
+    )
+
+
+def terms(text: str) -> list[str]:
+    """Folded terms of a piece of text, split on anything but letters and
+    digits"""
+    return TERM_RE.findall(fold(text))
+
+
+def page_postings(blocks: dict[int, "layout.Block"]) -> list[tuple]:
+    """Postings of the words of a page, each its term, position in reading
+    order, block, text and box.
+
+    Needs no index, so batch workers compute them and leave the writing to
+    the parent process.
+    """
+    postings = []
+    word_number = 0
+    for block_id, block in sorted(blocks.items()):
+        for _, paragraph in sorted(block.paragraphs.items()):
+            for _, line in sorted(paragraph.lines.items()):
+                for _, word in sorted(line.words.items()):
+                    text = word.get_text()
+                    if not text:
+                        continue
+                    box = (word.left, word.top, word.width, word.height)
+                    for term in set(terms(text)):
+                        postings.append((term, word_number, block_id, text, *box))
+                    word_number += 1
+    return postings
+
+
+@dataclass(frozen=True)
+class Hit:
+    """One word matching a query"""
+
+    path: Path
+    # 0-based page within a document, None for a single image
+    page: int | None
+    block: int
+    text: str
+    left: int
+    top: int
+    width: int
+    height: int
+
+    @property
+    def name(self) -> str:
+        if self.page is None:
+            return self.path.name
+        return f"{self.path.name} [{self.page + 1}]"
+
+
+class SearchIndex:
+    """Inverted index of the words of transcribed pages.
+
+    Each posting ties a folded term to a page, the block it is in and the
+    box of the word, and is kept in a table clustered by term, so looking a
+    term up is one range read whatever the size of the index. Pages are
+    indexed as their transcripts are written and replace their previous
+    postings. Several processes may write at once; SQLite serializes them,
+    so a batch writes from its parent process alone.
+    """
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        if self._schema_version() != SCHEMA_VERSION:
+            with self._write():
+                # Another process may have just created it
+                if self._schema_version() != SCHEMA_VERSION:
+                    for table in ("postings", "terms", "pages"):
+                        self.db.execute(f"DROP TABLE IF EXISTS {table}")
+                    for statement in SCHEMA.split(";"):
+                        self.db.execute(statement)
+                    self.db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def _schema_version(self) -> int:
+        return self.db.execute("PRAGMA user_version").fetchone()[0]
+
+    @contextmanager
+    def _write(self) -> Iterator[None]:
+        """A write transaction, taking the lock up front: upgrading a read
+        transaction fails straight away if another process is writing"""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.rollback()
+            raise
+        self.db.commit()
+
+    def add_page(
+        self, path: Path, page: int | None, blocks: dict[int, "layout.Block"]
+    ) -> int:
+        """Index the words of a page, replacing what was indexed for it.
+
+        :return: the number of postings written
+        """
+        return self.add_postings(path, page, page_postings(blocks))
+
+    def add_postings(self, path: Path, page: int | None, postings: list[tuple]) -> int:
+        """Index a page from its ``page_postings``, replacing what was indexed
+        for it.
+
+        :return: the number of postings written
+        """
+        counts = Counter(posting[0] for posting in postings)
+
+        path = path.resolve()
+        key = document.page_id(path, page)
+        with self._write():
+            row = self.db.execute(
+                "SELECT id, terms FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                page_id = self.db.execute(
+                    "INSERT INTO pages (key, path, page, terms) VALUES (?, ?, ?, '{}')",
+                    (key, path.as_posix(), page),
+                ).lastrowid
+            else:
+                page_id = row[0]
+                old = json.loads(row[1])
+                self.db.executemany(
+                    "DELETE FROM postings WHERE term = ? AND page = ?",
+                    [(int(term_id), page_id) for term_id in old],
+                )
+                self.db.executemany(
+                    "UPDATE terms SET postings = postings - ? WHERE id = ?",
+                    [(count, int(term_id)) for term_id, count in old.items()],
+                )
+
+            term_ids = {}
+            for term, count in counts.items():
+                term_ids[term] = self.db.execute(
+                    "INSERT INTO terms (term, postings) VALUES (?, ?)"
+                    " ON CONFLICT (term) DO UPDATE"
+                    " SET postings = postings + excluded.postings RETURNING id",
+                    (term, count),
+                ).fetchone()[0]
+            self.db.executemany(
+                "INSERT OR IGNORE INTO postings"
+                " (term, page, word, block, text, left, top, width, height)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(term_ids[term], page_id, *rest) for term, *rest in postings],
+            )
+            self.db.execute(
+                "UPDATE pages SET terms = ? WHERE id = ?",
+                (
+                    json.dumps({term_ids[term]: n for term, n in counts.items()}),
+                    page_id,
+                ),
+            )
+        return len(postings)
+
+    def _term_ids(self, term: str, prefix: bool) -> tuple[list[int], int]:
+        """Ids of the terms a query term stands for, and their postings"""
+        if prefix:
+            rows = self.db.execute(
+                "SELECT id, postings FROM terms"
+                " WHERE term >= ? AND term < ? AND postings > 0"
+                " ORDER BY postings DESC LIMIT ?",
+                (term, term + "\U0010ffff", MAX_PREFIX_TERMS),
+            ).fetchall()
+        else:
+            rows = self.db.execute(
+                "SELECT id, postings FROM terms WHERE term = ? AND postings > 0",
+                (term,),
+            ).fetchall()
+        return [row[0] for row in rows], sum(row[1] for row in rows)
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> list[Hit]:
+        """Words matching the query, on pages that have every one of its
+        terms, in page and reading order.
+
+        Terms are folded like the indexed words; one ending in ``*`` matches
+        any word it starts, e.g. ``kowalsk*`` finds Kowalski and Kowalskiego.
+        """
+        groups = []
+        for term, star in QUERY_RE.findall(fold(query)):
+            ids, postings = self._term_ids(term, bool(star))
+            if not ids:
+                return []
+            groups.append((postings, ids))
+        if not groups:
+            return []
+
+        # Candidate pages come from the rarest term, each checked for the
+        # others by a primary key lookup
+        groups.sort()
+        (_, rarest), *others = groups
+        exists = "".join(
+            " AND EXISTS (SELECT 1 FROM postings AS other"
+            f" WHERE other.term IN ({', '.join('?' * len(ids))})"
+            " AND other.page = candidate.page)"
+            for _, ids in others
+        )
+        other_ids = [term_id for _, ids in others for term_id in ids]
+        pages: list[int] = []
+        for term_id in rarest:
+            # The first pages of the union are among the first of each term,
+            # and once there are enough only those before the last can join
+            bound = pages[-1] if len(pages) >= limit else MAX_PAGE_ID
+            rows = self.db.execute(
+                "SELECT DISTINCT page FROM postings AS candidate"
+                f" WHERE term = ? AND page < ?{exists} ORDER BY page LIMIT ?",
+                (term_id, bound, *other_ids, limit),
+            ).fetchall()
+            if rows:
+                pages = sorted(set(pages).union(row[0] for row in rows))[:limit]
+        if not pages:
+            return []
+
+        term_ids = [term_id for _, ids in groups for term_id in ids]
+        # A lookup per term and page, or when the pages are close together
+        # and that would be more rows, a read of the range they span
+        page_count = self.db.execute("SELECT max(id) FROM pages").fetchone()[0]
+        spread = (pages[-1] - pages[0] + 1) / page_count
+        in_range = sum(postings for postings, _ in groups) * spread
+        span, span_args = "", ()
+        if in_range < len(term_ids) * len(pages):
+            span = " AND postings.page BETWEEN ? AND ?"
+            span_args = pages[0], pages[-1]
+        rows = self.db.execute(
+            "SELECT pages.path, pages.page, block, text, left, top, width, height"
+            " FROM postings JOIN pages ON pages.id = postings.page"
+            f" WHERE term IN ({', '.join('?' * len(term_ids))}){span}"
+            f" AND postings.page IN ({', '.join('?' * len(pages))})"
+            # A word matching several terms is one hit
+            " GROUP BY postings.page, word ORDER BY postings.page, word LIMIT ?",
+            (*term_ids, *span_args, *pages, limit),
+        )
+        return [Hit(Path(path), *rest) for path, *rest in rows]
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
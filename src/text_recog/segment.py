@@ -1,55 +1,312 @@
+import csv
+import json
+import os
+from functools import cached_property
 from pathlib import Path
-from typing import Literal, Sequence
+from typing import TYPE_CHECKING, Literal, Sequence
+
+from text_recog import document, layout, preprocess, search
+from text_recog.cache import OCRCache, file_digest
+from text_recog.corpus import (
+    TRANSCRIPT_FIELDS,
+    excel_row,
+    new_workbook,
+    transcript_records,
+)
+from text_recog.engine import LANG, TESSERACT_CONFIG, OCREngine, get_engine
+from text_recog.metrics import METRICS, Metrics
+
+if TYPE_CHECKING:
+    import cv2
+
+# Re-OCR of a single block: treat the crop as one uniform block of text,
+# enlarged so small print gets more pixels per glyph
+BLOCK_PSM = 6
+BLOCK_UPSCALE = 2.0
+BLOCK_PADDING = 8
+LOW_MEMORY_ENV_VAR = "TEXT_RECOG_LOW_MEMORY"
+# How many times smaller the copy drawn for display is in low-memory mode
+DISPLAY_REDUCTION = 2
+
+
+def default_low_memory() -> bool:
+    """Whether to keep as few pixels in memory as possible, from
+    TEXT_RECOG_LOW_MEMORY"""
+    return os.environ.get(LOW_MEMORY_ENV_VAR, "0") != "0"
 
-import cv2
-from text_recog import layout
-import pandas as pd
-import pytesseract
-import os
-import sys
-import platform
 
+class MagazineLayoutAnalyzer:
+    def __init__(
+        self,
+        image_path: Path,
+        cache: OCRCache | None = None,
+        engine: OCREngine | None = None,
+        preprocessing: Sequence[str] | None = None,
+        metrics: Metrics | None = None,
+        page: int | None = None,
+        low_memory: bool | None = None,
+    ):
+        """Initialize with image path, an optional OCR result cache, the OCR
+        engine to use (the default one if not given), the preprocessing
+        steps applied before OCR ($TEXT_RECOG_PREPROCESS if not given),
+        where to record stage timings (the shared METRICS if not given),
+        for a multi-page document, the 0-based page to analyze and whether
+        to run in low-memory mode ($TEXT_RECOG_LOW_MEMORY if not given).
+
+        In low-memory mode the page is only decoded once its pixels are
+        needed, which a cached OCR result avoids altogether, and overlays
+        are drawn on the decoded page itself instead of a copy.
+        """
+        self.image_path = image_path
+        self.page = page
+        self.page_id = document.page_id(image_path, page)
+        # Base name of the outputs of this page
+        self.stem = image_path.stem
+        if page is not None:
+            self.stem += f"_p{page + 1:03d}"
+        self.cache = cache
+        self.metrics = METRICS if metrics is None else metrics
+        self.engine = engine or get_engine()
+        self.preprocessing = (
+            preprocess.default_pipeline()
+            if preprocessing is None
+            else preprocess.parse_pipeline(preprocessing)
+        )
+        self.low_memory = default_low_memory() if low_memory is None else low_memory
+        if not self.low_memory:
+            # Decode up front, so that unreadable files fail right here
+            self.load()
+
+    def stage(self, name: str):
+        """Time a stage of the work on this page"""
+        return self.metrics.stage(name, self.page_id)
+
+    @cached_property
+    def image(self) -> "cv2.typing.MatLike":
+        """The page at full resolution, decoded on first use"""
+        with self.stage("imread"):
+            if self.page is None:
+                image = document.read_image(self.image_path)
+            else:
+                image = document.read_page(self.image_path, self.page)
+        if image is None:
+            raise ValueError(f"Cannot read {self.image_path}")
+        return image
+
+    def load(self) -> "cv2.typing.MatLike":
+        """Decode the page now rather than on first use"""
+        return self.image
+
+    @property
+    def width(self) -> int:
+        return self.image.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.image.shape[0]
+
+    @cached_property
+    def gray(self) -> "cv2.typing.MatLike":
+        import cv2
+
+        return cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by decoded pixel data"""
+        return sum(
+            self.__dict__[name].nbytes
+            for name in ("image", "gray")
+            if name in self.__dict__
+        )
 
-LANG = "pol+eng+deu"
+    def release(self):
+        """Drop decoded pixel data, once OCR and drawing are done with it.
 
-def get_tesseract_path():
-    if getattr(sys, "frozen", False):
-        # Running as PyInstaller bundle
-        base_path = sys._MEIPASS
-        return os.path.join(base_path, "tesseract", "tesseract")
-    elif platform.system() == "Windows":
-        # Running as normal script on Windows
-        return "C:\\Program Files\\Tesseract-OCR\\tesseract.exe"
-    else:
-        # Running as normal script on other OS
-        return "tesseract"  # Assumes tesseract is in the PATH
+        Anything that needs the pixels again, such as re-OCR of a block,
+        decodes the page anew.
+        """
+        for name in ("image", "gray"):
+            self.__dict__.pop(name, None)
+
+    def display_image(
+        self, reduction: int = DISPLAY_REDUCTION
+    ) -> "cv2.typing.MatLike":
+        """The page downscaled ``reduction`` times (2, 4 or 8), to draw on
+        for display.
+
+        Scaled down from the decoded page if there is one; otherwise decoded
+        straight at the smaller size, never making a full resolution copy
+        of a JPEG.
+        """
+        import cv2
+
+        with self.stage("imread"):
+            if "image" in self.__dict__:
+                return cv2.resize(
+                    self.image,
+                    None,
+                    fx=1 / reduction,
+                    fy=1 / reduction,
+                    interpolation=cv2.INTER_AREA,
+                )
+            if self.page is not None:
+                return document.read_page(self.image_path, self.page, reduction)
+            image = document.read_image(self.image_path, reduction)
+        if image is None:
+            raise ValueError(f"Cannot read {self.image_path}")
+        return image
+
+    @cached_property
+    def image_digest(self) -> str:
+        return file_digest(self.image_path)
+
+    def ocr_cache_key(
+        self,
+        config: str = TESSERACT_CONFIG,
+        extra: str = "",
+        steps: Sequence[str] | None = None,
+    ) -> str:
+        """Key of the OCR result of the page, or of the region of it ``extra``
+        describes, in the cache, after the preprocessing ``steps`` (those of
+        the analyzer if not given)"""
+        page = None
+        if self.page is not None:
+            page = document.page_cache_key(self.image_path, self.page)
+        return OCRCache.page_key(
+            self.image_digest,
+            LANG,
+            self.engine.version(),
+            config + extra,
+            page,
+            self.preprocessing if steps is None else steps,
+        )
 
+    def has_cached_ocr(self) -> bool:
+        """Whether the page would open without running Tesseract"""
+        return self.cache is not None and self.ocr_cache_key() in self.cache
 
-# Set the tesseract command path
-pytesseract.pytesseract.tesseract_cmd = get_tesseract_path()
+    def _cached_ocr(
+        self,
+        image: "cv2.typing.MatLike | None",
+        config: str,
+        extra: str = "",
+        steps: Sequence[str] | None = None,
+    ):
+        """OCR ``image`` after preprocessing, through the cache.
 
+        Boxes in the returned TSV are in the coordinates of ``image``, whatever
+        the preprocessing did. ``extra`` identifies what ``image`` is when it is
+        not the whole decoded file. None stands for the whole page, which is
+        then only decoded if the cache misses. ``steps`` replaces the
+        analyzer's preprocessing steps.
+        """
+        if steps is None:
+            steps = self.preprocessing
+        key = None
+        if self.cache is not None:
+            key = self.ocr_cache_key(config, extra, steps)
+            with self.stage("cache"):
+                tsv = self.cache.get(key)
+            if tsv is not None:
+                return tsv
+
+        if image is None:
+            image = self.image
+        with self.stage("preprocess"):
+            processed, to_image = preprocess.run_pipeline(image, steps)
+        with self.stage("ocr"):
+            tsv = self.engine.image_to_tsv(processed, LANG, config)
+        with self.stage("preprocess"):
+            tsv = preprocess.remap_tsv(tsv, to_image)
+
+        if self.cache is not None and key is not None:
+            self.cache.put(key, tsv)
+        return tsv
+
+    def run_tesseract(self) -> bytes:
+        """Get the raw image_to_data TSV, from the cache when possible"""
+        return self._cached_ocr(None, TESSERACT_CONFIG)
+
+    def ocr_block(
+        self,
+        block: layout.Block,
+        upscale: float = BLOCK_UPSCALE,
+        psm: int = BLOCK_PSM,
+        padding: int = BLOCK_PADDING,
+    ) -> dict[int, layout.Paragraph]:
+        """OCR the region of one block again, on its own.
+
+        The region is cropped with some padding and upscaled, and Tesseract
+        is told what to expect with ``psm``. The preprocessing steps run on
+        the upscaled crop, except autoscale, which would undo the upscale.
+        Results are cached per region and parameters. Nothing is modified,
+        so this is safe off the Tk thread. In low-memory mode a page decoded
+        for this is let go of again, keeping only the region.
+
+        :return: the paragraphs found, numbered from 1, in page coordinates
+        """
+        import cv2
+
+        decoded = "image" in self.__dict__
+        left = max(0, block.left - padding)
+        top = max(0, block.top - padding)
+        right = min(self.width, block.left + block.width + padding)
+        bottom = min(self.height, block.top + block.height + padding)
+
+        crop = self.image[top:bottom, left:right]
+        if self.low_memory and not decoded:
+            # Decoded for this block alone: keep just its region
+            crop = crop.copy()
+            self.release()
+        if upscale != 1:
+            with self.stage("resize"):
+                crop = cv2.resize(
+                    crop, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_CUBIC
+                )
+        config = f"{TESSERACT_CONFIG} --psm {psm}".strip()
+        steps = [step for step in self.preprocessing if step != "autoscale"]
+        tsv = self._cached_ocr(
+            crop,
+            config,
+            f" region={left},{top},{right},{bottom} upscale={upscale}",
+            steps,
+        )
 
-class MagazineLayoutAnalyzer:
-    def __init__(self, image_path: Path):
-        """Initialize with image path"""
-        self.image_path = image_path
-        self.image = cv2.imread(image_path.as_posix())
-        assert self.image is not None
-        self.gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
-        # self.binary = self.preprocess_image()
-        self.height, self.width = self.gray.shape
+        with self.stage("layout"):
+            pages = layout.tsv_to_layout(tsv)
+        to_page = ((1 / upscale, 0, left), (0, 1 / upscale, top))
+        paragraphs = {}
+        for page in pages.values():
+            for region_block in page.blocks.values():
+                for para in region_block.paragraphs.ordered_values():
+                    layout.transform_boxes(para, to_page)
+                    paragraphs[len(paragraphs) + 1] = para
+        return paragraphs
+
+    def reocr_block(self, block: layout.Block, **kwargs) -> layout.Block:
+        """Replace the content of a block with a fresh OCR of its region,
+        taking the same options as ``ocr_block``"""
+        block.replace_children(self.ocr_block(block, **kwargs))
+        return block
 
     def analyze_with_tesseract(self) -> dict[int, layout.Page]:
         """Use Tesseract for layout analysis"""
 
         # Get detailed data from Tesseract
-        data: pd.DataFrame = pytesseract.image_to_data(
-            self.image, lang=LANG, output_type=pytesseract.Output.DATAFRAME
-        )
-        pages = layout.df_to_layout(data)
+        tsv = self.run_tesseract()
+        with self.stage("layout"):
+            pages = layout.tsv_to_layout(tsv)
 
         return pages
 
+    def analyze_page(self) -> layout.Page:
+        """Layout of the one page decoded by this analyzer"""
+        pages = self.analyze_with_tesseract()
+        if len(pages) != 1:
+            raise ValueError(f"Expected one page from Tesseract, got {len(pages)}")
+        return next(iter(pages.values()))
+
     def visualize_analysis(
         self, blocks: dict[int, layout.Block], analysis_save_path=None
     ):
@@ -57,6 +314,7 @@ class MagazineLayoutAnalyzer:
         :param blocks:
         :param analysis_save_path:
         """
+        import cv2
         import matplotlib.pyplot as plt
 
         fig, axes = plt.subplots(1, 2, figsize=(18, 12))
@@ -83,8 +341,20 @@ class MagazineLayoutAnalyzer:
         print(f"Image dimensions: {self.width}x{self.height}")
         print(f"Tesseract blocks: {len(blocks)}")
 
-    def add_block_overlay(self, blocks):
-        img_overlay = self.image.copy()
+    def add_block_overlay(
+        self,
+        blocks,
+        image: "cv2.typing.MatLike | None" = None,
+        scale: float = 1.0,
+    ):
+        """Draw the outline and id of every block with text.
+
+        Drawn on a copy of the page or, in low-memory mode, on the decoded
+        page itself, which the analyzer then lets go of. A given ``image``
+        is drawn on in place instead, with boxes scaled by ``scale``, e.g.
+        one from ``display_image``.
+        """
+        import cv2
 
         colours = [
             (255, 179, 186),  # Pastel Red
@@ -108,28 +378,44 @@ class MagazineLayoutAnalyzer:
             (255, 204, 229),  # Pastel Rose
             (255, 197, 208),  # Pastel Blush
         ]
-        for block_id, block in blocks.items():
-            if not block.get_text():
-                continue
-            colour = colours[block_id % len(colours)]
-            cv2.rectangle(
-                img_overlay,
-                (block.left, block.top),
-                (block.left + block.width, block.top + block.height),
-                colour,
-                2,
-            )
-
-            # Add block ID label
-            cv2.putText(
-                img_overlay,
-                f"B{block_id}",
-                (int(block.left), int(block.top) - 5),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.75,
-                colour,
-                2,
-            )
+        if image is None:
+            # Decoding is timed as a stage of its own
+            self.load()
+        with self.stage("overlay"):
+            if image is not None:
+                img_overlay = image
+            elif self.low_memory:
+                img_overlay = self.image
+                self.release()
+            else:
+                img_overlay = self.image.copy()
+            thickness = max(1, round(2 * scale))
+            for block_id, block in blocks.items():
+                if not block.get_text():
+                    continue
+                colour = colours[block_id % len(colours)]
+                left, top = round(block.left * scale), round(block.top * scale)
+                cv2.rectangle(
+                    img_overlay,
+                    (left, top),
+                    (
+                        round((block.left + block.width) * scale),
+                        round((block.top + block.height) * scale),
+                    ),
+                    colour,
+                    thickness,
+                )
+
+                # Add block ID label
+                cv2.putText(
+                    img_overlay,
+                    f"B{block_id}",
+                    (left, top - round(5 * scale)),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.75 * scale,
+                    colour,
+                    thickness,
+                )
 
         return img_overlay
 
@@ -138,75 +424,90 @@ class MagazineLayoutAnalyzer:
         transcripts_dir: Path,
         blocks: dict[int, layout.Block],
         ignore_blank_blocks: bool = False,
-        formats: Sequence[Literal["json", "csv", "excel", "text"]] = (
+        formats: Sequence[Literal["json", "csv", "excel", "text", "search"]] = (
             "json",
             "csv",
             "excel",
             "text",
         ),
-    ) -> dict[Literal["json", "csv", "excel", "text"], Path]:
-        """
-
-        :param formats:
-        :param ignore_blank_blocks:
-        :param transcripts_dir:
-        :param blocks:
+    ) -> dict[Literal["json", "csv", "excel", "text", "search"], Path]:
+        """Write the text and bounding box of every block, one record per block
+        in the order of ``blocks``, in each of ``formats``:
+
+        - json: a list of records in ``json/<stem>_transcript.json``
+        - csv: a header and a row per record in ``csv/<stem>_transcript.csv``
+        - excel: the same table in ``excel/<stem>_transcript.xlsx``
+        - text: the text of the blocks, separated by blank lines, in
+          ``text/<stem>_transcript.txt``
+        - search: the words and their boxes, added to the search index in
+          ``transcripts_dir``; not written unless asked for
+
+        The fields of a record are TRANSCRIPT_FIELDS. ``stem`` is that of the
+        file, with e.g. ``_p003`` added for a page of a document.
+
+        :param transcripts_dir: where the format subdirectories go, created
+            as needed
+        :param blocks: the blocks of the page, by number
+        :param ignore_blank_blocks: leave out blocks without text
+        :param formats: which of the outputs above to write
+        :return: the path written for each format, the index's for search
         """
         transcripts_dir.mkdir(parents=True, exist_ok=True)
 
         # Collect text from selected blocks
-        transcript_data = []
-        full_text = []
-
-        for block_id, block in blocks.items():
-            block_content = block.get_text()
-            if ignore_blank_blocks and not block_content:
-                continue
-
-            block_info = {
-                "block_id": block_id,
-                "full_text": block_content,
-                "left": block.left,
-                "top": block.top,
-                "width": block.width,
-                "height": block.height,
-            }
-
-            transcript_data.append(block_info)
-            full_text.append(block_content)
-
-        data_df = pd.DataFrame(transcript_data)
-        # Save transcript
-        output_filename = f"{self.image_path.stem}_transcript"
+        records = transcript_records(blocks, ignore_blank_blocks)
+        output_filename = f"{self.stem}_transcript"
 
         paths = {}
         if "json" in formats:
-            json_output_dir = transcripts_dir / "json"
-            json_output_dir.mkdir(exist_ok=True, parents=True)
-            json_output_path = json_output_dir / f"{output_filename}.json"
-            data_df.to_json(json_output_path, orient="records", indent=2)
-            paths["json"] = json_output_path
+            with self.stage("transcript_json"):
+                json_output_dir = transcripts_dir / "json"
+                json_output_dir.mkdir(exist_ok=True, parents=True)
+                json_output_path = json_output_dir / f"{output_filename}.json"
+                with json_output_path.open("w", encoding="utf-8") as f:
+                    json.dump(records, f, ensure_ascii=False, indent=2)
+                paths["json"] = json_output_path
 
         if "csv" in formats:
-            csv_output_dir = transcripts_dir / "csv"
-            csv_output_dir.mkdir(exist_ok=True, parents=True)
-            csv_output_path = csv_output_dir / f"{output_filename}.csv"
-            data_df.to_csv(csv_output_path, index=False)
-            paths["csv"] = csv_output_path
+            with self.stage("transcript_csv"):
+                csv_output_dir = transcripts_dir / "csv"
+                csv_output_dir.mkdir(exist_ok=True, parents=True)
+                csv_output_path = csv_output_dir / f"{output_filename}.csv"
+                with csv_output_path.open("w", encoding="utf-8", newline="") as f:
+                    # Line endings as pandas wrote them
+                    writer = csv.DictWriter(
+                        f, fieldnames=TRANSCRIPT_FIELDS, lineterminator=os.linesep
+                    )
+                    writer.writeheader()
+                    writer.writerows(records)
+                paths["csv"] = csv_output_path
 
         if "excel" in formats:
-            excel_output_dir = transcripts_dir / "excel"
-            excel_output_dir.mkdir(exist_ok=True, parents=True)
-            excel_output_path = excel_output_dir / f"{output_filename}.xlsx"
-            data_df.to_excel(excel_output_path, index=False)
-            paths["excel"] = excel_output_path
+            with self.stage("transcript_excel"):
+                excel_output_dir = transcripts_dir / "excel"
+                excel_output_dir.mkdir(exist_ok=True, parents=True)
+                excel_output_path = excel_output_dir / f"{output_filename}.xlsx"
+                workbook, sheet = new_workbook(TRANSCRIPT_FIELDS, "Sheet1")
+                for record in records:
+                    sheet.append(excel_row(record, TRANSCRIPT_FIELDS))
+                workbook.save(excel_output_path)
+                paths["excel"] = excel_output_path
 
         if "text" in formats:
-            text_output_dir = transcripts_dir / "text"
-            text_output_dir.mkdir(exist_ok=True, parents=True)
-            text_output_path = text_output_dir / f"{output_filename}.txt"
-            text_output_path.open("w", encoding="utf-8").write("\n\n".join(full_text))
-            paths["text"] = text_output_path
+            with self.stage("transcript_text"):
+                text_output_dir = transcripts_dir / "text"
+                text_output_dir.mkdir(exist_ok=True, parents=True)
+                text_output_path = text_output_dir / f"{output_filename}.txt"
+                full_text = "\n\n".join(record["full_text"] for record in records)
+                text_output_path.write_text(full_text, encoding="utf-8")
+                paths["text"] = text_output_path
+
+        if "search" in formats:
+            with self.stage("transcript_search"):
+                index_path = transcripts_dir / search.INDEX_NAME
+                with search.SearchIndex(index_path) as index:
+                    index.add_page(self.image_path, self.page, blocks)
+                paths["search"] = index_path
 
         return paths
 
@@ -217,18 +518,21 @@ if __name__ == "__main__":
     output_analysis_dir = Path("outputs/analysis")
     output_transcripts_dir = Path("outputs/transcripts")
     output_analysis_dir.mkdir(parents=True, exist_ok=True)
-    for file in samples_dir.glob("*.jpg"):
-        cwd = Path(".")
-        analyzer = MagazineLayoutAnalyzer(file.relative_to("."))
-
-        # Tesseract analysis
-        tesseract_blocks = analyzer.analyze_with_tesseract()[1].blocks
-
-        # Run complete analysis with visualization
-        analyzer.visualize_analysis(
-            tesseract_blocks, output_analysis_dir / f"{file.stem}.png"
-        )
+    ocr_cache = OCRCache()
+    for file in sorted(samples_dir.glob("*.*")):
+        if file.suffix.lower() not in document.INPUT_SUFFIXES:
+            continue
+        for ref in document.expand_pages(file.relative_to(".")):
+            analyzer = MagazineLayoutAnalyzer(ref.path, cache=ocr_cache, page=ref.page)
+
+            # Tesseract analysis
+            tesseract_blocks = analyzer.analyze_page().blocks
+
+            # Run complete analysis with visualization
+            analyzer.visualize_analysis(
+                tesseract_blocks, output_analysis_dir / f"{analyzer.stem}.png"
+            )
 
-        analyzer.generate_transcript(
-            output_transcripts_dir, tesseract_blocks, ignore_blank_blocks=True
-        )
+            analyzer.generate_transcript(
+                output_transcripts_dir, tesseract_blocks, ignore_blank_blocks=True
+            )
@@ -0,0 +1,200 @@
+import math
+from collections import defaultdict
+from typing import TYPE_CHECKING, Hashable, Sequence
+
+import numpy as np
+
+from text_recog import layout
+from text_recog.layout import TessLayout
+
+if TYPE_CHECKING:
+    from text_recog.compact import CompactPage
+
+# Grid cells are this many times the median element size, so a typical
+# element overlaps at most four cells
+CELL_SIZE_FACTOR = 2
+
+
+class GridIndex:
+    """Uniform grid over axis-aligned boxes, for point and rectangle queries.
+
+    Each box is registered in every cell it overlaps; a query only tests the
+    boxes of the cells it touches, with a vectorised exact check on the
+    candidates. Layout elements are of similar size within a level, which is
+    what makes a uniform grid work as well as a tree here.
+    """
+
+    def __init__(
+        self,
+        boxes: Sequence[tuple[int, int, int, int]],
+        keys: Sequence[Hashable],
+        cell_size: int | None = None,
+    ):
+        """
+        :param boxes: (left, top, width, height) of every element
+        :param keys: what queries return for the element with the same index
+        :param cell_size: side of a grid cell, derived from the boxes if None
+        """
+        self.keys = list(keys)
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        self.left = boxes[:, 0]
+        self.top = boxes[:, 1]
+        self.right = boxes[:, 0] + boxes[:, 2]
+        self.bottom = boxes[:, 1] + boxes[:, 3]
+        self.area = boxes[:, 2] * boxes[:, 3]
+
+        if cell_size is None:
+            sizes = np.maximum(boxes[:, 2], boxes[:, 3])
+            cell_size = int(np.median(sizes)) * CELL_SIZE_FACTOR if len(sizes) else 1
+        self.cell_size = max(1, cell_size)
+
+        cells = defaultdict(list)
+        for i, (x0, y0, x1, y1) in enumerate(
+            zip(
+                (self.left // self.cell_size).tolist(),
+                (self.top // self.cell_size).tolist(),
+                (self.right // self.cell_size).tolist(),
+                (self.bottom // self.cell_size).tolist(),
+            )
+        ):
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    cells[cx, cy].append(i)
+        self._cells = {
+            cell: np.array(members, dtype=np.int64) for cell, members in cells.items()
+        }
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _candidates(self, left: int, top: int, right: int, bottom: int) -> np.ndarray:
+        x0, y0 = left // self.cell_size, top // self.cell_size
+        x1, y1 = right // self.cell_size, bottom // self.cell_size
+        if (x1 - x0 + 1) * (y1 - y0 + 1) >= len(self._cells):
+            # Covers most of the grid, testing everything is cheaper
+            return np.arange(len(self.keys))
+        found = [
+            self._cells[cell]
+            for cell in (
+                (cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)
+            )
+            if cell in self._cells
+        ]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def at(self, x: float, y: float) -> list:
+        """Keys of the boxes containing the point, smallest first"""
+        cell = (math.floor(x) // self.cell_size, math.floor(y) // self.cell_size)
+        candidates = self._cells.get(cell)
+        if candidates is None:
+            return []
+        hits = candidates[
+            (self.left[candidates] <= x)
+            & (x < self.right[candidates])
+            & (self.top[candidates] <= y)
+            & (y < self.bottom[candidates])
+        ]
+        # Smallest first, so the innermost of nested elements comes first
+        hits = hits[np.argsort(self.area[hits], kind="stable")]
+        return [self.keys[i] for i in hits.tolist()]
+
+    def within(
+        self,
+        left: float,
+        top: float,
+        right: float,
+        bottom: float,
+        contained: bool = False,
+    ) -> list:
+        """Keys of the boxes overlapping a rectangle, in insertion order.
+
+        :param contained: only return boxes lying entirely inside it
+        """
+        if right < left:
+            left, right = right, left
+        if bottom < top:
+            top, bottom = bottom, top
+        candidates = self._candidates(
+            math.floor(left), math.floor(top), math.floor(right), math.floor(bottom)
+        )
+        box_left, box_top = self.left[candidates], self.top[candidates]
+        box_right, box_bottom = self.right[candidates], self.bottom[candidates]
+        if contained:
+            mask = (
+                (left <= box_left)
+                & (box_right <= right)
+                & (top <= box_top)
+                & (box_bottom <= bottom)
+            )
+        else:
+            mask = (
+                (box_left < right)
+                & (left < box_right)
+                & (box_top < bottom)
+                & (top < box_bottom)
+            )
+        return [self.keys[i] for i in candidates[mask].tolist()]
+
+
+class PageIndex:
+    """Spatial indexes over the blocks, lines and words of a page.
+
+    Queries return the Tesseract numbers of the elements found: a block
+    number for blocks, and (block, paragraph, line[, word]) tuples below.
+    """
+
+    def __init__(self, page: "layout.Page | CompactPage"):
+        levels = (TessLayout.BLOCK, TessLayout.LINE, TessLayout.WORD)
+        boxes = {level: [] for level in levels}
+        keys = {level: [] for level in levels}
+
+        def add(level: TessLayout, key, element: layout.Element):
+            boxes[level].append(
+                (element.left, element.top, element.width, element.height)
+            )
+            keys[level].append(key)
+
+        for block_num, block in page.blocks.items():
+            add(TessLayout.BLOCK, block_num, block)
+            for par_num, para in block.paragraphs.items():
+                for line_num, line in para.lines.items():
+                    add(TessLayout.LINE, (block_num, par_num, line_num), line)
+                    for word_num, word in line.words.items():
+                        # Tesseract reports blank words over images and rules
+                        if word.get_text():
+                            add(
+                                TessLayout.WORD,
+                                (block_num, par_num, line_num, word_num),
+                                word,
+                            )
+
+        self.grids = {level: GridIndex(boxes[level], keys[level]) for level in boxes}
+
+    def at(self, level: TessLayout, x: float, y: float) -> list:
+        """Elements of a level under a point, innermost first"""
+        return self.grids[level].at(x, y)
+
+    def within(
+        self,
+        level: TessLayout,
+        left: float,
+        top: float,
+        right: float,
+        bottom: float,
+        contained: bool = False,
+    ) -> list:
+        """Elements of a level overlapping, or inside, a rectangle, in page order"""
+        return self.grids[level].within(left, top, right, bottom, contained)
+
+    def block_at(self, x: float, y: float) -> int | None:
+        """Number of the innermost block under a point, if any"""
+        blocks = self.at(TessLayout.BLOCK, x, y)
+        return blocks[0] if blocks else None
+
+    def blocks_within(
+        self, left: float, top: float, right: float, bottom: float
+    ) -> list[int]:
+        """Numbers of the blocks overlapping a rectangle"""
+        return self.within(TessLayout.BLOCK, left, top, right, bottom)
@@ -0,0 +1,356 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+from text_recog import document, preprocess
+from text_recog.cache import OCRCache, default_cache_dir, file_digest
+from text_recog.document import PageRef
+from text_recog.engine import LANG, TESSERACT_CONFIG, get_engine
+
+# Sidecar kept in the folder it indexes
+INDEX_NAME = ".text_recog_index.sqlite"
+SCHEMA_VERSION = 1
+# Bounding box of a thumbnail, in pixels
+THUMBNAIL_SIZE = (96, 128)
+THUMBNAIL_QUALITY = 80
+# Pages are decoded this many times smaller to make their thumbnail
+THUMBNAIL_REDUCTION = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    -- Pages of a document, NULL for a single image
+    pages INTEGER
+);
+CREATE TABLE IF NOT EXISTS pages (
+    name TEXT NOT NULL REFERENCES files (name) ON DELETE CASCADE,
+    -- 0-based page within the file, 0 for a single image
+    page INTEGER NOT NULL,
+    thumbnail BLOB,
+    ocr_cached INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, page)
+);
+"""
+
+
+def default_index_path(folder: Path) -> Path:
+    """The sidecar in ``folder``, or in the user cache for folders that
+    cannot be written to"""
+    if os.access(folder, os.W_OK):
+        return folder / INDEX_NAME
+    key = hashlib.blake2b(
+        folder.resolve().as_posix().encode("utf-8"), digest_size=10
+    ).hexdigest()
+    return default_cache_dir() / "thumbnails" / f"{key}.sqlite"
+
+
+def make_thumbnail(ref: PageRef, size: tuple[int, int] = THUMBNAIL_SIZE) -> bytes:
+    """JPEG thumbnail of a page, fitting in ``size``"""
+    import cv2
+
+    if ref.page is None:
+        image = document.read_image(ref.path, THUMBNAIL_REDUCTION)
+    else:
+        image = document.read_page(ref.path, ref.page, THUMBNAIL_REDUCTION)
+    if image is None:
+        raise ValueError(f"Cannot read {ref.path}")
+    height, width = image.shape[:2]
+    scale = min(size[0] / width, size[1] / height, 1)
+    thumbnail = cv2.resize(
+        image,
+        (max(1, round(width * scale)), max(1, round(height * scale))),
+        interpolation=cv2.INTER_AREA,
+    )
+    _, data = cv2.imencode(
+        ".jpg", thumbnail, [cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_QUALITY]
+    )
+    return data.tobytes()
+
+
+def stored_pages(path: Path, pages: int | None) -> list[PageRef]:
+    """What ``document.expand_pages`` returns for a file, from its page count"""
+    if pages is None:
+        return [PageRef(path)]
+    return [PageRef(path, page, pages) for page in range(pages)]
+
+
+@dataclass(frozen=True)
+class PageEntry:
+    thumbnail: bytes | None
+    # Whether the page opens without running Tesseract
+    ocr_cached: bool
+
+
+class ThumbnailIndex:
+    """Persistent thumbnails and metadata of the scans in one folder.
+
+    A SQLite sidecar holds a row per file, with its size, mtime, content hash
+    and page count, and a row per page, with its thumbnail and whether its
+    OCR result is cached. ``pages`` lists the folder from the stored page
+    counts, only opening documents that changed, and ``update`` brings
+    stale rows up to date; it is slow and meant for a background thread,
+    using a connection of its own. The database is in WAL mode, so the
+    entries written so far can be read meanwhile.
+
+    The connection of the thread that created the index, e.g. Tk's, never
+    waits for the write lock: pages marked OCR cached are kept in memory
+    until it is free, written by whichever connection gets to them first.
+    """
+
+    def __init__(self, folder: Path, path: Path | None = None):
+        self.folder = folder
+        self.path = path or default_index_path(folder)
+        self._db: sqlite3.Connection | None = None
+        # (name, page) of the pages marked OCR cached but not yet written
+        self._marks: set[tuple[str, int]] = set()
+        self._marks_lock = threading.Lock()
+
+    def _connect(self, timeout: float = 10) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=timeout)
+        db.execute("PRAGMA journal_mode=WAL")
+        # The index can always be rebuilt, losing the last commits is fine
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("PRAGMA foreign_keys=ON")
+        if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            db.executescript(
+                "DROP TABLE IF EXISTS pages; DROP TABLE IF EXISTS files;"
+                + SCHEMA
+                + f"PRAGMA user_version={SCHEMA_VERSION};"
+            )
+        return db
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """Connection of the thread that created the index, e.g. Tk's"""
+        if self._db is None:
+            self._db = self._connect(timeout=0)
+        return self._db
+
+    def pages(self, paths: Iterable[Path]) -> tuple[list[PageRef], list[str]]:
+        """Every page of the given files, in order.
+
+        :return: the pages, and an error message for each file that could
+            not be opened
+        """
+        known = {
+            name: (size, mtime_ns, pages)
+            for name, size, mtime_ns, pages in self.db.execute(
+                "SELECT name, size, mtime_ns, pages FROM files"
+            )
+        }
+        refs, unreadable = [], []
+        for path in paths:
+            try:
+                stat = path.stat()
+                row = known.get(path.name)
+                if row is not None and row[:2] == (stat.st_size, stat.st_mtime_ns):
+                    refs.extend(stored_pages(path, row[2]))
+                else:
+                    refs.extend(document.expand_pages(path))
+            except (OSError, ValueError, ImportError) as e:
+                unreadable.append(f"{path.name}: {e}")
+        return refs, unreadable
+
+    def entry(self, ref: PageRef) -> PageEntry | None:
+        row = self.db.execute(
+            "SELECT thumbnail, ocr_cached FROM pages WHERE name = ? AND page = ?",
+            (ref.path.name, ref.page or 0),
+        ).fetchone()
+        if row is None:
+            return None
+        with self._marks_lock:
+            marked = (ref.path.name, ref.page or 0) in self._marks
+        return PageEntry(row[0], bool(row[1]) or marked)
+
+    def mark_ocr_cached(self, ref: PageRef):
+        """Record that a page opens without OCR, written straight away unless
+        another connection is writing"""
+        with self._marks_lock:
+            self._marks.add((ref.path.name, ref.page or 0))
+        try:
+            self._write_marks(self.db)
+        except sqlite3.OperationalError:
+            # Locked; written with the next mark or by ``update``
+            pass
+
+    def _write_marks(self, db: sqlite3.Connection):
+        with self._marks_lock:
+            marks = list(self._marks)
+        if not marks:
+            return
+        written = []
+        with db:
+            for mark in marks:
+                cursor = db.execute(
+                    "UPDATE pages SET ocr_cached = 1 WHERE name = ? AND page = ?", mark
+                )
+                # Pages without a row yet keep their mark until they get one
+                if cursor.rowcount:
+                    written.append(mark)
+        with self._marks_lock:
+            self._marks.difference_update(written)
+
+    def update(
+        self,
+        refs: Sequence[PageRef],
+        cache: OCRCache | None = None,
+        stop: threading.Event | None = None,
+    ) -> Iterator[list[PageRef]]:
+        """Bring the index up to date with the pages of the folder.
+
+        Files are hashed and given thumbnails if they are new or changed, and
+        every page is checked against the OCR cache. Each file is committed
+        once done, along with any pending OCR cached marks, and the pages
+        whose entry changed yielded.
+
+        :param stop: set to stop after the current file
+        """
+        by_file: dict[Path, list[PageRef]] = {}
+        for ref in refs:
+            by_file.setdefault(ref.path, []).append(ref)
+
+        ocr_settings = self._ocr_settings(cache)
+        db = self._connect()
+        try:
+            stored = {
+                name: (size, mtime_ns, digest)
+                for name, size, mtime_ns, digest in db.execute(
+                    "SELECT name, size, mtime_ns, digest FROM files"
+                )
+            }
+            with db:
+                # Files no longer in the folder
+                db.executemany(
+                    "DELETE FROM files WHERE name = ?",
+                    [(name,) for name in stored.keys() - {p.name for p in by_file}],
+                )
+            for path, pages in by_file.items():
+                if stop is not None and stop.is_set():
+                    break
+                try:
+                    changed = self._update_file(
+                        db, path, pages, stored.get(path.name), cache, ocr_settings
+                    )
+                except (OSError, ValueError, ImportError):
+                    # Unreadable for now, tried again next time
+                    continue
+                self._write_marks(db)
+                yield changed
+            self._write_marks(db)
+        finally:
+            db.close()
+
+    def _update_file(
+        self,
+        db: sqlite3.Connection,
+        path: Path,
+        pages: list[PageRef],
+        stored: tuple[int, int, str] | None,
+        cache: OCRCache | None,
+        ocr_settings: tuple[str, tuple[str, ...]] | None,
+    ) -> list[PageRef]:
+        """Bring the rows of one file up to date. Hashing and decoding pages
+        is done before the write transaction, which only stores the rows, so
+        the lock is never held for long"""
+        stat = path.stat()
+        if stored is not None and stored[:2] == (stat.st_size, stat.st_mtime_ns):
+            digest = stored[2]
+        else:
+            digest = file_digest(path)
+        # Only touched files keep their pages
+        same = stored is not None and stored[2] == digest
+        document_pages = None if pages[0].page is None else pages[0].count
+        existing = {}
+        if same:
+            existing = {
+                page: (has_thumbnail, bool(ocr_cached))
+                for page, has_thumbnail, ocr_cached in db.execute(
+                    "SELECT page, thumbnail IS NOT NULL, ocr_cached FROM pages"
+                    " WHERE name = ?",
+                    (path.name,),
+                )
+            }
+
+        changed, flags, rows = [], [], []
+        for ref in pages:
+            page = ref.page or 0
+            ocr_cached = self._ocr_cached(ref, digest, cache, ocr_settings)
+            if page in existing and existing[page][0]:
+                if existing[page][1] != ocr_cached:
+                    flags.append((ocr_cached, path.name, page))
+                    changed.append(ref)
+                continue
+            rows.append((path.name, page, make_thumbnail(ref), ocr_cached))
+            changed.append(ref)
+
+        with db:
+            if not same:
+                db.execute("DELETE FROM files WHERE name = ?", (path.name,))
+            # An upsert, replacing the row would cascade to its pages
+            db.execute(
+                "INSERT INTO files (name, size, mtime_ns, digest, pages)"
+                " VALUES (?, ?, ?, ?, ?) ON CONFLICT (name) DO UPDATE"
+                " SET size = excluded.size, mtime_ns = excluded.mtime_ns",
+                (path.name, stat.st_size, stat.st_mtime_ns, digest, document_pages),
+            )
+            db.executemany(
+                "UPDATE pages SET ocr_cached = ? WHERE name = ? AND page = ?", flags
+            )
+            db.executemany(
+                "INSERT OR REPLACE INTO pages (name, page, thumbnail, ocr_cached)"
+                " VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        return changed
+
+    @staticmethod
+    def _ocr_settings(
+        cache: OCRCache | None,
+    ) -> tuple[str, tuple[str, ...]] | None:
+        """Tesseract version and preprocessing steps the GUI's OCR results are
+        cached under, None if none can be"""
+        if cache is None:
+            return None
+        try:
+            return get_engine().version(), preprocess.default_pipeline()
+        except (OSError, ValueError):
+            # No Tesseract, or steps the GUI would refuse too
+            return None
+
+    @staticmethod
+    def _ocr_cached(
+        ref: PageRef,
+        digest: str,
+        cache: OCRCache | None,
+        ocr_settings: tuple[str, tuple[str, ...]] | None,
+    ) -> bool:
+        """Whether the page would open in the GUI without running Tesseract,
+        checked by key alone"""
+        if cache is None or ocr_settings is None:
+            return False
+        version, preprocessing = ocr_settings
+        page = None
+        if ref.page is not None:
+            page = document.page_cache_key(ref.path, ref.page)
+        key = OCRCache.page_key(
+            digest, LANG, version, TESSERACT_CONFIG, page, preprocessing
+        )
+        return key in cache
+
+    def close(self):
+        if self._db is not None:
+            try:
+                self._write_marks(self._db)
+            except sqlite3.OperationalError:
+                # Still locked; the marks are recomputed by the next update
+                pass
+            self._db.close()
+            self._db = None
@@ -0,0 +1,272 @@
+import fnmatch
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, Sequence
+
+from text_recog.batch import (
+    DEFAULT_MAX_ATTEMPTS,
+    DEFAULT_PATTERNS,
+    BatchOptions,
+    FileResult,
+    collect_pages,
+    process_file,
+)
+from text_recog.document import PageRef
+from text_recog.manifest import Manifest
+
+# Seconds a file must stay the same size and mtime before it is processed,
+# so scans still being copied in are left alone
+SETTLE_SECONDS = 3.0
+# Seconds between scans of the folders when there are no file system events
+POLL_INTERVAL = 2.0
+# With events, folders are still rescanned this often, for changes they miss
+# such as files written to a network share by another machine
+EVENT_RESCAN_INTERVAL = 30.0
+
+
+@dataclass
+class _Pending:
+    size: int
+    mtime_ns: int
+    # time.monotonic() when the file was first seen with this size and mtime
+    since: float
+    # When the file was first seen changed, for latency
+    appeared: float
+
+
+class FolderScanner:
+    """Finds new and changed files in folders by comparing their stat.
+
+    A file is reported once it has kept its size and mtime for ``settle``
+    seconds, and again only after it changes. Every file found by the first
+    scan counts as new.
+    """
+
+    def __init__(
+        self,
+        folders: Sequence[Path],
+        patterns: Sequence[str] = DEFAULT_PATTERNS,
+        settle: float = SETTLE_SECONDS,
+    ):
+        self.folders = list(folders)
+        self.patterns = patterns
+        self.settle = settle
+        self._pending: dict[Path, _Pending] = {}
+        # Size and mtime of each file when it was last reported
+        self._done: dict[Path, tuple[int, int]] = {}
+        self._missing: set[Path] = set()
+
+    def _stat_files(self) -> dict[Path, tuple[int, int]]:
+        found = {}
+        for folder in self.folders:
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if entry.name.startswith(".") or not any(
+                            fnmatch.fnmatch(entry.name, pattern)
+                            for pattern in self.patterns
+                        ):
+                            continue
+                        try:
+                            if not entry.is_file():
+                                continue
+                            stat = entry.stat()
+                        except OSError:
+                            # Deleted or renamed since it was listed
+                            continue
+                        found[Path(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+            except OSError as e:
+                # E.g. a share that is not mounted right now; its files are
+                # kept as they were until it is back
+                if folder not in self._missing:
+                    print(f"warning: cannot scan {folder}: {e}", file=sys.stderr)
+                    self._missing.add(folder)
+                found.update(
+                    {
+                        path: stat
+                        for path, stat in self._done.items()
+                        if path.parent == folder
+                    }
+                )
+                continue
+            self._missing.discard(folder)
+        return found
+
+    def scan(self, now: float | None = None) -> list[tuple[Path, float]]:
+        """Files that settled since the last scan, with the time.monotonic()
+        they were first seen changed"""
+        if now is None:
+            now = time.monotonic()
+        found = self._stat_files()
+        for path in self._done.keys() - found.keys():
+            del self._done[path]
+        for path in self._pending.keys() - found.keys():
+            del self._pending[path]
+
+        settled = []
+        for path, stat in found.items():
+            if self._done.get(path) == stat:
+                continue
+            pending = self._pending.get(path)
+            if pending is None:
+                self._pending[path] = _Pending(*stat, since=now, appeared=now)
+            elif (pending.size, pending.mtime_ns) != stat:
+                pending.size, pending.mtime_ns = stat
+                pending.since = now
+            elif now - pending.since >= self.settle and pending.size > 0:
+                # Empty files are more likely still being created
+                settled.append((path, pending.appeared))
+                self._done[path] = stat
+                del self._pending[path]
+        settled.sort()
+        return settled
+
+    @property
+    def next_settle(self) -> float | None:
+        """time.monotonic() at which the next pending file could settle"""
+        if not self._pending:
+            return None
+        return min(pending.since for pending in self._pending.values()) + self.settle
+
+
+def start_observer(folders: Sequence[Path], on_change: Callable[[], None]):
+    """Call ``on_change`` on every file system event in ``folders``, through
+    watchdog (inotify on Linux); None if watchdog is not installed"""
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            on_change()
+
+    observer = Observer()
+    try:
+        for folder in folders:
+            observer.schedule(Handler(), folder.as_posix(), recursive=False)
+        observer.start()
+    except OSError as e:
+        # E.g. out of inotify watches; polling still works
+        print(f"warning: file system events unavailable: {e}", file=sys.stderr)
+        return None
+    return observer
+
+
+def _ignore_interrupts():
+    """Pool workers leave Ctrl-C to the parent, which lets them finish"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def watch(
+    folders: Sequence[Path],
+    options: BatchOptions,
+    workers: int | None = None,
+    patterns: Sequence[str] = DEFAULT_PATTERNS,
+    settle: float = SETTLE_SECONDS,
+    poll: float = POLL_INTERVAL,
+    stop: threading.Event | None = None,
+    manifest: Manifest | None = None,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    skip_done: bool = True,
+) -> Iterator[FileResult]:
+    """Process new and changed files in ``folders`` until ``stop`` is set,
+    yielding the result of each page as soon as it is done.
+
+    With a manifest every result is recorded in it, and pages it has done,
+    unless ``skip_done`` is false, or that failed ``max_attempts`` times are
+    skipped, so a restart does not redo the folder. A failed page is tried
+    again once its file changes.
+
+    Pages are fanned out over a pool of ``workers`` processes, with at most
+    two per worker submitted at a time so that stopping does not wait on a
+    backlog. Once stopped, pages already submitted are finished and the
+    rest dropped. A pool broken by a dead worker is replaced.
+    """
+    workers = workers or os.cpu_count() or 1
+    stop = stop or threading.Event()
+    # Set by file system events; ``wake`` also by pages being done
+    changed = threading.Event()
+    wake = threading.Event()
+
+    def on_change():
+        changed.set()
+        wake.set()
+
+    def skip(ref: PageRef) -> bool:
+        if manifest is None:
+            return False
+        reason = manifest.skip_reason(ref, max_attempts)
+        return reason == "failed" or (reason == "done" and skip_done)
+
+    def finish(result: FileResult, appeared: float) -> FileResult:
+        result.latency = time.monotonic() - appeared
+        if manifest is not None:
+            result.attempts = manifest.record(result)
+        return result
+
+    scanner = FolderScanner(folders, patterns, settle)
+    observer = start_observer(folders, on_change)
+    rescan = poll if observer is None else EVENT_RESCAN_INTERVAL
+
+    queued: deque[tuple[PageRef, float]] = deque()
+    running: dict[Future, tuple[PageRef, float]] = {}
+    executor = ProcessPoolExecutor(workers, initializer=_ignore_interrupts)
+    broken = False
+    next_scan = 0.0
+    try:
+        while not stop.is_set() or running:
+            for future in [future for future in running if future.done()]:
+                ref, appeared = running.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    # A worker died outright, every page it was given fails
+                    broken = True
+                    result = FileResult(ref, error="worker process died")
+                yield finish(result, appeared)
+            if broken and not running:
+                executor.shutdown()
+                executor = ProcessPoolExecutor(workers, initializer=_ignore_interrupts)
+                broken = False
+
+            now = time.monotonic()
+            if changed.is_set():
+                changed.clear()
+                next_scan = now
+            if not stop.is_set() and now >= next_scan:
+                for path, appeared in scanner.scan(now):
+                    pages, failed = collect_pages([path])
+                    for result in failed:
+                        yield finish(result, appeared)
+                    queued.extend((ref, appeared) for ref in pages if not skip(ref))
+                next_scan = now + rescan
+                if scanner.next_settle is not None:
+                    next_scan = min(next_scan, scanner.next_settle)
+
+            while queued and len(running) < 2 * workers:
+                if broken or stop.is_set():
+                    break
+                ref, appeared = queued.popleft()
+                future = executor.submit(process_file, ref, options)
+                future.add_done_callback(lambda _: wake.set())
+                running[future] = ref, appeared
+
+            # Capped, so a stop from a signal handler is noticed quickly
+            wake.wait(min(max(0.0, next_scan - time.monotonic()), 1.0))
+            wake.clear()
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+        executor.shutdown(cancel_futures=True)
@@ -0,0 +1,149 @@
+"""Storing, reading and evicting OCR cache entries"""
+
+import gzip
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from text_recog.cache import CACHE_SUFFIX, OCRCache
+
+TSV = b"level\tpage_num\tblock_num\ttext\n5\t1\t1\tGazeta\n"
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> OCRCache:
+    return OCRCache(tmp_path / "ocr")
+
+
+def entries(cache: OCRCache) -> list[Path]:
+    return sorted(cache.cache_dir.glob(f"*/*{CACHE_SUFFIX}"))
+
+
+def age(cache: OCRCache, key: str, seconds: float):
+    """Set the last use of an entry ``seconds`` into the past"""
+    then = time.time() - seconds
+    os.utime(cache._entry_path(key), (then, then))
+
+
+def test_put_then_get(cache):
+    key = OCRCache.make_key("digest", "pol", "5.3.0")
+    assert cache.get(key) is None
+    assert key not in cache
+
+    cache.put(key, TSV)
+    assert key in cache
+    assert cache.get(key) == TSV
+    (entry,) = entries(cache)
+    assert entry.parent.name == key[:2]
+    assert gzip.decompress(entry.read_bytes()) == TSV
+
+
+def test_get_refreshes_last_use(cache):
+    cache.put("ab01", TSV)
+    age(cache, "ab01", 3600)
+    assert cache.get("ab01") == TSV
+    assert time.time() - cache._entry_path("ab01").stat().st_mtime < 60
+
+
+def test_truncated_entry_is_a_miss(cache):
+    cache.put("ab01", TSV)
+    path = cache._entry_path("ab01")
+    path.write_bytes(path.read_bytes()[:10])
+    assert cache.get("ab01") is None
+
+
+def test_expired_entry_is_removed_on_get(tmp_path: Path):
+    cache = OCRCache(tmp_path, max_age=60)
+    cache.put("ab01", TSV)
+    age(cache, "ab01", 120)
+    assert cache.get("ab01") is None
+    assert entries(cache) == []
+
+
+def test_eviction_drops_least_recently_used(tmp_path: Path):
+    cache = OCRCache(tmp_path)
+    for number, key in enumerate(["aa", "bb", "cc"]):
+        cache.put(key, TSV)
+        age(cache, key, 300 - 100 * number)
+    entry_size = cache._entry_path("aa").stat().st_size
+
+    # Room for two entries: putting a fourth evicts the oldest two
+    cache.max_bytes = 2 * entry_size
+    cache.put("dd", TSV)
+    assert [key for key in ["aa", "bb", "cc", "dd"] if key in cache] == ["cc", "dd"]
+    assert cache._size == 2 * entry_size
+
+
+def test_evict_drops_expired_entries_under_budget(tmp_path: Path):
+    cache = OCRCache(tmp_path, max_age=60)
+    cache.put("aa", TSV)
+    cache.put("bb", TSV)
+    age(cache, "aa", 120)
+    assert cache.evict() == 1
+    assert "aa" not in cache and "bb" in cache
+
+
+def test_clear(cache):
+    cache.put("aa", TSV)
+    cache.put("bb", TSV)
+    cache.clear()
+    assert entries(cache) == []
+    assert cache._size == 0
+
+
+def test_threads_writing_at_once(cache):
+    keys = [f"{number:02x}" * 20 for number in range(8)]
+    start = threading.Barrier(len(keys) * 2)
+
+    def write(key: str):
+        start.wait()
+        for _ in range(20):
+            cache.put(key, TSV)
+            cache.put(keys[0], TSV + key.encode())
+
+    threads = [threading.Thread(target=write, args=(key,)) for key in keys * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Each write went to a temporary file first, and none were left behind
+    assert list(cache.cache_dir.rglob("*.tmp")) == []
+    assert len(entries(cache)) == len(keys)
+    assert all(cache.get(key) is not None for key in keys[1:])
+    assert cache.get(keys[0]).startswith(TSV)
+    # Replacing an entry counts it twice, so the estimate is never low
+    assert cache._size >= sum(entry.stat().st_size for entry in entries(cache))
+
+
+def test_size_estimate_matches_disk_after_threaded_puts(cache):
+    def write(first: int):
+        for number in range(first, first + 50):
+            cache.put(f"{number:04x}", TSV + str(number).encode())
+
+    cache.put("seed", TSV)
+    threads = [threading.Thread(target=write, args=(50 * n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache._size == sum(entry.stat().st_size for entry in entries(cache))
+
+
+def test_page_key():
+    base = OCRCache.make_key("digest", "pol", "5.3.0", "--psm 3")
+    assert OCRCache.page_key("digest", "pol", "5.3.0", "--psm 3") == base
+    keys = {
+        base,
+        OCRCache.page_key("digest", "pol", "5.3.0", "--psm 3", page="0"),
+        OCRCache.page_key("digest", "pol", "5.3.0", "--psm 3", page="1"),
+        OCRCache.page_key(
+            "digest", "pol", "5.3.0", "--psm 3", preprocessing=["deskew"]
+        ),
+        OCRCache.make_key("digest", "eng", "5.3.0", "--psm 3"),
+        OCRCache.make_key("digest", "pol", "5.4.0", "--psm 3"),
+    }
+    assert len(keys) == 6
@@ -0,0 +1,93 @@
+"""Compact pages read the same as the layout tree they stand in for"""
+
+from pathlib import Path
+
+import pytest
+
+from text_recog import compact, layout
+
+FIXTURES = sorted((Path(__file__).parents[1] / "benchmarks" / "fixtures").glob("*.tsv"))
+
+
+def words(page) -> list[tuple]:
+    """Every word of a page with its ids, box, confidence and text"""
+    return [
+        (block_num, par_num, line_num, word_num)
+        + (word.left, word.top, word.width, word.height)
+        + (pytest.approx(word.conf, abs=1e-3), word.get_text())
+        for block_num, block in page.blocks.items()
+        for par_num, para in block.paragraphs.items()
+        for line_num, line in para.lines.items()
+        for word_num, word in line.words.items()
+    ]
+
+
+def boxes(elements: dict) -> dict:
+    return {
+        num: (element.left, element.top, element.width, element.height)
+        for num, element in elements.items()
+    }
+
+
+@pytest.mark.parametrize("fixture", FIXTURES, ids=lambda path: path.stem)
+def test_tsv_to_compact_matches_tree(fixture: Path):
+    tsv = fixture.read_bytes()
+    tree = layout.tsv_to_layout(tsv)[1]
+    for page in (compact.tsv_to_compact(tsv)[1], compact.CompactPage.from_page(tree)):
+        assert words(page) == words(tree)
+        assert boxes(page.blocks) == boxes(tree.blocks)
+        assert page.get_text() == tree.get_text()
+        for block_num, block in tree.blocks.items():
+            assert page.blocks[block_num].get_text() == block.get_text()
+
+
+def test_tsv_to_compact_splits_pages():
+    rows = []
+    for page_num, fixture in enumerate(FIXTURES, start=1):
+        for row in fixture.read_text(encoding="utf-8").splitlines()[1:]:
+            level, _, rest = row.split("\t", 2)
+            rows.append(f"{level}\t{page_num}\t{rest}")
+    tsv = "\n".join(["\t".join(layout.LAYOUT_COLUMNS), *rows, ""]).encode("utf-8")
+
+    pages = compact.tsv_to_compact(tsv)
+    assert list(pages) == list(range(1, len(FIXTURES) + 1))
+    for page, fixture in zip(pages.values(), FIXTURES):
+        tree = layout.tsv_to_layout(fixture.read_bytes())[1]
+        assert page.get_text() == tree.get_text()
+
+
+def test_replace_block():
+    tsv = FIXTURES[0].read_bytes()
+    page = compact.tsv_to_compact(tsv)[1]
+    block_num, old = next(iter(page.blocks.items()))
+    word = layout.Word(old.left, old.top, 40, 20, 90.0, "zastąpiony")
+    line = layout.Line(old.left, old.top, 40, 20, words={1: word})
+    para = layout.Paragraph(old.left, old.top, 40, 20, lines={1: line})
+
+    block = page.replace_block(block_num, {1: para})
+    assert page.blocks[block_num] is block
+    assert boxes({1: block}) == boxes({1: old})
+    assert block.get_text() == "zastąpiony"
+    assert page.get_text().startswith("zastąpiony")
+    # The other blocks are still read from the columns
+    assert len(page.blocks) == len(layout.tsv_to_layout(tsv)[1].blocks)
+
+
+def test_blocks_and_text_are_kept_until_a_block_is_replaced():
+    page = compact.tsv_to_compact(FIXTURES[0].read_bytes())[1]
+    blocks = page.blocks
+    block_num, view = next(iter(blocks.items()))
+    assert page.blocks[block_num] is view
+    text = view.get_text()
+    assert view.get_text() is text
+    # Callers get their own dict, changing it leaves the page alone
+    blocks.clear()
+    assert page.blocks[block_num] is view
+
+    other_num, other = list(page.blocks.items())[1]
+    block = page.replace_block(block_num, {})
+    assert page.blocks[block_num] is block
+    assert block.get_text() == ""
+    assert not page.get_text().startswith(text)
+    # Other blocks keep their views
+    assert page.blocks[other_num] is other
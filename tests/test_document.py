@@ -0,0 +1,47 @@
+"""Reading images and their size from the header"""
+
+from pathlib import Path
+
+import pytest
+
+from text_recog import document
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def scan(tmp_path: Path) -> Path:
+    image = np.zeros((30, 40, 3), dtype=np.uint8)
+    image[10:20, 5:35] = (0, 128, 255)
+    path = tmp_path / "scan.png"
+    cv2.imwrite(path.as_posix(), image)
+    return path
+
+
+def test_read_image(scan: Path):
+    assert document.image_size(scan) == (40, 30)
+    image = document.read_image(scan)
+    assert image.shape == (30, 40, 3)
+    assert tuple(image[15, 20]) == (0, 128, 255)
+    assert document.read_image(scan, 2).shape == (15, 20, 3)
+
+
+def test_images_over_the_pillow_limit_are_read(scan: Path, monkeypatch):
+    # Scaled down: Pillow refuses images over twice the limit outright
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 500)
+    with pytest.raises(Image.DecompressionBombError):
+        Image.open(scan)
+
+    assert document.image_size(scan) is None
+    image = document.read_image(scan)
+    assert image.shape == (30, 40, 3)
+    assert tuple(image[15, 20]) == (0, 128, 255)
+
+
+def test_unreadable_image(tmp_path: Path):
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(b"not an image")
+    assert document.image_size(path) is None
+    assert document.read_image(path) is None
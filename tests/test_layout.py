@@ -0,0 +1,136 @@
+"""The layout builders agree: tsv_to_layout, df_to_layout and the row-by-row
+reference, on recorded Tesseract output and on edge cases"""
+
+import math
+from csv import QUOTE_NONE
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+
+from text_recog import layout
+
+pd = pytest.importorskip("pandas")
+
+FIXTURES = sorted((Path(__file__).parents[1] / "benchmarks" / "fixtures").glob("*.tsv"))
+HEADER = "\t".join(layout.LAYOUT_COLUMNS)
+
+
+def read_df(tsv: bytes) -> "pd.DataFrame":
+    # Words are kept as text, only empty ones are missing, as in tsv_to_layout
+    return pd.read_csv(
+        BytesIO(tsv),
+        sep="\t",
+        quoting=QUOTE_NONE,
+        dtype={"text": str},
+        keep_default_na=False,
+        na_values={"text": [""]},
+    )
+
+
+def signature(pages: dict[int, layout.Page]) -> list[tuple]:
+    """Every element of a tree as comparable tuples, missing text as None"""
+
+    def box(element):
+        return element.left, element.top, element.width, element.height
+
+    def text(word):
+        if isinstance(word.text, float) and math.isnan(word.text):
+            return None
+        return word.text
+
+    return [
+        (page_num, box(page), block_num, box(block), par_num, box(para))
+        + (line_num, box(line), word_num, box(word), word.conf, text(word))
+        for page_num, page in pages.items()
+        for block_num, block in page.blocks.items()
+        for par_num, para in block.paragraphs.items()
+        for line_num, line in para.lines.items()
+        for word_num, word in line.words.items()
+    ]
+
+
+def assert_builders_agree(tsv: bytes):
+    df = read_df(tsv)
+    reference = signature(layout.df_to_layout_iterrows(df))
+    assert reference
+    assert signature(layout.df_to_layout(df)) == reference
+    assert signature(layout.tsv_to_layout(tsv)) == reference
+
+
+def make_tsv(*rows: str) -> bytes:
+    return "\n".join([HEADER, *rows, ""]).encode("utf-8")
+
+
+@pytest.mark.parametrize("fixture", FIXTURES, ids=lambda path: path.stem)
+def test_builders_agree_on_fixtures(fixture: Path):
+    assert_builders_agree(fixture.read_bytes())
+
+
+def test_builders_agree_on_blank_words_and_unknown_confidence():
+    assert_builders_agree(
+        make_tsv(
+            "1\t1\t0\t0\t0\t0\t0\t0\t600\t800\t-1\t",
+            "2\t1\t1\t0\t0\t0\t10\t10\t300\t100\t-1\t",
+            "3\t1\t1\t1\t0\t0\t10\t10\t300\t100\t-1\t",
+            "4\t1\t1\t1\t1\t0\t10\t10\t300\t20\t-1\t",
+            "5\t1\t1\t1\t1\t1\t10\t10\t60\t20\t91.5\tŁódź",
+            # A speck: no text, and no confidence
+            "5\t1\t1\t1\t1\t2\t80\t10\t5\t20\t-1\t",
+            "5\t1\t1\t1\t1\t3\t90\t10\t5\t20\t0\t ",
+            "5\t1\t1\t1\t1\t4\t100\t10\t60\t20\t-1\tgazeta",
+            # A block without any words
+            "2\t1\t2\t0\t0\t0\t10\t200\t300\t100\t-1\t",
+            "3\t1\t2\t1\t0\t0\t10\t200\t300\t100\t-1\t",
+            "4\t1\t2\t1\t1\t0\t10\t200\t300\t20\t-1\t",
+        )
+    )
+
+
+def test_builders_agree_on_multi_page_tsv():
+    rows = []
+    for page_num, fixture in enumerate(FIXTURES, start=1):
+        for row in fixture.read_text(encoding="utf-8").splitlines()[1:]:
+            level, _, rest = row.split("\t", 2)
+            rows.append(f"{level}\t{page_num}\t{rest}")
+    tsv = make_tsv(*rows)
+    assert_builders_agree(tsv)
+
+    pages = layout.tsv_to_layout(tsv)
+    assert list(pages) == list(range(1, len(FIXTURES) + 1))
+    for page, fixture in zip(pages.values(), FIXTURES):
+        assert page == layout.tsv_to_layout(fixture.read_bytes())[1]
+
+
+def test_tsv_to_layout_keeps_text_verbatim():
+    pages = layout.tsv_to_layout(
+        make_tsv(
+            "1\t1\t0\t0\t0\t0\t0\t0\t600\t800\t-1\t",
+            "2\t1\t1\t0\t0\t0\t10\t10\t300\t100\t-1\t",
+            "3\t1\t1\t1\t0\t0\t10\t10\t300\t100\t-1\t",
+            "4\t1\t1\t1\t1\t0\t10\t10\t300\t20\t-1\t",
+            # Words pandas would read as missing values by default
+            "5\t1\t1\t1\t1\t1\t10\t10\t60\t20\t90\tNA",
+            "5\t1\t1\t1\t1\t2\t80\t10\t60\t20\t90\tnull",
+            "5\t1\t1\t1\t1\t3\t150\t10\t60\t20\t-1\t",
+        )
+    )
+    words = pages[1].blocks[1].paragraphs[1].lines[1].words
+    assert [word.text for word in words.values()] == ["NA", "null", None]
+    assert words[3].conf == -1
+
+
+def test_tsv_to_layout_rejects_other_tsv():
+    with pytest.raises(ValueError):
+        layout.tsv_to_layout(b"a\tb\n1\t2\n")
+
+
+def test_editing_a_word_updates_cached_text():
+    page = layout.tsv_to_layout(FIXTURES[0].read_bytes())[1]
+    block = next(iter(page.blocks.values()))
+    word = next(iter(block.paragraphs.values())).lines[1].words[1]
+    before = page.get_text()
+    word.text = "zmieniony"
+    assert block.get_text().startswith("zmieniony")
+    assert page.get_text() != before
+    assert "zmieniony" in page.get_text()
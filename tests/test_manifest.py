@@ -0,0 +1,123 @@
+"""What the batch manifest counts and skips: retries of failed pages, and
+pages done by an earlier run"""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from text_recog.batch import FileResult
+from text_recog.document import PageRef
+from text_recog.manifest import MANIFEST_NAME, Manifest
+
+PARAMS = '{"formats": ["txt"]}'
+
+
+@pytest.fixture
+def page(tmp_path: Path) -> PageRef:
+    path = tmp_path / "scan.png"
+    path.write_bytes(b"not really a png")
+    return PageRef(path)
+
+
+def stat_of(path: Path) -> tuple[int, int]:
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def failed(ref: PageRef) -> FileResult:
+    return FileResult(ref, error="tesseract crashed", stat=stat_of(ref.path))
+
+
+def done(ref: PageRef, tmp_path: Path) -> FileResult:
+    transcript = tmp_path / "transcripts" / f"{ref.path.stem}.txt"
+    transcript.parent.mkdir(exist_ok=True)
+    transcript.write_text("Gazeta")
+    return FileResult(
+        ref, pages=1, blocks=3, outputs={"txt": transcript}, stat=stat_of(ref.path)
+    )
+
+
+def touch(path: Path):
+    """Change the file, size and mtime both"""
+    stat = path.stat()
+    path.write_bytes(path.read_bytes() + b"!")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_failures_are_counted_until_out_of_attempts(tmp_path, page):
+    with Manifest(tmp_path / MANIFEST_NAME, PARAMS) as manifest:
+        assert manifest.skip_reason(page, 3) is None
+        assert manifest.record(failed(page)) == 1
+        assert manifest.record(failed(page)) == 2
+        assert manifest.skip_reason(page, 3) is None
+        assert manifest.record(failed(page)) == 3
+        assert manifest.skip_reason(page, 3) == "failed"
+        # Allowing more attempts lets it be tried again
+        assert manifest.skip_reason(page, 4) is None
+
+    # The count survives a restart
+    with Manifest(tmp_path / MANIFEST_NAME, PARAMS) as manifest:
+        assert manifest.skip_reason(page, 3) == "failed"
+        assert manifest.record(failed(page)) == 4
+
+
+def test_a_changed_file_or_options_start_the_count_again(tmp_path, page):
+    with Manifest(tmp_path / MANIFEST_NAME, PARAMS) as manifest:
+        manifest.record(failed(page))
+        manifest.record(failed(page))
+        touch(page.path)
+        assert manifest.skip_reason(page, 2) is None
+        assert manifest.record(failed(page)) == 1
+
+    with Manifest(tmp_path / MANIFEST_NAME, '{"formats": ["json"]}') as manifest:
+        assert manifest.skip_reason(page, 1) is None
+        assert manifest.record(failed(page)) == 1
+
+
+def test_a_success_ends_the_count(tmp_path, page):
+    with Manifest(tmp_path / MANIFEST_NAME, PARAMS) as manifest:
+        manifest.record(failed(page))
+        # Done at the second attempt, and failures after that count anew
+        assert manifest.record(done(page, tmp_path)) == 2
+        assert manifest.record(failed(page)) == 1
+
+
+def test_dead_worker_is_counted_against_the_file_on_disk(tmp_path, page):
+    with Manifest(tmp_path / MANIFEST_NAME, PARAMS) as manifest:
+        assert manifest.record(FileResult(page, error="worker process died")) == 1
+        assert manifest.record(failed(page)) == 2
+
+
+def test_resume_skips_pages_done_before(tmp_path, page):
+    other = PageRef(tmp_path / "issue.pdf", page=1, count=4)
+    other.path.write_bytes(b"%PDF")
+    with Manifest(tmp_path / MANIFEST_NAME, PARAMS) as manifest:
+        result = done(page, tmp_path)
+        manifest.record(result)
+        assert manifest.skip_reason(page, 3) == "done"
+
+    with Manifest(tmp_path / MANIFEST_NAME, PARAMS) as manifest:
+        assert manifest.skip_reason(page, 3) == "done"
+        assert manifest.skip_reason(other, 3) is None
+        assert manifest.skip_reason(PageRef(other.path, page=0, count=4), 3) is None
+
+    # Unless resuming is turned off, the options differ or an output is gone
+    with Manifest(tmp_path / MANIFEST_NAME, PARAMS, resume=False) as manifest:
+        assert manifest.skip_reason(page, 3) is None
+    with Manifest(tmp_path / MANIFEST_NAME, '{"formats": ["json"]}') as manifest:
+        assert manifest.skip_reason(page, 3) is None
+    result.outputs["txt"].unlink()
+    with Manifest(tmp_path / MANIFEST_NAME, PARAMS) as manifest:
+        assert manifest.skip_reason(page, 3) is None
+
+
+def test_resume_redoes_a_page_whose_file_changed(tmp_path, page):
+    with Manifest(tmp_path / MANIFEST_NAME, PARAMS) as manifest:
+        manifest.record(done(page, tmp_path))
+    touch(page.path)
+    with Manifest(tmp_path / MANIFEST_NAME, PARAMS) as manifest:
+        assert manifest.skip_reason(page, 3) is None
+    page.path.unlink()
+    with Manifest(tmp_path / MANIFEST_NAME, PARAMS) as manifest:
+        assert manifest.skip_reason(page, 3) is None
@@ -0,0 +1,78 @@
+"""The prefetch window and its memory cap, with a stand-in for the analysis"""
+
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from text_recog import prefetch
+from text_recog.document import PageRef
+
+REFS = [PageRef(Path(f"page{number:03d}.jpg")) for number in range(10)]
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def make_prefetcher(release: threading.Event, **kwargs) -> prefetch.PagePrefetcher:
+    def load(ref: PageRef, job: prefetch.PageJob):
+        release.wait(5)
+        job.enter("done")
+        return SimpleNamespace(ref=ref, nbytes=100)
+
+    return prefetch.PagePrefetcher(load, **kwargs)
+
+
+def test_window_is_queued_and_the_rest_cancelled():
+    release = threading.Event()
+    prefetcher = make_prefetcher(release, ahead=2, behind=1)
+    try:
+        prefetcher.prefetch_around(REFS, 5)
+        assert set(prefetcher._jobs) == {REFS[4], REFS[6], REFS[7]}
+        jobs = dict(prefetcher._jobs)
+
+        prefetcher.prefetch_around(REFS, 6)
+        # The page now shown keeps its job too
+        assert set(prefetcher._jobs) == {REFS[5], REFS[6], REFS[7], REFS[8]}
+        assert jobs[REFS[4]].cancelled
+        assert prefetcher.get(REFS[7]) is jobs[REFS[7]]
+    finally:
+        release.set()
+        prefetcher.shutdown()
+
+
+def test_memory_cap_holds_as_background_jobs_finish():
+    release = threading.Event()
+    prefetcher = make_prefetcher(release, ahead=4, behind=0, max_bytes=250)
+    try:
+        prefetcher.prefetch_around(REFS, 0)
+        current = prefetcher.get(REFS[0])
+        # Nothing is done yet, so the cap has nothing to drop on navigation
+        assert len(prefetcher._jobs) == 5
+
+        release.set()
+        # Without navigating again, the farthest results go as they finish
+        assert wait_for(lambda: set(prefetcher._jobs) == {REFS[0], REFS[1]})
+        assert current.result().nbytes == 100
+    finally:
+        prefetcher.shutdown()
+
+
+def test_current_page_is_kept_over_the_cap():
+    release = threading.Event()
+    release.set()
+    prefetcher = make_prefetcher(release, ahead=1, behind=0, max_bytes=0)
+    try:
+        job = prefetcher.get(REFS[3])
+        prefetcher.prefetch_around(REFS, 3)
+        assert job.future.result(5).nbytes == 100
+        assert wait_for(lambda: set(prefetcher._jobs) == {REFS[3]})
+        assert prefetcher.get(REFS[3]) is job
+    finally:
+        prefetcher.shutdown()
@@ -0,0 +1,98 @@
+"""Which pyramid level a zoom renders from, and what the levels hold"""
+
+import pytest
+
+from text_recog.render import ImagePyramid, region_contains
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+
+def page(height: int = 2048, width: int = 1536):
+    """A gradient, so that any region tells where it was cut from"""
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[..., :2] = np.linspace(0, 255, height, dtype=np.uint8)[:, None, None]
+    image[..., 2] = np.linspace(0, 255, width, dtype=np.uint8)
+    return image
+
+
+@pytest.mark.parametrize(
+    "zoom, level",
+    [
+        (4.0, 0),
+        (1.0, 0),
+        (0.99, 0),
+        (0.5, 1),
+        (0.3, 1),
+        (0.25, 2),
+        (0.2, 2),
+        # A 1536 pixel side goes down to 256 pixels at most: 2 ** 2 < 6 < 2 ** 3
+        (0.125, 2),
+        (0.001, 2),
+    ],
+)
+def test_level_for(zoom, level):
+    assert ImagePyramid(page()).level_for(zoom) == level
+
+
+def test_level_keeps_at_least_the_zoom_resolution():
+    pyramid = ImagePyramid(page(), min_size=64)
+    for zoom in np.geomspace(0.02, 1, 40):
+        source_width = pyramid.level(pyramid.level_for(zoom)).shape[1]
+        assert source_width >= pyramid.width * zoom - 1
+        # And is the smallest such level, until min_size stops it
+        if pyramid.level_for(zoom) < pyramid.max_level:
+            assert source_width / 2 < pyramid.width * zoom
+
+
+def test_levels_are_built_when_needed():
+    image = page()
+    pyramid = ImagePyramid(image)
+    assert pyramid.level(0) is image
+    assert len(pyramid.levels) == 1
+    assert pyramid.level(2).shape == (512, 384, 3)
+    assert len(pyramid.levels) == 3
+    assert pyramid.level(1).shape == (1024, 768, 3)
+
+
+def test_zoomed_size():
+    pyramid = ImagePyramid(page())
+    assert pyramid.zoomed_size(1) == (1536, 2048)
+    assert pyramid.zoomed_size(0.3) == (460, 614)
+
+
+def test_reduced_image_stands_in_for_finer_levels():
+    image = cv2.resize(page(), (384, 512), interpolation=cv2.INTER_AREA)
+    pyramid = ImagePyramid(image, scale=4)
+    assert (pyramid.width, pyramid.height) == (1536, 2048)
+    assert pyramid.first_level == 2
+    assert pyramid.level_for(1) == 0
+    assert pyramid.level(0) is image
+    assert pyramid.level(2) is image
+    assert pyramid.level(3).shape == (256, 192, 3)
+    # Never coarser than the stand-in, however small the page is
+    assert ImagePyramid(image, min_size=4096, scale=4).max_level == 2
+
+
+def test_render_region():
+    image = page()
+    pyramid = ImagePyramid(image)
+    rendered, x, y = pyramid.render(1, 100, 200, 300, 50)
+    assert (x, y) == (100, 200)
+    assert np.array_equal(rendered, image[200:250, 100:400])
+
+    rendered, x, y = pyramid.render(0.25, 100, 200, 150, 100)
+    assert (x, y) == (100, 200)
+    assert rendered.shape == (100, 150, 3)
+    assert np.array_equal(rendered, pyramid.level(2)[200:300, 100:250])
+
+    # Cut at the edge of the page
+    rendered, x, y = pyramid.render(0.5, 700, 0, 400, 100)
+    assert rendered.shape == (100, 68, 3)
+
+
+def test_region_contains():
+    assert region_contains((0, 0, 100, 100), (10, 10, 100, 50))
+    assert region_contains((0, 0, 100, 100), (0, 0, 100, 100))
+    assert not region_contains((0, 0, 100, 100), (10, 10, 101, 50))
+    assert not region_contains((10, 0, 100, 100), (0, 0, 50, 50))
@@ -0,0 +1,127 @@
+"""Folding, term splitting and queries of the search index"""
+
+from pathlib import Path
+
+import pytest
+
+from text_recog import layout, search
+
+
+def make_blocks(*block_texts: str) -> dict[int, layout.Block]:
+    """Blocks of one line each, the words 50 pixels apart"""
+    blocks = {}
+    for block_num, text in enumerate(block_texts, start=1):
+        top = 100 * block_num
+        words = {
+            word_num: layout.Word(50 * word_num, top, 40, 20, 90.0, word)
+            for word_num, word in enumerate(text.split(), start=1)
+        }
+        line = layout.Line(0, top, 600, 20, words=words)
+        para = layout.Paragraph(0, top, 600, 20, lines={1: line})
+        blocks[block_num] = layout.Block(0, top, 600, 20, paragraphs={1: para})
+    return blocks
+
+
+@pytest.fixture
+def index(tmp_path: Path):
+    with search.SearchIndex(tmp_path / search.INDEX_NAME) as index:
+        yield index
+
+
+def postings(index: search.SearchIndex) -> dict[str, int]:
+    return dict(index.db.execute("SELECT term, postings FROM terms"))
+
+
+def test_fold():
+    assert search.fold("Łódź") == "lodz"
+    assert search.fold("ŻÓŁĆ gęślą jaźń") == "zolc gesla jazn"
+    # Beyond the Polish letters, NFKD drops the accents
+    assert search.fold("Café Straße") == "cafe strasse"
+
+
+def test_terms():
+    assert search.terms("Wałęsa, w Gdańsku (1980)!") == [
+        "walesa",
+        "w",
+        "gdansku",
+        "1980",
+    ]
+    assert search.terms(" -- ") == []
+
+
+def test_search_whole_words_any_case(index):
+    path = Path("issue.pdf")
+    index.add_page(path, 0, make_blocks("Strajk w GDAŃSKU", "Łódź i Gdańsk"))
+    hits = index.search("gdansk")
+    assert [(hit.page, hit.block, hit.text) for hit in hits] == [(0, 2, "Gdańsk")]
+    assert hits[0].path == path.resolve()
+    assert (hits[0].left, hits[0].top, hits[0].width, hits[0].height) == (
+        150,
+        200,
+        40,
+        20,
+    )
+    assert index.search("gdańsk lodz")[0].name == "issue.pdf [1]"
+    assert index.search("nieobecny") == []
+    assert index.search("***") == []
+
+
+def test_prefix_query(index):
+    index.add_page(Path("a.png"), None, make_blocks("Kowalski i Kowalskiej", "Kowal"))
+    index.add_page(Path("b.png"), None, make_blocks("Nowak"))
+    hits = index.search("kowalsk*")
+    assert [hit.text for hit in hits] == ["Kowalski", "Kowalskiej"]
+    assert [hit.text for hit in index.search("kowal*")] == [
+        "Kowalski",
+        "Kowalskiej",
+        "Kowal",
+    ]
+    assert index.search("kowalskie") == []
+
+
+def test_all_terms_must_be_on_the_page(index):
+    index.add_page(Path("both.png"), None, make_blocks("Wałęsa w Gdańsku"))
+    index.add_page(Path("one.png"), None, make_blocks("Wałęsa w Warszawie"))
+    hits = index.search("wałęsa gdańsku")
+    assert {hit.path.name for hit in hits} == {"both.png"}
+    assert [hit.text for hit in hits] == ["Wałęsa", "Gdańsku"]
+    # Each term may be a prefix
+    assert {hit.path.name for hit in index.search("wał* warsz*")} == {"one.png"}
+    assert len({hit.path.name for hit in index.search("wałęsa w")}) == 2
+
+
+def test_limit_keeps_page_and_reading_order(index):
+    for page in range(5):
+        index.add_page(Path("issue.pdf"), page, make_blocks("sejm sejm sejm"))
+    hits = index.search("sejm", limit=7)
+    assert [(hit.page, hit.left) for hit in hits] == [
+        (page, left) for page in range(3) for left in (50, 100, 150)
+    ][:7]
+
+
+def test_indexing_a_page_again_replaces_it(index):
+    path = Path("issue.pdf")
+    assert index.add_page(path, 2, make_blocks("Kraków Kraków Gdańsk")) == 3
+    index.add_page(path, 3, make_blocks("Kraków"))
+    assert postings(index) == {"krakow": 3, "gdansk": 1}
+
+    assert index.add_page(path, 2, make_blocks("Gdańsk Sopot")) == 2
+    assert postings(index) == {"krakow": 1, "gdansk": 1, "sopot": 1}
+    assert [hit.page for hit in index.search("krakow")] == [3]
+    assert [hit.text for hit in index.search("sopot gdansk")] == ["Gdańsk", "Sopot"]
+
+    index.add_page(path, 3, {})
+    assert index.search("krakow") == []
+    assert postings(index)["krakow"] == 0
+
+
+def test_add_postings_matches_add_page(tmp_path: Path):
+    blocks = make_blocks("Wałęsa w Gdańsku", "Łódź")
+    path = Path("issue.pdf")
+    with search.SearchIndex(tmp_path / "page.sqlite") as by_page:
+        by_page.add_page(path, 1, blocks)
+        expected = by_page.search("wałęsa lodz")
+    with search.SearchIndex(tmp_path / "postings.sqlite") as by_postings:
+        by_postings.add_postings(path, 1, search.page_postings(blocks))
+        assert by_postings.search("wałęsa lodz") == expected
+    assert len(expected) == 2
@@ -0,0 +1,126 @@
+"""The grid index finds what a scan of every box would, wherever the boxes
+and queries fall on the grid"""
+
+import random
+from pathlib import Path
+
+import pytest
+
+from text_recog import layout
+from text_recog.layout import TessLayout
+from text_recog.spatial import GridIndex, PageIndex
+
+FIXTURES = sorted((Path(__file__).parents[1] / "benchmarks" / "fixtures").glob("*.tsv"))
+
+
+def scan_at(boxes, x, y) -> list[int]:
+    """Indexes of the boxes containing a point, smallest first"""
+    hits = [
+        i
+        for i, (left, top, width, height) in enumerate(boxes)
+        if left <= x < left + width and top <= y < top + height
+    ]
+    return sorted(hits, key=lambda i: boxes[i][2] * boxes[i][3])
+
+
+def scan_within(boxes, left, top, right, bottom, contained=False) -> list[int]:
+    left, right = sorted((left, right))
+    top, bottom = sorted((top, bottom))
+    if contained:
+        return [
+            i
+            for i, (x, y, width, height) in enumerate(boxes)
+            if left <= x and x + width <= right and top <= y and y + height <= bottom
+        ]
+    return [
+        i
+        for i, (x, y, width, height) in enumerate(boxes)
+        if x < right and left < x + width and y < bottom and top < y + height
+    ]
+
+
+def random_boxes(rnd: random.Random, count: int) -> list[tuple[int, int, int, int]]:
+    return [
+        (rnd.randrange(0, 1000), rnd.randrange(0, 1000))
+        + (rnd.randrange(1, 120), rnd.randrange(1, 120))
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize("cell_size", [None, 7, 50, 2000])
+def test_matches_a_scan_of_every_box(cell_size):
+    rnd = random.Random(cell_size)
+    boxes = random_boxes(rnd, 300)
+    index = GridIndex(boxes, range(len(boxes)), cell_size=cell_size)
+    for _ in range(300):
+        x, y = rnd.uniform(-50, 1150), rnd.uniform(-50, 1150)
+        assert index.at(x, y) == scan_at(boxes, x, y)
+        rect = [rnd.uniform(-50, 1150) for _ in range(4)]
+        assert index.within(*rect) == scan_within(boxes, *rect)
+        assert index.within(*rect, contained=True) == scan_within(
+            boxes, *rect, contained=True
+        )
+
+
+def test_boxes_across_cell_edges():
+    # Cells of 10: the first box spans four cells, the second ends on an edge
+    boxes = [(5, 5, 10, 10), (10, 0, 10, 10), (25, 25, 1, 1)]
+    index = GridIndex(boxes, ["spanning", "edge", "speck"], cell_size=10)
+    assert index.at(14.9, 14.9) == ["spanning"]
+    assert index.at(12, 7) == ["spanning", "edge"]
+    # Right and bottom edges are exclusive
+    assert index.at(20, 5) == []
+    assert index.at(15, 15) == []
+    assert index.at(9.99, 9.99) == ["spanning"]
+    # Found once, though it is in every cell the query touches
+    assert index.within(0, 0, 30, 30) == ["spanning", "edge", "speck"]
+    assert index.within(14, 14, 16, 16) == ["spanning"]
+    assert index.within(15, 5, 25, 25) == ["edge"]
+    assert index.within(0, 0, 20, 10, contained=True) == ["edge"]
+    # Given corners the other way round
+    assert index.within(30, 30, 12, 12) == ["spanning", "speck"]
+
+
+def test_empty_queries():
+    index = GridIndex([(100, 100, 20, 20)], ["only"], cell_size=10)
+    assert index.at(50, 50) == []
+    assert index.at(-5, -5) == []
+    assert index.within(0, 0, 50, 50) == []
+    assert index.within(2000, 2000, 3000, 3000) == []
+    # A rectangle of no size finds the box it is in, not one it only touches
+    assert index.within(110, 110, 110, 110) == ["only"]
+    assert index.within(120, 110, 120, 110) == []
+    assert index.within(100, 100, 120, 120, contained=True) == ["only"]
+
+
+def test_empty_index():
+    index = GridIndex([], [])
+    assert len(index) == 0
+    assert index.at(0, 0) == []
+    assert index.within(0, 0, 100, 100) == []
+
+
+@pytest.mark.parametrize("fixture", FIXTURES, ids=lambda path: path.stem)
+def test_page_index_matches_the_layout(fixture: Path):
+    pages = layout.tsv_to_layout(fixture.read_bytes())
+    page = pages[min(pages)]
+    index = PageIndex(page)
+    boxes = {
+        block_num: (block.left, block.top, block.width, block.height)
+        for block_num, block in page.blocks.items()
+    }
+    numbers = list(boxes)
+    rnd = random.Random(0)
+    for _ in range(200):
+        x, y = rnd.uniform(0, page.width), rnd.uniform(0, page.height)
+        expected = [numbers[i] for i in scan_at(list(boxes.values()), x, y)]
+        assert index.at(TessLayout.BLOCK, x, y) == expected
+        assert index.block_at(x, y) == (expected[0] if expected else None)
+
+    line_keys = index.within(TessLayout.LINE, 0, 0, page.width, page.height)
+    assert line_keys == [
+        (block_num, par_num, line_num)
+        for block_num, block in page.blocks.items()
+        for par_num, para in block.paragraphs.items()
+        for line_num in para.lines
+    ]
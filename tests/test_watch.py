@@ -0,0 +1,139 @@
+"""When the folder scanner of watch mode reports a file: once it has settled,
+once per change, and not while it is still being written"""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from text_recog.watch import FolderScanner
+
+SETTLE = 3.0
+
+
+@pytest.fixture
+def scanner(tmp_path: Path) -> FolderScanner:
+    return FolderScanner([tmp_path], settle=SETTLE)
+
+
+def write(path: Path, data: bytes, mtime: int):
+    """Write a file with a given mtime, in seconds, so that every change is
+    seen whatever the resolution of the file system"""
+    path.write_bytes(data)
+    os.utime(path, (mtime, mtime))
+
+
+def test_file_is_reported_once_settled(tmp_path, scanner):
+    scan = tmp_path / "scan.png"
+    write(scan, b"png", 1000)
+    assert scanner.scan(now=10.0) == []
+    assert scanner.next_settle == 10.0 + SETTLE
+    assert scanner.scan(now=12.9) == []
+    # Reported with the time it was first seen, for latency
+    assert scanner.scan(now=13.0) == [(scan, 10.0)]
+    assert scanner.next_settle is None
+    assert scanner.scan(now=20.0) == []
+
+
+def test_changes_while_copying_delay_the_report(tmp_path, scanner):
+    scan = tmp_path / "scan.png"
+    write(scan, b"p", 1000)
+    scanner.scan(now=10.0)
+    write(scan, b"pn", 1001)
+    assert scanner.scan(now=12.0) == []
+    assert scanner.next_settle == 12.0 + SETTLE
+    write(scan, b"png", 1002)
+    assert scanner.scan(now=14.0) == []
+    assert scanner.scan(now=16.9) == []
+    assert scanner.scan(now=17.0) == [(scan, 10.0)]
+
+
+def test_empty_file_waits_for_content(tmp_path, scanner):
+    scan = tmp_path / "scan.png"
+    write(scan, b"", 1000)
+    scanner.scan(now=10.0)
+    assert scanner.scan(now=20.0) == []
+    write(scan, b"png", 1001)
+    assert scanner.scan(now=21.0) == []
+    assert scanner.scan(now=24.0) == [(scan, 10.0)]
+
+
+def test_changed_file_is_reported_again(tmp_path, scanner):
+    scan = tmp_path / "scan.png"
+    write(scan, b"png", 1000)
+    scanner.scan(now=10.0)
+    assert scanner.scan(now=13.0) == [(scan, 10.0)]
+
+    write(scan, b"png, rescanned", 1100)
+    assert scanner.scan(now=30.0) == []
+    assert scanner.scan(now=33.0) == [(scan, 30.0)]
+    # Touching it without a change in size counts too
+    write(scan, b"png, rescanned", 1200)
+    scanner.scan(now=40.0)
+    assert scanner.scan(now=43.0) == [(scan, 40.0)]
+
+
+def test_deleted_file_is_new_when_it_comes_back(tmp_path, scanner):
+    scan = tmp_path / "scan.png"
+    write(scan, b"png", 1000)
+    scanner.scan(now=10.0)
+    scanner.scan(now=13.0)
+    scan.unlink()
+    assert scanner.scan(now=14.0) == []
+    write(scan, b"png", 1000)
+    scanner.scan(now=15.0)
+    assert scanner.scan(now=18.0) == [(scan, 15.0)]
+
+
+def test_deleted_before_settling_is_forgotten(tmp_path, scanner):
+    scan = tmp_path / "scan.png"
+    write(scan, b"png", 1000)
+    scanner.scan(now=10.0)
+    scan.unlink()
+    assert scanner.scan(now=11.0) == []
+    assert scanner.next_settle is None
+
+
+def test_files_settle_in_order_of_last_change(tmp_path, scanner):
+    first, second = tmp_path / "b.png", tmp_path / "a.png"
+    write(first, b"png", 1000)
+    scanner.scan(now=10.0)
+    write(second, b"png", 1000)
+    scanner.scan(now=11.0)
+    assert scanner.next_settle == 10.0 + SETTLE
+    assert scanner.scan(now=13.0) == [(first, 10.0)]
+    assert scanner.next_settle == 11.0 + SETTLE
+    assert scanner.scan(now=14.0) == [(second, 11.0)]
+    # Several settling at once come sorted by path
+    write(first, b"png!", 1100)
+    write(second, b"png!", 1100)
+    scanner.scan(now=20.0)
+    assert scanner.scan(now=23.0) == [(second, 20.0), (first, 20.0)]
+
+
+def test_only_matching_visible_files(tmp_path, scanner):
+    write(tmp_path / "notes.txt", b"text", 1000)
+    write(tmp_path / ".scan.png.part", b"png", 1000)
+    write(tmp_path / ".hidden.png", b"png", 1000)
+    (tmp_path / "folder.png").mkdir()
+    scanner.scan(now=10.0)
+    assert scanner.scan(now=20.0) == []
+    assert scanner.next_settle is None
+
+
+def test_unreachable_folder_keeps_its_files(tmp_path, capsys):
+    share = tmp_path / "share"
+    share.mkdir()
+    scanner = FolderScanner([share], settle=SETTLE)
+    scan = share / "scan.png"
+    write(scan, b"png", 1000)
+    scanner.scan(now=10.0)
+    assert scanner.scan(now=13.0) == [(scan, 10.0)]
+
+    share.rename(tmp_path / "unmounted")
+    assert scanner.scan(now=20.0) == []
+    assert "cannot scan" in capsys.readouterr().err
+    (tmp_path / "unmounted").rename(share)
+    # Back with the same file, which is not reported again
+    scanner.scan(now=30.0)
+    assert scanner.scan(now=40.0) == []